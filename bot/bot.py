@@ -3,32 +3,82 @@ import sys
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
 
-import os, asyncio, datetime as dt, requests, random
+import os, asyncio, datetime as dt, requests, random, time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler
+from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, CallbackQueryHandler, TypeHandler
+from telegram.error import Forbidden
+from telegram.constants import ChatAction
 from src.utils.config import settings
 from src.utils.leagues import TOP_COMP_CODES, ODDS_SPORT_KEYS, TOP_N_FOR_UI
-from src.fetchers.football_data import get_matches_for_date, get_team_recent_results
-from src.fetchers.odds_api import get_odds_for_sport, implied_probs_from_bookmakers
+from src.fetchers.football_data import get_team_recent_results
+from src.fetchers.fixtures import FixturesRepository
+from src.fetchers.season_results import SeasonResultsStore
+from src.fetchers.odds_api import implied_probs_from_bookmakers, add_odds_listener, parse_btts_prob
+from src.fetchers.event_odds import EventOddsFetcher, merge_markets
+from src.fetchers.odds_refresh import OddsRefreshPlanner
+from src.fetchers.refresh_scheduler import RefreshScheduler
+from src.fetchers.odds_store import odds_store
 from src.analytics.markets import top_market_picks_for_date, seeded_shuffle_picks, compute_parlay_metrics
 from src.utils.matching import teams_match
 from src.analytics.probability import probs_from_form, blend_probs, ev_from_probs_odds
 from src.analytics.express import greedy_highprob
 from src.analytics.stats import (
     get_stats_summary, add_bet_record, update_bet_result, 
-    get_monthly_chart, get_leaderboard, load_user_stats, save_user_stats
+    get_monthly_chart, get_leaderboard, load_user_stats, save_user_stats, load_user_bets
 )
 from src.utils.subs import plan_gate, get_user_stats, use_trial, log_user_activity, get_user_account_info, get_pricing_catalog, is_admin, get_remaining_generations, format_remaining_generations
 from src.analytics.strategies import (
     find_value_bets, detect_arbitrage_opportunities, build_accumulator,
     kelly_criterion_stake, martingale_protection_check
 )
+from src.analytics.portfolio_kelly import portfolio_kelly
+from src.analytics.arbitrage import get_arbitrage_opportunities, arbitrage_summary
+from src.analytics.odds_movement import movement_tracker, record_odds
+from src.analytics.live_engine import LiveEngine, LIVE_STATUSES
+from src.analytics.settlement import Settler, final_score
+from src.analytics.prediction_cache import prediction_cache, odds_fingerprint, results_fingerprint
+from src.analytics.bankroll_sim import (
+    simulate_bankroll, kelly_plan, flat_plan, history_plan, DEFAULT_PATHS as DEFAULT_SIM_PATHS
+)
 from src.analytics.ai_personal import (
-    analyze_betting_patterns, generate_personal_recommendations,
+    analyze_betting_patterns, generate_personal_recommendations, generate_insights,
     adaptive_odds_evaluation, get_strategy_recommendation
 )
+from src.analytics.personal_model import model_trainer, MIN_SETTLED as MODEL_MIN_SETTLED
+from src.utils.alerts import (
+    AlertRegistry, AlertDispatcher, ALERT_TYPES, ALL_EVENTS,
+    format_live_alert, format_odds_alert, format_value_alert
+)
 from src.i18n import tr, LANGS
-from src.utils.storage import get_lang, set_lang
+from src.utils.storage import get_lang, set_lang, flush_preferences
+from src.utils.ratelimit import request_gate, RateLimited
+from src.utils.update_processor import PerUserUpdateProcessor
+from src.utils.persistence import SQLiteUserDataPersistence
+from src.utils.shared_state import shared_state, LeaderLease
+
+# Several workers: background jobs run only on the worker holding the "jobs" lease
+leader = LeaderLease(shared_state) if settings.multi_worker else None
+# Fixtures of all top competitions for the coming week, one Football-Data request per window
+fixtures_repo = FixturesRepository(settings.football_data_token, TOP_COMP_CODES,
+                                   shared=shared_state if settings.multi_worker else None, leader=leader)
+# Finished matches of the season (synced from a watermark by the jobs leader): team form without per-team requests
+season_results = SeasonResultsStore(settings.football_data_token, TOP_COMP_CODES)
+# h2h + totals odds: commence-time window, near-kickoff events refreshed most often
+odds_planner = OddsRefreshPlanner(settings.odds_api_key, regions=settings.odds_regions or "uk,eu",
+                                  shared=shared_state if settings.multi_worker else None, leader=leader)
+# BTTS is only served per event: fetched for the fixtures on screen, a few at a time
+event_odds = EventOddsFetcher(settings.odds_api_key, regions=settings.odds_regions or "uk,eu",
+                              shared=shared_state if settings.multi_worker else None, leader=leader)
+# Refreshes fixtures and near-kickoff odds just before their kickoff-aware TTLs run out
+refresh_scheduler = RefreshScheduler(fixtures_repo, odds_planner, ODDS_SPORT_KEYS.values(),
+                                     odds_within=settings.odds_prefetch_hours * 3600, event_odds=event_odds)
+# Background live engine (started in post_init), /live is served from its in-memory table
+live_engine = LiveEngine(settings.football_data_token, TOP_COMP_CODES,
+                         shared=shared_state if settings.multi_worker else None, fixtures=fixtures_repo)
+# Pending bets graded from finished fixtures (sweeps in the background, sooner after a FULL_TIME)
+settler = Settler(settings.football_data_token, TOP_COMP_CODES, fixtures=fixtures_repo)
+# /notify subscriptions, indexed by (event, alert type)
+alert_registry = AlertRegistry(shared=settings.multi_worker)
 
 def _reply(update, text, reply_markup=None):
     # răspunde corect fie din mesaj normal, fie din callback
@@ -276,58 +326,117 @@ def seeded_rng_for_user(user_id: int, date_str: str) -> random.Random:
     return random.Random(f"{user_id}:{date_str}")
 
 
-async def send_loading_animation(update, sticker_type="loading"):
-    """Send loading animation that stays visible until manually deleted"""
-    sticker_animations = {
-        "welcome": [
-            "⚽", "⚽🤖", "⚽🤖⚡", "⚽🤖⚡🎯", "⚽🤖⚡🎯✨"
-        ],
-        "loading": [
-            "🔄", "🔄⚡", "🔄⚡💫", "🔄⚡💫🎯", "🔄⚡💫🎯✨"
-        ],
-        "success": [
-            "✅", "✅🎉", "✅🎉⭐", "✅🎉⭐💎", "✅🎉⭐💎🔥"
-        ],
-        "prediction": [
-            "🎯", "🎯📊", "🎯📊⚡", "🎯📊⚡🔥", "🎯📊⚡🔥💎"
-        ],
-        "live": [
-            "⚡", "⚡🔴", "⚡🔴📡", "⚡🔴📡🎬", "⚡🔴📡🎬💥"
-        ],
-        "money": [
-            "💰", "💰💵", "💰💵📈", "💰💵📈🚀", "💰💵📈🚀💎"
-        ]
-    }
-    
-    animations = sticker_animations.get(sticker_type, sticker_animations["loading"])
-    
-    try:
-        # Create animated sequence that stays visible
-        message = None
-        for i, frame in enumerate(animations):
-            animation_text = f"{frame} **PROCESARE...**" if sticker_type == "loading" else frame
-            
-            if i == 0:
-                message = await update.effective_message.reply_text(animation_text, parse_mode='Markdown')
-            else:
-                await message.edit_text(animation_text, parse_mode='Markdown')
-            
-            import asyncio
-            await asyncio.sleep(0.4)  # Slower for loading visibility
-            
-        # Return message so it can be deleted later
-        return message
-    except Exception as e:
-        print(f"Animation error: {e}")
-        return None
+PROGRESS_ICONS = {"loading": "🔄", "success": "✅", "prediction": "🎯", "live": "⚡", "money": "💰"}
+PROGRESS_MIN_EDIT = 1.0         # seconds between two edits of the progress message
+TYPING_REFRESH = 4.5            # Telegram shows "typing" for ~5s per chat action
+
+
+class ProgressReporter:
+    """
+    Progress indicator driven by the pipeline instead of a fixed animation.
+
+    A "typing" chat action is refreshed in the background while the work runs,
+    and the message is edited only when the pipeline reports a stage (at most
+    once per PROGRESS_MIN_EDIT; a stage arriving sooner is skipped). With
+    message=None a status message is sent on the first stage and deleted at
+    the end; with an existing message (callback menus) that message is edited
+    and later replaced by the result. Nothing here waits before the work starts.
+    """
+
+    def __init__(self, update, kind: str = "loading", message=None):
+        self.update = update
+        self.icon = PROGRESS_ICONS.get(kind, PROGRESS_ICONS["loading"])
+        self.message = message
+        self._owned = message is None
+        self._last_edit = 0.0
+        self._edit = None
+        self._typing = None
+        self._finished = False
+
+    async def __aenter__(self):
+        self._typing = asyncio.get_running_loop().create_task(self._keep_typing())
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.finish()
+
+    async def _keep_typing(self):
+        chat = self.update.effective_chat
+        while chat is not None:
+            try:
+                await chat.send_action(ChatAction.TYPING)
+            except Exception:
+                return
+            await asyncio.sleep(TYPING_REFRESH)
 
-async def delete_animation_message(message):
-    """Delete animation message after processing is complete"""
-    if message:
+    async def _send(self, text: str):
         try:
-            await message.delete()
-        except:
-            pass  # Silent fail if deletion not possible
+            if self.message is None:
+                self.message = await self.update.effective_message.reply_text(text, parse_mode='Markdown')
+            else:
+                await self.message.edit_text(text, parse_mode='Markdown')
+        except Exception as e:
+            print(f"Progress update error: {e}")
+
+    async def show(self, text: str):
+        """Show text now (first feedback, awaited so it cannot land after the result)"""
+        self._last_edit = time.monotonic()
+        await self._send(text)
+
+    def stage(self, text: str):
+        """Report a pipeline stage; edits in the background, at most once per second"""
+        now = time.monotonic()
+        if self._finished or now - self._last_edit < PROGRESS_MIN_EDIT or \
+                (self._edit is not None and not self._edit.done()):
+            return
+        self._last_edit = now
+        self._edit = asyncio.get_running_loop().create_task(self._send(f"{self.icon} {text}"))
+
+    async def finish(self):
+        """Stop typing, let an edit in flight land and drop the status message (idempotent)"""
+        if self._finished:
+            return
+        self._finished = True
+        if self._typing is not None:
+            self._typing.cancel()
+        if self._edit is not None:
+            try:
+                await asyncio.wait_for(self._edit, timeout=5)
+            except Exception:
+                pass
+        if self._owned and self.message is not None:
+            try:
+                await self.message.delete()
+            except Exception:
+                pass  # Silent fail if deletion not possible
+
+
+def _stage(progress, text: str):
+    if progress is not None:
+        progress.stage(text)
+
+
+async def _finish(progress):
+    if progress is not None:
+        await progress.finish()
+
+
+async def run_heavy(update, command: str, work):
+    """Run a prediction pipeline behind the per-user limits and the global pipeline cap"""
+    user_id = update.effective_user.id if update.effective_user else 0
+    try:
+        return await request_gate.run(user_id, command, work)
+    except RateLimited as e:
+        await update.effective_message.reply_text(
+            f"⏳ Prea multe cereri /{command}. Încearcă din nou în {max(1, round(e.retry_after))}s.")
+
+
+def heavy(command: str, handler):
+    """Wrap a command handler with run_heavy (repeats while pending are dropped by the update processor)"""
+    async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        return await run_heavy(update, command, lambda: handler(update, context))
+    wrapped.__doc__ = handler.__doc__
+    return wrapped
 
 async def show_trial_expired_message(update):
     """Show educational message when trial is expired"""
@@ -513,6 +622,22 @@ def format_match_card(match_data, lang="RO"):
             ""
         ])
     
+    # Form from the local season table: home team at home, away team away
+    if match_data.get("form"):
+        home_f, away_f = match_data["form"].get("home"), match_data["form"].get("away")
+        lines = []
+        if home_f:
+            h = home_f["home"]
+            lines.append(f"├ 🏠 {home}: {home_f['form'] or '-'} | acasă {h['ppg']:.1f} pct/meci, "
+                         f"goluri {h['goals_for']:.1f}-{h['goals_against']:.1f}")
+        if away_f:
+            a = away_f["away"]
+            lines.append(f"├ 🛣️ {away}: {away_f['form'] or '-'} | deplasare {a['ppg']:.1f} pct/meci, "
+                         f"goluri {a['goals_for']:.1f}-{a['goals_against']:.1f}")
+        if lines:
+            lines[-1] = "└" + lines[-1][1:]
+            card_lines.extend(["📋 **Formă (ultimele 5):**", *lines, ""])
+
     # Enhanced Match Insights with visual appeal
     if "insights" in match_data:
         insights = match_data["insights"]
@@ -544,13 +669,54 @@ def format_match_card(match_data, lang="RO"):
     return "\n".join(card_lines)
 
 
+def _team_results(team_id, token, date_iso):
+    """(recent results, form version): local season table, per-team request only for unknown teams"""
+    results = season_results.team_results(team_id, date_iso) if team_id is not None else []
+    if results:
+        return results, results_fingerprint(results)
+    return prediction_cache.team_results(team_id, date_iso, lambda: get_team_recent_results(token, team_id, date_iso))
+
+
+def _fixture_inputs(match, odds_events, token, date_iso):
+    """Team results, matched odds event and their versions (cache key) for one fixture"""
+    home_results, home_version = _team_results(match["home_id"], token, date_iso)
+    away_results, away_version = _team_results(match["away_id"], token, date_iso)
+    event = find_odds_event(odds_events or [], match["home_name"], match["away_name"])
+    inputs = {"odds": odds_fingerprint(event), "form": f"{home_version}:{away_version}"}
+    return home_results, away_results, event, inputs
+
+
+def _fixture_key(match):
+    return match.get("match_id") or f'{match["home_name"]} vs {match["away_name"]}'
+
+
+def _pick_summary(pick):
+    return {"selection": pick["selection"], "p": round(pick["p_est"], 3), "odds": round(pick["odds"], 2)}
+
+
+def _best_pick_summary(result):
+    best = result["best_pick"]
+    return {"selection": best["selection"], "p": round(best["prob"], 3), "odds": round(best["odds"], 2)}
+
+
 def get_comprehensive_match_predictions(match, odds_events, token, date_iso):
-    """Get all market predictions for a single match"""
+    """Get all market predictions for a single match (recomputed only when its odds or form changed)"""
+    home_results, away_results, matched_event, inputs = _fixture_inputs(match, odds_events, token, date_iso)
+    result = dict(prediction_cache.get(
+        "full", _fixture_key(match), inputs,
+        lambda: _comprehensive_predictions(match, matched_event, home_results, away_results),
+        describe=_best_pick_summary, label=f'{match["home_name"]} vs {match["away_name"]}'))
+    result["form"] = {side: season_results.team_form(match[f"{side}_id"], date_iso)
+                      for side in ("home", "away") if match.get(f"{side}_id") is not None}
+    return result
+
+
+def _comprehensive_predictions(match, matched_event, home_results, away_results):
     home_name, away_name = match["home_name"], match["away_name"]
     
     # Get form-based probabilities
-    home_form = compute_form_points(get_team_recent_results(token, match["home_id"], date_iso), "HOME")
-    away_form = compute_form_points(get_team_recent_results(token, match["away_id"], date_iso), "AWAY")
+    home_form = compute_form_points(home_results, "HOME")
+    away_form = compute_form_points(away_results, "AWAY")
     p_form = probs_from_form(home_form-away_form)
     
     # Initialize result
@@ -560,16 +726,6 @@ def get_comprehensive_match_predictions(match, odds_events, token, date_iso):
         "competition": match["competition"]
     }
     
-    # Find odds for this match
-    matched_event = None
-    if odds_events:
-        for ev in odds_events:
-            home_odds = normalize_name(ev.get("home_team", ""))
-            away_odds = normalize_name(ev.get("away_team", ""))
-            if teams_match_wrapper(home_name, home_odds) and teams_match_wrapper(away_name, away_odds):
-                matched_event = ev
-                break
-    
     # H2H Probabilities and odds
     if matched_event:
         # Get implied probabilities using existing function
@@ -649,8 +805,12 @@ def get_comprehensive_match_predictions(match, odds_events, token, date_iso):
         result["ou_probs"] = [over_prob, 1.0 - over_prob]
         result["ou_odds"] = [1.0/over_prob, 1.0/(1.0-over_prob)]
     
-    # Both Teams to Score - Mock estimation until API is fixed
-    if matched_event:
+    # Both Teams to Score: bookmaker prices when the event carries the market (fetched per event)
+    btts_market = parse_btts_prob(matched_event) if matched_event else None
+    if btts_market:
+        result["btts_probs"] = [btts_market["Yes"], btts_market["No"]]
+        result["btts_odds"] = [btts_market["odds"]["Yes"], btts_market["odds"]["No"]]
+    elif matched_event:
         # For now, estimate BTTS based on Over/Under probability
         over_25_prob = result.get("ou_probs", [0.5, 0.5])[0]
         btts_prob = min(0.75, max(0.25, over_25_prob * 0.85))  # BTTS usually correlated with Over 2.5
@@ -823,9 +983,10 @@ async def cmd_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if user_stats['plan'] != 'free':
         # Paid user - unlimited access
         lang = get_lang(uid)
-        await update.message.reply_text(tr(lang,"processing"))
         date = today_iso()
-        await picks_for_date(update, context, date, lang)
+        async with ProgressReporter(update, "prediction") as progress:
+            await progress.show(tr(lang,"processing"))
+            await picks_for_date(update, context, date, lang, progress)
         return
     
     # Free user - check trial usage BEFORE generating
@@ -853,66 +1014,103 @@ async def cmd_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(trial_msg, parse_mode='Markdown')
     
     lang = get_lang(uid)
-    await update.message.reply_text(tr(lang,"processing"))
     date = today_iso()
-    await picks_for_date(update, context, date, lang)
+    async with ProgressReporter(update, "prediction") as progress:
+        await progress.show(tr(lang,"processing"))
+        await picks_for_date(update, context, date, lang, progress)
+
+def _prefetch_odds(matches: list):
+    """h2h/totals odds per competition of the given fixtures (blocking); returns (odds, unavailable)"""
+    if not settings.odds_api_key:
+        return {}, True
+    odds_all = {}
+    for code in set([m["competition"] for m in matches]):
+        sport_key = ODDS_SPORT_KEYS.get(code)
+        if not sport_key:
+            continue
+        try:
+            events = odds_planner.events(sport_key)
+            if events:
+                odds_all[code] = events
+        except Exception as e:
+            print(f"Error fetching odds for {code}: {e}")
+            continue
+    return odds_all, False
+
+
+def _prefetch_event_markets(matches: list, odds_all: dict) -> dict:
+    """odds_all with per-event BTTS quotes merged into the events of these fixtures (blocking)"""
+    matched = {}
+    for m in matches:
+        event = find_odds_event(odds_all.get(m["competition"], []), m["home_name"], m["away_name"])
+        if event is not None:
+            matched[event["id"]] = event
+    extra = event_odds.fetch_many(list(matched.values()))
+    if not extra:
+        return odds_all
+    return {code: [merge_markets(ev, extra.get(ev.get("id"))) for ev in events]
+            for code, events in odds_all.items()}
+
+
+def _h2h_candidates(matches: list, odds_all: dict, token, date_iso: str) -> list:
+    """
+    Most likely 1X2 outcome per fixture from form + matched odds (blocking: form lookups).
+    Fixtures whose odds and form are unchanged since the last call come from the prediction cache.
+    """
+    picks = []
+    for m in matches:
+        home_results, away_results, event, inputs = _fixture_inputs(
+            m, odds_all.get(m["competition"], []), token, date_iso)
+        pick = prediction_cache.get(
+            "h2h", _fixture_key(m), inputs, lambda: _h2h_pick(m, event, home_results, away_results),
+            describe=_pick_summary, label=f'{m["home_name"]} vs {m["away_name"]}')
+        picks.append(dict(pick))
+    return picks
+
+
+def _h2h_pick(m, event, home_results, away_results) -> dict:
+    home_form = compute_form_points(home_results, "HOME")
+    away_form = compute_form_points(away_results, "AWAY")
+    p_form = probs_from_form(home_form-away_form)
 
-async def picks_for_date(update: Update, context: ContextTypes.DEFAULT_TYPE, date_iso: str, lang: str):
+    odds_probs, odds_tuple = (None, None)
+    if event is not None:
+        odds_probs, odds_tuple = odds_for_event(event, m["home_name"], m["away_name"])
+
+    p_comb = blend_probs(odds_probs, p_form, m["home_name"], m["away_name"], w_odds=0.8 if odds_probs else 0.0)
+    if not odds_tuple:
+        odds_tuple = (max(1.01,1.0/max(1e-6,p_comb[0])),
+                      max(1.01,1.0/max(1e-6,p_comb[1])),
+                      max(1.01,1.0/max(1e-6,p_comb[2])))
+    evs = ev_from_probs_odds(p_comb, odds_tuple)
+    idx = int(max(range(3), key=lambda i: p_comb[i]))
+    return {
+        "match": f'{m["home_name"]} vs {m["away_name"]}',
+        "competition": m["competition"],
+        "selection": ["Home","Draw","Away"][idx],
+        "p_est": float(p_comb[idx]),
+        "odds": float(odds_tuple[idx]),
+        "ev": float(evs[idx])
+    }
+
+
+async def picks_for_date(update: Update, context: ContextTypes.DEFAULT_TYPE, date_iso: str, lang: str,
+                         progress=None):
     token = settings.football_data_token
-    matches = get_matches_for_date(token, TOP_COMP_CODES, date_iso)
+    matches = await asyncio.to_thread(fixtures_repo.matches_for_date, date_iso)
     if not matches:
+        await _finish(progress)
         await _reply(update, tr(lang, "no_matches"))
         return
+    _stage(progress, f"**{len(matches)} meciuri găsite** - caut cotele...")
 
     # prefetch odds for all markets (h2h, totals)
-    odds_all = {}
-    odds_unavailable_global = False
-    if settings.odds_api_key:
-        for code in set([m["competition"] for m in matches]):
-            sport_key = ODDS_SPORT_KEYS.get(code)
-            if not sport_key: continue
-            try:
-                data = get_odds_for_sport(
-                    settings.odds_api_key, 
-                    sport_key, 
-                    regions=settings.odds_regions or "uk,eu", 
-                    markets="h2h,totals"  # Remove problematic BTTS market
-                )
-                if data and data[0]:
-                    odds_all[code] = data[0]
-            except:
-                continue
-    else:
-        odds_unavailable_global = True
+    odds_all, odds_unavailable_global = await asyncio.to_thread(_prefetch_odds, matches)
+    _stage(progress, f"**Cote potrivite** ({len(odds_all)} competiții) - calculez predicțiile...")
 
-    picks = []
-    for m in matches:
-        home_form = compute_form_points(get_team_recent_results(token, m["home_id"], date_iso), "HOME")
-        away_form = compute_form_points(get_team_recent_results(token, m["away_id"], date_iso), "AWAY")
-        p_form = probs_from_form(home_form-away_form)
-
-        odds_events = odds_all.get(m["competition"], [])
-        odds_probs, odds_tuple = (None, None)
-        if odds_events:
-            odds_probs, odds_tuple = match_odds_for_fixture(odds_events, m["home_name"], m["away_name"])
-
-        p_comb = blend_probs(odds_probs, p_form, m["home_name"], m["away_name"], w_odds=0.8 if odds_probs else 0.0)
-        if not odds_tuple:
-            odds_tuple = (max(1.01,1.0/max(1e-6,p_comb[0])),
-                          max(1.01,1.0/max(1e-6,p_comb[1])),
-                          max(1.01,1.0/max(1e-6,p_comb[2])))
-        evs = ev_from_probs_odds(p_comb, odds_tuple)
-        idx = int(max(range(3), key=lambda i: p_comb[i]))
-        selection = ["Home","Draw","Away"][idx]
-
-        picks.append({
-            "match": f'{m["home_name"]} vs {m["away_name"]}',
-            "competition": m["competition"],
-            "selection": selection,
-            "p_est": round(float(p_comb[idx]),3),
-            "odds": round(float(odds_tuple[idx]),2),
-            "ev": round(float(evs[idx]),3)
-        })
+    picks = [dict(p, p_est=round(p["p_est"],3), odds=round(p["odds"],2), ev=round(p["ev"],3))
+             for p in await asyncio.to_thread(_h2h_candidates, matches, odds_all, token, date_iso)]
+    await _finish(progress)
 
     # Sort all picks by quality, then apply user-specific diversification
     picks = sorted(picks, key=lambda x: (x["p_est"], x["ev"]), reverse=True)
@@ -920,6 +1118,11 @@ async def picks_for_date(update: Update, context: ContextTypes.DEFAULT_TYPE, dat
     # Take top TOP_N_FOR_UI candidates and shuffle deterministically per user
     user_id = update.effective_user.id
     top_picks = seeded_shuffle_picks(picks[:TOP_N_FOR_UI], user_id, date_iso, 2)
+    # Remember the slate so /bankroll can size it jointly
+    context.user_data['slate'] = [
+        {"match": p["match"], "selection": p["selection"], "probability": p["p_est"], "odds": p["odds"]}
+        for p in top_picks
+    ]
 
     # Enhanced display with beautiful cards
     lines = [
@@ -976,7 +1179,6 @@ async def cmd_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if user_stats['plan'] != 'free':
         # Paid user - unlimited access
         lang = get_lang(uid)
-        await update.message.reply_text(tr(lang,"processing"))
         
         # Parse optional date argument or default to today
         args = context.args
@@ -984,7 +1186,9 @@ async def cmd_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
             date_str = args[0]
         else:
             date_str = today_iso()
-        await markets_for_date(update, context, date_str, lang)
+        async with ProgressReporter(update, "prediction") as progress:
+            await progress.show(tr(lang,"processing"))
+            await markets_for_date(update, context, date_str, lang, progress)
         return
     
     # Free user - check trial usage BEFORE generating
@@ -1012,7 +1216,6 @@ async def cmd_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(trial_msg, parse_mode='Markdown')
         
     lang = get_lang(uid)
-    await update.message.reply_text(tr(lang,"processing"))
     
     # Parse optional date argument or default to today
     args = context.args
@@ -1028,7 +1231,9 @@ async def cmd_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         date_str = today_iso()
     
-    await markets_for_date(update, context, date_str, lang)
+    async with ProgressReporter(update, "prediction") as progress:
+        await progress.show(tr(lang,"processing"))
+        await markets_for_date(update, context, date_str, lang, progress)
 
 
 async def cmd_all_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1040,9 +1245,10 @@ async def cmd_all_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Check if user has active subscription
     if user_stats['plan'] != 'free':
         # Paid user - unlimited access
-        await update.message.reply_text("🔮 Generez predicții complete pentru toate piețele...")
         date_iso = today_iso()
-        await all_markets_for_date(update, context, date_iso, lang)
+        async with ProgressReporter(update, "prediction") as progress:
+            await progress.show("🔮 Generez predicții complete pentru toate piețele...")
+            await all_markets_for_date(update, context, date_iso, lang, progress)
         return
     
     # Free user - check trial usage BEFORE generating
@@ -1060,45 +1266,36 @@ async def cmd_all_markets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # Trial used successfully - show counter and generate prediction
     remaining_after = get_remaining_generations(uid)
-    await update.message.reply_text(f"🎯 {tr(lang, 'trial_used')} ({remaining_after} rămase)\n🔮 Generez predicții complete pentru toate piețele...")
+    await update.message.reply_text(f"🎯 {tr(lang, 'trial_used')} ({remaining_after} rămase)")
     date_iso = today_iso()
-    await all_markets_for_date(update, context, date_iso, lang)
+    async with ProgressReporter(update, "prediction") as progress:
+        await progress.show("🔮 Generez predicții complete pentru toate piețele...")
+        await all_markets_for_date(update, context, date_iso, lang, progress)
 
 
-async def all_markets_for_date(update: Update, context: ContextTypes.DEFAULT_TYPE, date_iso: str, lang: str):
+async def all_markets_for_date(update: Update, context: ContextTypes.DEFAULT_TYPE, date_iso: str, lang: str,
+                               progress=None):
     """Generate comprehensive market predictions for all matches"""
     token = settings.football_data_token
-    matches = get_matches_for_date(token, TOP_COMP_CODES, date_iso)
+    matches = await asyncio.to_thread(fixtures_repo.matches_for_date, date_iso)
     
     if not matches:
+        await _finish(progress)
         await _reply(update, tr(lang, "no_matches"), reply_markup=_kb_main(lang))
         return
+    _stage(progress, f"**{len(matches)} meciuri găsite** - caut cotele...")
 
     # Fetch odds for all markets
-    odds_events_by_comp = {}
-    if settings.odds_api_key:
-        for code in set([m["competition"] for m in matches]):
-            sport_key = ODDS_SPORT_KEYS.get(code)
-            if not sport_key:
-                continue
-            try:
-                data = get_odds_for_sport(
-                    settings.odds_api_key, 
-                    sport_key,
-                    regions=settings.odds_regions or "uk,eu",
-                    markets="h2h,totals"
-                )
-                if data and data[0]:
-                    odds_events_by_comp[code] = data[0]
-            except Exception as e:
-                print(f"Error fetching odds for {code}: {e}")
-                continue
+    odds_events_by_comp, _ = await asyncio.to_thread(_prefetch_odds, matches)
+    _stage(progress, "**Cote potrivite** - analizez toate piețele...")
 
     # Get top 3 most interesting matches
     top_matches = matches[:3] if len(matches) >= 3 else matches
     user_id = update.effective_user.id
     rng = seeded_rng_for_user(user_id, date_iso)
     rng.shuffle(top_matches)  # User-specific shuffle
+    # Real BTTS prices for the cards on screen only
+    odds_events_by_comp = await asyncio.to_thread(_prefetch_event_markets, top_matches[:2], odds_events_by_comp)
     
     # Generate comprehensive predictions for each match
     response_lines = [
@@ -1109,7 +1306,7 @@ async def all_markets_for_date(update: Update, context: ContextTypes.DEFAULT_TYP
     
     for i, match in enumerate(top_matches[:2], 1):  # Limit to 2 matches to avoid message length
         odds_events = odds_events_by_comp.get(match["competition"], [])
-        predictions = get_comprehensive_match_predictions(match, odds_events, token, date_iso)
+        predictions = await asyncio.to_thread(get_comprehensive_match_predictions, match, odds_events, token, date_iso)
         
         match_card = format_match_card(predictions, lang)
         response_lines.append(match_card)
@@ -1134,40 +1331,23 @@ async def all_markets_for_date(update: Update, context: ContextTypes.DEFAULT_TYP
          InlineKeyboardButton("🏠 Meniu Principal", callback_data="MENU_MAIN")]
     ])
     
+    await _finish(progress)
     await _reply(update, "\n".join(response_lines), reply_markup=keyboard)
 
 
-async def markets_for_date(update: Update, context: ContextTypes.DEFAULT_TYPE, date_iso: str, lang: str):
+async def markets_for_date(update: Update, context: ContextTypes.DEFAULT_TYPE, date_iso: str, lang: str,
+                           progress=None):
     """Generate Over/Under and BTTS market picks for a specific date"""
-    token = settings.football_data_token
-    matches = get_matches_for_date(token, TOP_COMP_CODES, date_iso)
+    matches = await asyncio.to_thread(fixtures_repo.matches_for_date, date_iso)
     if not matches:
+        await _finish(progress)
         await _reply(update, tr(lang, "no_matches"))
         return
+    _stage(progress, f"**{len(matches)} meciuri găsite** - caut cotele O/U...")
 
     # Fetch odds with extended markets  
-    odds_events_by_comp = {}
-    odds_unavailable = False
-    
-    if settings.odds_api_key:
-        for code in set([m["competition"] for m in matches]):
-            sport_key = ODDS_SPORT_KEYS.get(code)
-            if not sport_key:
-                continue
-            try:
-                data = get_odds_for_sport(
-                    settings.odds_api_key, 
-                    sport_key,
-                    regions=settings.odds_regions or "uk,eu",
-                    markets="h2h,totals"
-                )
-                if data and data[0]:
-                    odds_events_by_comp[code] = data[0]
-            except Exception as e:
-                print(f"Error fetching odds for {code}: {e}")
-                continue
-    else:
-        odds_unavailable = True
+    odds_events_by_comp, odds_unavailable = await asyncio.to_thread(_prefetch_odds, matches)
+    await _finish(progress)
 
     if not odds_events_by_comp:
         # No odds available, inform user
@@ -1182,6 +1362,14 @@ async def markets_for_date(update: Update, context: ContextTypes.DEFAULT_TYPE, d
         await _reply(update, "\n".join(lines), reply_markup=_kb_main(lang))
         return
 
+    # BTTS quotes cost a request per event: fetch them only for the fixtures of the O/U picks shown
+    shown = {p["match"] for p in top_market_picks_for_date(matches, odds_events_by_comp, target_line=2.5, top_n=4)}
+    shown_matches = [m for m in matches
+                     if (ev := find_odds_event(odds_events_by_comp.get(m["competition"], []),
+                                               m["home_name"], m["away_name"])) is not None
+                     and f'{ev.get("home_team")} vs {ev.get("away_team")}' in shown]
+    odds_events_by_comp = await asyncio.to_thread(_prefetch_event_markets, shown_matches, odds_events_by_comp)
+
     # Get top market picks
     market_picks = top_market_picks_for_date(matches, odds_events_by_comp, target_line=2.5, top_n=4)
     
@@ -1212,31 +1400,35 @@ def teams_match_wrapper(a,b):
     from src.utils.matching import teams_match as TM
     return TM(a,b)
 
-def match_odds_for_fixture(odds_events: list, home_name: str, away_name: str):
+def find_odds_event(odds_events: list, home_name: str, away_name: str):
+    """Odds API event of a Football-Data fixture (team names matched), or None"""
     for ev in odds_events:
         teams = [normalize_name(x) for x in (ev.get("home_team", ""), ev.get("away_team", ""))]
-
         if teams_match_wrapper(home_name, teams[0]) and teams_match_wrapper(away_name, teams[1]):
-            probs = implied_probs_from_bookmakers(ev)
-            odds_tuple = None
-            for b in ev.get("bookmakers",[]):
-                for mkt in b.get("markets",[]):
-                    if mkt.get("key")=="h2h":
-                        outs = mkt.get("outcomes",[])
-                        price_map = {o["name"]: float(o["price"]) for o in outs if "name" in o and "price" in o}
-                        h = price_map.get(ev.get("home_team")) or price_map.get("Home")
-                        d = price_map.get("Draw") or price_map.get("X")
-                        a = price_map.get(ev.get("away_team")) or price_map.get("Away")
-                        if h and a and d:
-                            odds_tuple = (h,d,a); break
-                if odds_tuple: break
-            if not odds_tuple and probs:
-                h = max(1.01, 1.0/max(1e-6, probs.get(home_name, probs.get("Home",0.33))))
-                d = max(1.01, 1.0/max(1e-6, probs.get("Draw",0.33)))
-                a = max(1.01, 1.0/max(1e-6, probs.get(away_name, probs.get("Away",0.33))))
-                odds_tuple = (h,d,a)
-            return probs, odds_tuple
-    return None, None
+            return ev
+    return None
+
+def odds_for_event(ev: dict, home_name: str, away_name: str):
+    """(implied probabilities, (home, draw, away) odds) of a matched odds event"""
+    probs = implied_probs_from_bookmakers(ev)
+    odds_tuple = None
+    for b in ev.get("bookmakers",[]):
+        for mkt in b.get("markets",[]):
+            if mkt.get("key")=="h2h":
+                outs = mkt.get("outcomes",[])
+                price_map = {o["name"]: float(o["price"]) for o in outs if "name" in o and "price" in o}
+                h = price_map.get(ev.get("home_team")) or price_map.get("Home")
+                d = price_map.get("Draw") or price_map.get("X")
+                a = price_map.get(ev.get("away_team")) or price_map.get("Away")
+                if h and a and d:
+                    odds_tuple = (h,d,a); break
+        if odds_tuple: break
+    if not odds_tuple and probs:
+        h = max(1.01, 1.0/max(1e-6, probs.get(home_name, probs.get("Home",0.33))))
+        d = max(1.01, 1.0/max(1e-6, probs.get("Draw",0.33)))
+        a = max(1.01, 1.0/max(1e-6, probs.get(away_name, probs.get("Away",0.33))))
+        odds_tuple = (h,d,a)
+    return probs, odds_tuple
 
 async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     q = update.callback_query
@@ -1311,7 +1503,7 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             update_id=update.update_id,
             message=q.message
         )
-        await cmd_today(fake_update, context)
+        await run_heavy(update, "today", lambda: cmd_today(fake_update, context))
         return
     if data == "MENU_MARKETS":
         # Convert callback to message-like update for compatibility  
@@ -1319,30 +1511,19 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             update_id=update.update_id,
             message=q.message
         )
-        await cmd_markets(fake_update, context)
+        await run_heavy(update, "markets", lambda: cmd_markets(fake_update, context))
         return
     if data == "MENU_ALL_MARKETS":
-        # Show loading animation
-        loading_msg = await send_loading_animation(update, "prediction")
-        await q.edit_message_text("🌟🎯 **Generez predicții complete...** 💫\n🔥 **Analizez toate piețele disponibile...**", parse_mode='Markdown')
-        
-        # Process the request
-        await all_markets_for_date(update, context, today_iso(), lang)
-        
-        # Delete loading animation after processing
-        await delete_animation_message(loading_msg)
+        async def all_markets():
+            async with ProgressReporter(update, "prediction", message=q.message) as progress:
+                await progress.show("🌟🎯 **Generez predicții complete...** 💫\n🔥 **Analizez toate piețele disponibile...**")
+                await all_markets_for_date(update, context, today_iso(), lang, progress)
+        await run_heavy(update, "all", all_markets)
         return
     if data == "MENU_EXPRESS":
-        # Show loading animation
-        loading_msg = await send_loading_animation(update, "money")
-        await q.edit_message_text("🎯⚡ **Construiesc expresul perfect...** 🚀\n💎 **AI optimization running...**", parse_mode='Markdown')
-        
-        # Process the request
+        # Only shows the wizard: nothing to wait for
         context.user_data["exp_cfg"] = {"legs":3, "min":2.0, "max":4.0}
         await q.edit_message_text("🎯 " + tr(lang,"wizard_title"), reply_markup=_kb_express(lang))
-        
-        # Delete loading animation after processing
-        await delete_animation_message(loading_msg)
         return
     if data == "MENU_LANG":
         await q.edit_message_text("🌐 " + tr(lang,"choose_lang"), reply_markup=_kb_lang())
@@ -1392,8 +1573,11 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await q.edit_message_reply_markup(_kb_express(lang, cfg["legs"], cfg["min"], cfg["max"]))
         return
     if data == "EXP_BUILD":
-        await q.edit_message_text("🚀 " + tr(lang,"processing"))
-        await build_express(update, context, lang)
+        async def express():
+            async with ProgressReporter(update, "money", message=q.message) as progress:
+                await progress.show("🚀 " + tr(lang,"processing"))
+                await build_express(update, context, lang, progress)
+        await run_heavy(update, "express", express)
         return
     if data == "EXP_INFO":
         # Just acknowledge - these are info buttons
@@ -1402,81 +1586,88 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # 🚀 NEW: Advanced features callbacks with animations
     if data == "MENU_STATS":
-        # Show loading animation
-        loading_msg = await send_loading_animation(update, "prediction")
-        await q.edit_message_text("📈✨ **Analizez datele...** 🔄\n⚡ **Loading statistici avansate...**", parse_mode='Markdown')
-        
-        # Process the request
-        await cmd_stats(update, context)
-        
-        # Delete loading animation after processing
-        await delete_animation_message(loading_msg)
+        async with ProgressReporter(update, "prediction", message=q.message) as progress:
+            await progress.show("📈✨ **Analizez datele...** 🔄\n⚡ **Loading statistici avansate...**")
+
+            # Process the request
+            await cmd_stats(update, context)
         return
     if data == "MENU_BANKROLL":
-        # Show loading animation
-        loading_msg = await send_loading_animation(update, "money")
-        await q.edit_message_text("💰🎯 **Calculez bankroll optimal...** 📊\n🚀 **Smart money management loading...**", parse_mode='Markdown')
-        
-        # Process the request
-        await cmd_bankroll(update, context)
-        
-        # Delete loading animation after processing
-        await delete_animation_message(loading_msg)
+        async with ProgressReporter(update, "money", message=q.message) as progress:
+            await progress.show("💰🎯 **Calculez bankroll optimal...** 📊\n🚀 **Smart money management loading...**")
+
+            # Process the request
+            await cmd_bankroll(update, context)
         return
     if data == "MENU_LIVE":
-        # Show loading animation
-        loading_msg = await send_loading_animation(update, "live")
-        await q.edit_message_text("⚡🔴 **Conectez live feeds...** 📡\n🎬 **Real-time data streaming...**", parse_mode='Markdown')
-        
-        # Process the request
-        await cmd_live(update, context)
-        
-        # Delete loading animation after processing
-        await delete_animation_message(loading_msg)
+        async with ProgressReporter(update, "live", message=q.message) as progress:
+            await progress.show("⚡🔴 **Conectez live feeds...** 📡\n🎬 **Real-time data streaming...**")
+
+            # Process the request
+            await cmd_live(update, context)
         return
     if data == "MENU_STRATEGIES":
-        # Show loading animation
-        loading_msg = await send_loading_animation(update, "prediction")
-        await q.edit_message_text("🎯🧠 **Analizez strategii...** 🎰\n💡 **AI strategy engine loading...**", parse_mode='Markdown')
-        
-        # Process the request
-        await cmd_strategies(update, context)
-        
-        # Delete loading animation after processing
-        await delete_animation_message(loading_msg)
+        async with ProgressReporter(update, "prediction", message=q.message) as progress:
+            await progress.show("🎯🧠 **Analizez strategii...** 🎰\n💡 **AI strategy engine loading...**")
+
+            # Process the request
+            await cmd_strategies(update, context)
         return
     if data == "MENU_SOCIAL":
-        # Show loading animation
-        loading_msg = await send_loading_animation(update, "success")
-        await q.edit_message_text("🏆👥 **Conectez la comunitate...** 🌟\n🎮 **Social hub activating...**", parse_mode='Markdown')
-        
-        # Process the request
-        await cmd_social(update, context)
-        
-        # Delete loading animation after processing
-        await delete_animation_message(loading_msg)
+        async with ProgressReporter(update, "success", message=q.message) as progress:
+            await progress.show("🏆👥 **Conectez la comunitate...** 🌟\n🎮 **Social hub activating...**")
+
+            # Process the request
+            await cmd_social(update, context)
         return
     if data == "MENU_AI":
-        # Show loading animation
-        loading_msg = await send_loading_animation(update, "prediction")
-        await q.edit_message_text("🤖🧬 **Activez AI Personal...** 🔮\n🎲 **Neural networks loading...**", parse_mode='Markdown')
-        
-        # Process the request
-        await cmd_ai(update, context)
-        
-        # Delete loading animation after processing
-        await delete_animation_message(loading_msg)
+        async with ProgressReporter(update, "prediction", message=q.message) as progress:
+            await progress.show("🤖🧬 **Activez AI Personal...** 🔮\n🎲 **Neural networks loading...**")
+
+            # Process the request
+            await cmd_ai(update, context)
         return
     
+    if data == "ai_retrain":
+        queued = model_trainer.request(str(user_id))
+        if queued:
+            text = "🔄 Modelul personal se antrenează în fundal. Revino la /ai în câteva secunde."
+        elif model_trainer.is_training(str(user_id)):
+            text = "🔄 Antrenarea este deja în curs."
+        else:
+            text = f"⏳ Ai nevoie de minim {MODEL_MIN_SETTLED} pariuri decontate (`/result`) pentru modelul personal."
+        await q.edit_message_text(text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 AI", callback_data="MENU_AI")]]))
+        return
+
+    if data == "strategy_arbitrage":
+        if len(odds_store) == 0:
+            await asyncio.to_thread(refresh_all_odds)
+        await q.edit_message_text(arbitrage_text(), reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔄 Refresh", callback_data="strategy_arbitrage_refresh"),
+             InlineKeyboardButton("🔙 Înapoi", callback_data="main_menu")]]))
+        return
+    if data == "strategy_arbitrage_refresh":
+        await asyncio.to_thread(refresh_all_odds)
+        await q.edit_message_text(arbitrage_text(), reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔄 Refresh", callback_data="strategy_arbitrage_refresh"),
+             InlineKeyboardButton("🔙 Înapoi", callback_data="main_menu")]]))
+        return
+
+    if data == "bankroll_risk":
+        risk_text = await asyncio.to_thread(bankroll_risk_report, str(user_id))
+        await q.edit_message_text(risk_text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Bankroll", callback_data="MENU_BANKROLL")]]))
+        return
+
     # Stats callbacks
     if data == "stats_monthly":
         user_id_str = str(update.effective_user.id) if update.effective_user else "unknown"
         monthly_chart = get_monthly_chart(user_id_str)
         await q.edit_message_text(f"📊 **Performance Lunar**\n\n{monthly_chart}", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Stats", callback_data="MENU_STATS")]]))
         return
-    if data == "stats_leaderboard":
-        leaderboard = get_leaderboard()
-        await q.edit_message_text(leaderboard, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Stats", callback_data="MENU_STATS")]]))
+    if data.startswith("stats_leaderboard") or data == "social_leaderboard":
+        period = data.split(":", 1)[1] if ":" in data else "all"
+        leaderboard = get_leaderboard(period, str(update.effective_user.id))
+        await q.edit_message_text(leaderboard, reply_markup=_kb_leaderboard())
         return
     if data == "stats_track":
         await q.edit_message_text("📋 **Track Pariu Nou**\n\nFolosește `/track Match | Market | Selection | Odds | Stake`\n\n**Exemplu:**\n`/track Arsenal vs Chelsea | 1X2 | Arsenal | 1.85 | 100`", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Stats", callback_data="MENU_STATS")]]))
@@ -1484,20 +1675,18 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # 👤 Account Menu
     if data == "MENU_ACCOUNT":
-        loading_msg = await send_loading_animation(update, "success")
-        await q.edit_message_text("👤⚡ **Loading contul tău...** 📊\n💎 **Account info loading...**", parse_mode='Markdown')
-        
-        await show_account_menu(update, context)
-        await delete_animation_message(loading_msg)
+        async with ProgressReporter(update, "success", message=q.message) as progress:
+            await progress.show("👤⚡ **Loading contul tău...** 📊\n💎 **Account info loading...**")
+
+            await show_account_menu(update, context)
         return
     
     # 💎 Subscription Menu
     if data == "MENU_SUBSCRIPTION":
-        loading_msg = await send_loading_animation(update, "money")
-        await q.edit_message_text("💎🚀 **Loading abonamente...** 💰\n⭐ **Premium plans loading...**", parse_mode='Markdown')
-        
-        await show_subscription_menu(update, context)
-        await delete_animation_message(loading_msg)
+        async with ProgressReporter(update, "money", message=q.message) as progress:
+            await progress.show("💎🚀 **Loading abonamente...** 💰\n⭐ **Premium plans loading...**")
+
+            await show_subscription_menu(update, context)
         return
     
     # Contact Admin
@@ -1577,9 +1766,8 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         if data == "ADMIN_USERS":
             # Show users list
-            from src.utils.subs import _load
-            data_users = _load()
-            users = data_users.get('users', {})
+            from src.utils.subs import list_users
+            users = list_users()
             
             if not users:
                 await q.edit_message_text("📭 **Niciun utilizator înregistrat.**", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin Dashboard", callback_data="ADMIN_REFRESH")]]))
@@ -1647,6 +1835,54 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 action = act.get('action', 'N/A')
                 stats_msg.append(f"• {timestamp} | {uid_short}... | {action}")
             
+            processor = context.application.update_processor
+            if isinstance(processor, PerUserUpdateProcessor):
+                m = processor.metrics()
+                stats_msg.extend([
+                    "",
+                    "⚙️ **PROCESARE UPDATE-URI:**",
+                    f"• Active: {m['active']} | În coadă: {m['queued']} ({m['users_pending']} utilizatori)",
+                    f"• Coadă max/utilizator: {m['max_user_depth']} (record {m['max_queue_depth']})",
+                    f"• Procesate: {m['processed']} | Erori: {m['failed']} | Așteptare medie: {m['avg_wait_ms']} ms",
+                    f"• Duplicate comasate: {m['collapsed']} | Respinse (limită): {m['dropped']}",
+                ])
+            pc = prediction_cache.summary()
+            stats_msg.extend([
+                "",
+                "♻️ **CACHE PREDICȚII:**",
+                f"• Meciuri: {pc['entries']} | Echipe (formă): {pc['teams']}",
+                f"• Refolosite: {pc['hits']} | Recalculate: {pc['computed']} | Cereri formă: {pc['form_fetches']}",
+            ])
+            for change in prediction_cache.recent_changes(3):
+                moved = "+".join("cote" if k == "odds" else "formă" for k in change["moved"])
+                before, after = change["before"] or {}, change["after"] or {}
+                stats_msg.append(f"• {change['match']} ({moved}): {before.get('selection')} @ {before.get('odds')}"
+                                 f" → {after.get('selection')} @ {after.get('odds')}")
+            op = odds_planner.summary()
+            stats_msg.extend([
+                "",
+                "📡 **REFRESH COTE:**",
+                f"• Evenimente în fereastră: {op['events']} ({op['sports']} competiții)",
+                f"• Listări complete: {op['discoveries']} | Delta: {op['deltas']} | Din memorie: {op['hits']}"
+                f" | Erori: {op['failed']}",
+                f"• Cereri rămase (Odds API): {op['remaining'] if op['remaining'] is not None else '-'}",
+            ])
+            eo = event_odds.summary()
+            stats_msg.append(f"• BTTS per eveniment: {eo['events']} în cache | Cereri: {eo['requests']}"
+                             f" (cost {eo['quota_used']}) | Din cache: {eo['hits']} | Amânate: {eo['skipped']}")
+            if refresh_scheduler.next_run:
+                stats_msg.append(f"• Refresh în fundal: {refresh_scheduler.runs} rulări, următorul în "
+                                 f"{max(0, int(refresh_scheduler.next_run - time.time()))}s")
+            if leader is not None:
+                lease = await asyncio.to_thread(shared_state.lease, leader.name)
+                stats_msg.extend([
+                    "",
+                    f"🤝 **WORKERS ({settings.workers}):**",
+                    f"• Acest worker: `{leader.holder}` ({'lider' if leader.is_leader else 'follower'})",
+                    f"• Lider: `{lease['holder'] if lease else '—'}`"
+                    + (f" (lease expiră în {max(0, int(lease['expires'] - time.time()))}s)" if lease else ""),
+                ])
+            
             keyboard = InlineKeyboardMarkup([
                 [InlineKeyboardButton("👥 Vezi Utilizatori", callback_data="ADMIN_USERS")],
                 [InlineKeyboardButton("🔙 Admin Dashboard", callback_data="ADMIN_REFRESH")]
@@ -1745,115 +1981,40 @@ async def on_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Live Center callbacks  
     if data == "live_matches":
         await send_animated_sticker(update, "live")
-        live_matches_text = """🔴 **LIVE MATCHES**
-
-⚽ **Arsenal vs Chelsea** - 1-0 (78')
-├ 📊 Shots: 12-8 Arsenal
-├ 🟨 Cards: 3-2  
-└ 🎯 Next goal odds: Arsenal 1.75, Chelsea 2.10
-
-⚽ **Bayern vs Dortmund** - 2-1 (65')  
-├ 📊 Possession: 58%-42% Bayern
-├ ⚡ xG: 2.1-1.4
-└ 🎯 Both teams to score: YES 1.45
-
-⚽ **Madrid vs Barcelona** - 0-0 (43')
-├ 📊 Very tight match
-├ 🎭 Red card risk: HIGH  
-└ 🎯 First goal: Madrid 1.90, Barca 1.85
-"""
         keyboard = [
             [InlineKeyboardButton("🔄 Refresh", callback_data="live_matches"), 
              InlineKeyboardButton("🎯 Live Bets", callback_data="live_picks")],
             [InlineKeyboardButton("🔙 Live Center", callback_data="MENU_LIVE")]
         ]
-        await q.edit_message_text(live_matches_text, reply_markup=InlineKeyboardMarkup(keyboard))
+        await q.edit_message_text(live_matches_text(), reply_markup=InlineKeyboardMarkup(keyboard))
         return
 
     if data == "live_alerts":
         await send_animated_sticker(update, "success")
-        alerts_text = """📱 **CONFIGURARE ALERTĂ**
-
-🔔 **Alertă Activă:**
-• ⚽ Goluri în timp real ✅
-• 📊 Schimbare cote >10% ✅  
-• 💰 Value bets EV >5% ✅
-• ⏰ HT/FT alerts ✅
-
-⚙️ **Comenzi rapide:**
-• `/alert goals on/off` - Toggle alertă goluri
-• `/alert odds 10` - Alertă cote >10%
-• `/alert value 5` - Alertă value >5%
-
-📨 **Ultimele alertă:**
-• 🚨 Arsenal goal! 78' (1-0)
-• 📈 Chelsea odds jumped +15%
-• 💎 VALUE: BTTS @ 2.10 (+12% EV)
-"""
         keyboard = [
-            [InlineKeyboardButton("🔔 Toggle Alerts", callback_data="toggle_alerts"), 
-             InlineKeyboardButton("⚙️ Settings", callback_data="alert_settings")],
             [InlineKeyboardButton("🔙 Live Center", callback_data="MENU_LIVE")]
         ]
-        await q.edit_message_text(alerts_text, reply_markup=InlineKeyboardMarkup(keyboard))
+        await q.edit_message_text(notify_settings_text(user_id), reply_markup=InlineKeyboardMarkup(keyboard))
         return
 
     if data == "live_picks":
         await send_animated_sticker(update, "prediction")
-        picks_text = """🎯 **LIVE PICKS** 
-
-🔥 **HOT OPPORTUNITIES:**
-
-⚡ **Chelsea +1 AH** @ 1.95
-├ EV: +8.2% 🎯
-├ Arsenal leading but Chelsea pressing  
-└ 82% win rate în similar situations
-
-💎 **Barcelona BTTS YES** @ 2.10
-├ EV: +12.5% 🔥🔥
-├ 0-0 HT, both teams attacking
-└ BTTS în 78% din El Clasico recent
-
-🎲 **Bayern Over 2.5 Team Goals** @ 2.30
-├ EV: +6.8% ⭐
-├ 2-1 lead, attacking substitutions  
-└ Averaged 3.1 goals/game last 5 matches
-"""
         keyboard = [
             [InlineKeyboardButton("🔄 Refresh Picks", callback_data="live_picks"), 
-             InlineKeyboardButton("📊 More Details", callback_data="live_analysis")],
+             InlineKeyboardButton("📊 Odds Monitor", callback_data="live_odds")],
             [InlineKeyboardButton("🔙 Live Center", callback_data="MENU_LIVE")]
         ]
-        await q.edit_message_text(picks_text, reply_markup=InlineKeyboardMarkup(keyboard))
+        await q.edit_message_text(live_picks_text(), reply_markup=InlineKeyboardMarkup(keyboard))
         return
 
     if data == "live_odds":
         await send_animated_sticker(update, "money")
-        odds_text = """📊 **ODDS MONITOR**
-
-📈 **BIGGEST MOVEMENTS:**
-
-🔥 **Chelsea Win** (vs Arsenal)
-├ Was: 3.20 → Now: 4.50 (+40.6%) 📈
-├ Movement: Arsenal scored 78'
-└ Opportunity: Value increased significantly
-
-⚡ **Barcelona BTTS** 
-├ Was: 1.85 → Now: 2.10 (+13.5%) 📈  
-├ Movement: Defensive first half
-└ Status: 🎯 STRONG VALUE
-
-📉 **Bayern -1 AH**
-├ Was: 2.10 → Now: 1.75 (-16.7%) 📉
-├ Movement: Bayern scored 2-1 lead
-└ Status: ❌ Value decreased
-"""
         keyboard = [
             [InlineKeyboardButton("🔄 Refresh Odds", callback_data="live_odds"),
              InlineKeyboardButton("⚠️ Set Alerts", callback_data="live_alerts")],
             [InlineKeyboardButton("🔙 Live Center", callback_data="MENU_LIVE")]
         ]
-        await q.edit_message_text(odds_text, reply_markup=InlineKeyboardMarkup(keyboard))
+        await q.edit_message_text(odds_monitor_text(), reply_markup=InlineKeyboardMarkup(keyboard))
         return
 
 
@@ -1878,8 +2039,10 @@ async def cmd_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 **🚀 Funcții Avansate:**
 • `/stats` - Analytics personal și statistici
+• `/track` / `/result` - Înregistrează și decontează pariuri
 • `/bankroll` - Management fonduri cu Kelly Criterion
 • `/live` - Center live cu alertă goluri
+• `/notify` - Alerte push (goluri, cote, value bets)
 • `/strategies` - Tools avansate (arbitrage, value)
 
 **🔒 Abonamente:**
@@ -1919,8 +2082,9 @@ async def cmd_express(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 max_odds = float(args[1])
                 legs = int(args[2])
                 context.user_data["exp_cfg"] = {"legs": legs, "min": min_odds, "max": max_odds}
-                await update.message.reply_text(tr(lang,"processing"))
-                await build_express(update, context, lang)
+                async with ProgressReporter(update, "money") as progress:
+                    await progress.show(tr(lang,"processing"))
+                    await build_express(update, context, lang, progress)
                 return
             except (ValueError, IndexError):
                 pass
@@ -1955,8 +2119,9 @@ async def cmd_express(update: Update, context: ContextTypes.DEFAULT_TYPE):
             max_odds = float(args[1])
             legs = int(args[2])
             context.user_data["exp_cfg"] = {"legs": legs, "min": min_odds, "max": max_odds}
-            await update.message.reply_text(tr(lang,"processing"))
-            await build_express(update, context, lang)
+            async with ProgressReporter(update, "money") as progress:
+                await progress.show(tr(lang,"processing"))
+                await build_express(update, context, lang, progress)
             return
         except (ValueError, IndexError):
             pass
@@ -1966,65 +2131,28 @@ async def cmd_express(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(tr(lang,"wizard_title"), reply_markup=_kb_express(lang))
 
 
-async def build_express(update: Update, context: ContextTypes.DEFAULT_TYPE, lang: str):
+async def build_express(update: Update, context: ContextTypes.DEFAULT_TYPE, lang: str, progress=None):
     """Build enhanced express with detailed leg information and combined metrics"""
     cfg = context.user_data.get("exp_cfg", {"legs":3, "min":2.0, "max":4.0})
     
     date_iso = today_iso()
     token = settings.football_data_token
-    matches = get_matches_for_date(token, TOP_COMP_CODES, date_iso)
+    matches = await asyncio.to_thread(fixtures_repo.matches_for_date, date_iso)
     
     if not matches:
+        await _finish(progress)
         await _reply(update, tr(lang,"no_matches"), reply_markup=_kb_main(lang))
         return
+    _stage(progress, f"**{len(matches)} meciuri găsite** - caut cotele...")
     
     # Fetch odds
-    odds_all = {}
-    odds_unavailable = False
-    if settings.odds_api_key:
-        for code in set([m["competition"] for m in matches]):
-            sport_key = ODDS_SPORT_KEYS.get(code)
-            if not sport_key: continue
-            try:
-                data = get_odds_for_sport(
-                    settings.odds_api_key, 
-                    sport_key, 
-                    regions=settings.odds_regions or "uk,eu", 
-                    markets="h2h,totals"
-                )
-                if data and data[0]:
-                    odds_all[code] = data[0]
-            except:
-                continue
-    else:
-        odds_unavailable = True
+    odds_all, odds_unavailable = await asyncio.to_thread(_prefetch_odds, matches)
+    _stage(progress, "**Cote potrivite** - aleg selecțiile...")
 
     # Build candidate picks
-    picks = []
-    for m in matches:
-        home_form = compute_form_points(get_team_recent_results(token, m["home_id"], date_iso), "HOME")
-        away_form = compute_form_points(get_team_recent_results(token, m["away_id"], date_iso), "AWAY")
-        p_form = probs_from_form(home_form-away_form)
-
-        odds_events = odds_all.get(m["competition"], [])
-        odds_probs, odds_tuple = (None, None)
-        if odds_events:
-            odds_probs, odds_tuple = match_odds_for_fixture(odds_events, m["home_name"], m["away_name"])
-
-        p_comb = blend_probs(odds_probs, p_form, m["home_name"], m["away_name"], w_odds=0.8 if odds_probs else 0.0)
-        if not odds_tuple:
-            odds_tuple = (max(1.01,1.0/max(1e-6,p_comb[0])),
-                          max(1.01,1.0/max(1e-6,p_comb[1])),
-                          max(1.01,1.0/max(1e-6,p_comb[2])))
-        idx = int(max(range(3), key=lambda i: p_comb[i]))
-        selection = ["Home","Draw","Away"][idx]
-        o_sel = odds_tuple[idx]
-        picks.append({
-            "match": f'{m["home_name"]} vs {m["away_name"]}', 
-            "selection": selection, 
-            "p_est": float(max(p_comb)), 
-            "odds": float(o_sel)
-        })
+    picks = [{"match": p["match"], "selection": p["selection"], "p_est": p["p_est"], "odds": p["odds"]}
+             for p in await asyncio.to_thread(_h2h_candidates, matches, odds_all, token, date_iso)]
+    await _finish(progress)
 
     # Apply user-specific diversification to candidate pool before greedy selection  
     user_id = update.effective_user.id
@@ -2117,25 +2245,16 @@ async def cmd_track(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     'ev': 0.0,  # Would calculate from our predictions
                     'probability': 0.0
                 }
+                # Settled on this fixture's match day (it may be several days out)
+                fixture = await asyncio.to_thread(settler.fixture_for, match)
+                if fixture is not None:
+                    bet_data['match_id'] = fixture['match_id']
+                    bet_data['kickoff'] = fixture.get('utcDate')
                 
-                add_bet_record(user_id, bet_data)
+                bet = add_bet_record(user_id, bet_data)
                 
-                # Update user stats
+                # Stats are derived from the ledger (updated by its listener)
                 stats = load_user_stats(user_id)
-                stats['total_bets'] = stats.get('total_bets', 0) + 1
-                stats['pending_bets'] = stats.get('pending_bets', 0) + 1
-                stats['total_staked'] = stats.get('total_staked', 0.0) + stake
-                stats['last_bet'] = bet_data
-                
-                # Update market performance
-                if 'market_performance' not in stats:
-                    stats['market_performance'] = {}
-                if market not in stats['market_performance']:
-                    stats['market_performance'][market] = {'bets': 0, 'wins': 0, 'profit': 0.0}
-                
-                stats['market_performance'][market]['bets'] += 1
-                
-                save_user_stats(user_id, stats)
                 
                 success_text = f"""✅ **Pariu înregistrat cu succes!**
 
@@ -2154,7 +2273,7 @@ async def cmd_track(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 💡 **Next steps:**
 • Folosește `/stats` pentru analiza detaliată
-• Update rezultat cu `/result {stats['total_bets']} won/lost`
+• Se decontează automat după fluierul final (sau `/result {bet['id']} won/lost`)
 """
                 
                 await _reply(update, success_text, reply_markup=_kb_main(lang))
@@ -2191,6 +2310,121 @@ Folosește formatul: `/track Arsenal vs Chelsea | 1X2 | Arsenal | 1.85 | 100`
     await _reply(update, help_text, reply_markup=_kb_main(lang))
 
 
+def _kb_leaderboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🏆 Total", callback_data="stats_leaderboard:all"),
+         InlineKeyboardButton("📅 Săptămână", callback_data="stats_leaderboard:week"),
+         InlineKeyboardButton("🗓️ Lună", callback_data="stats_leaderboard:month")],
+        [InlineKeyboardButton("🔙 Stats", callback_data="MENU_STATS")]
+    ])
+
+
+async def cmd_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """🏆 /leaderboard [week|month]"""
+    user_id = str(update.effective_user.id) if update.effective_user else "unknown"
+    period = {'week': 'week', 'saptamana': 'week', 'month': 'month', 'luna': 'month'}.get(
+        (context.args[0].lower() if context.args else ''), 'all')
+    await _reply(update, get_leaderboard(period, user_id), reply_markup=_kb_leaderboard())
+
+
+async def cmd_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """✅ Settle a tracked bet: /result <id> won|lost|void [return]"""
+    user_id = str(update.effective_user.id) if update.effective_user else "unknown"
+    lang = get_lang(user_id)
+
+    args = context.args or []
+    if len(args) >= 2 and args[1].lower() in ('won', 'lost', 'void'):
+        try:
+            bet_id = int(args[0].lstrip('#'))
+            actual_return = float(args[2]) if len(args) >= 3 else 0.0
+        except ValueError:
+            bet_id = None
+        if bet_id is not None:
+            bet = update_bet_result(user_id, bet_id, args[1].lower(), actual_return)
+            if bet is None:
+                await _reply(update, f"⚠️ Pariul #{bet_id} nu există, nu îți aparține sau este deja decontat.",
+                             reply_markup=_kb_main(lang))
+                return
+            emoji = {'won': '✅', 'lost': '❌', 'void': '↩️'}[bet['status']]
+            await _reply(update, (
+                f"{emoji} **Pariu #{bet['id']} decontat: {bet['status'].upper()}**\n\n"
+                f"🆚 {bet['match']} | {bet['market']} | {bet['selection']} @ {bet['odds']}\n"
+                f"💳 Stake: {bet['stake']:.0f} RON | 💰 Retur: {bet.get('actual_return', 0.0):.0f} RON\n\n"
+                f"📊 Vezi `/stats` pentru statistici actualizate"
+            ), reply_markup=_kb_main(lang))
+            return
+
+    pending = load_user_bets(user_id)
+    pending = [b for b in pending if b.get('status') == 'pending']
+    lines = ["✅ **Decontare pariu**", "", "Folosește: `/result <id> won|lost|void [retur]`", ""]
+    if pending:
+        lines.append("⏳ **Pariuri în așteptare:**")
+        lines.extend(f"• #{b['id']} {b['match']} | {b['market']} | {b['selection']} @ {b['odds']}"
+                     for b in pending[-10:])
+    else:
+        lines.append("📭 Nu ai pariuri în așteptare. Folosește /track pentru a adăuga.")
+    await _reply(update, "\n".join(lines), reply_markup=_kb_main(lang))
+
+
+def bankroll_risk_report(user_id: str, prob_odds: tuple | None = None) -> str:
+    """Monte Carlo risk report for the user's staking plan (history, or Kelly vs flat)"""
+    stats = load_user_stats(user_id)
+    bankroll = stats.get('bankroll', 0.0) or 1000.0
+    settled = [b for b in load_user_bets(user_id) if b.get('status') in ('won', 'lost')]
+
+    runs = []
+    if prob_odds is None and len(settled) >= 10:
+        runs.append((f"📋 Istoricul tău ({len(settled)} pariuri)", history_plan(settled, bankroll)))
+    else:
+        prob, odds = prob_odds or (0.55, 1.90)
+        kelly = kelly_criterion_stake(prob, odds, bankroll)
+        if 'kelly_fraction' in kelly and kelly['kelly_fraction'] > 0:
+            runs.append((f"🎯 Kelly fracționat ({kelly['kelly_fraction'] * 100:.1f}%) @ {odds:.2f}",
+                         kelly_plan(prob, odds, kelly['kelly_fraction'])))
+        runs.append((f"💳 Stake fix 2% @ {odds:.2f}", flat_plan(prob, odds, bankroll * 0.02, bankroll)))
+
+    lines = ["🎲 **Simulare Monte Carlo Bankroll**", f"💳 Bankroll: {bankroll:.0f} RON", ""]
+    for label, plan in runs:
+        sim = simulate_bankroll(plan)
+        if 'error' in sim:
+            lines.extend([label, f"• {sim['error']}", ""])
+            continue
+        dd, growth = sim['drawdown'], sim['growth']
+        lines.extend([
+            f"**{label}**",
+            f"• ☠️ Risc de ruină (-50%): {sim['ruin_probability']:.2f}%",
+            f"• 📉 Drawdown median/P95: {dd['p50']:.1f}% / {dd['p95']:.1f}%",
+            f"• 📈 Bankroll după {sim['n_bets']} pariuri: P5 {growth['p5'] * bankroll:.0f} | "
+            f"median {growth['p50'] * bankroll:.0f} | P95 {growth['p95'] * bankroll:.0f} RON",
+            ""
+        ])
+    lines.append(f"🔬 {DEFAULT_SIM_PATHS // 1000}k scenarii simulate • `/bankroll sim 0.55 1.90` pentru alt pariu")
+    return "\n".join(lines)
+
+
+def slate_allocation_text(slate: list, bankroll: float) -> str:
+    """Joint (portfolio Kelly) stakes for a slate of simultaneous bets"""
+    result = portfolio_kelly(slate, bankroll)
+    if 'error' in result:
+        return f"⚠️ Slate invalid: {result['error']}"
+
+    lines = [f"📐 **Alocare comună ({len(slate)} pariuri simultane):**"]
+    for bet in result['bets']:
+        label = bet.get('match') or f"p={bet['probability']:.2f}"
+        if bet.get('selection'):
+            label += f" ({bet['selection']})"
+        lines.append(
+            f"• {label} @ {float(bet['odds']):.2f}: **{bet['joint_stake']:.0f} RON** "
+            f"({bet['joint_fraction'] * 100:.1f}%) | separat {bet['independent_stake']:.0f}"
+        )
+    lines.extend([
+        f"💼 Expunere totală: {result['total_stake']:.0f} RON ({result['total_fraction'] * 100:.1f}%) "
+        f"vs {result['independent_total_stake']:.0f} RON calculat separat",
+        f"🔬 {'Toate' if result['method'] == 'exact' else 'Eșantion de'} {result['scenarios']} scenarii"
+    ])
+    return "\n".join(lines)
+
+
 async def cmd_bankroll(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """💰 Smart bankroll management"""
     user_id = str(update.effective_user.id) if update.effective_user else "unknown"
@@ -2198,6 +2432,29 @@ async def cmd_bankroll(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     stats = load_user_stats(user_id)
     
+    # Monte Carlo risk report: /bankroll sim [prob odds]
+    if context.args and context.args[0].lower() == "sim":
+        try:
+            prob_odds = (float(context.args[1]), float(context.args[2])) if len(context.args) >= 3 else None
+        except ValueError:
+            prob_odds = None
+        risk_text = await asyncio.to_thread(bankroll_risk_report, user_id, prob_odds)
+        await _reply(update, risk_text, reply_markup=_kb_main(lang))
+        return
+
+    # Joint stakes for a slate: /bankroll slate 0.55@1.90 0.60@1.75 ...
+    if context.args and context.args[0].lower() == "slate" and len(context.args) >= 2:
+        try:
+            slate = [{"probability": float(p), "odds": float(o)}
+                     for p, o in (leg.split("@") for leg in context.args[1:])]
+        except ValueError:
+            slate = []
+        if slate:
+            context.user_data['slate'] = slate
+            bankroll = stats.get('bankroll', 0.0) or 1000.0
+            await _reply(update, slate_allocation_text(slate, bankroll), reply_markup=_kb_main(lang))
+            return
+
     # Handle bankroll commands with arguments
     if context.args and len(context.args) >= 2:
         command = context.args[0].lower()
@@ -2268,6 +2525,8 @@ async def cmd_bankroll(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • `/bankroll set 1000` - Setează 1000 RON
 • `/bankroll add 500` - Adaugă 500 RON
 • `/bankroll reset` - Resetează totul
+• `/bankroll sim` - Simulare Monte Carlo (risc de ruină)
+• `/bankroll slate 0.55@1.90 0.60@1.75` - Stake-uri comune
 
 📊 **Funcții Kelly Criterion:**
 • Calculare automată a stakilor optimi
@@ -2310,7 +2569,12 @@ async def cmd_bankroll(update: Update, context: ContextTypes.DEFAULT_TYPE):
 📝 **Comenzi:**
 • `/bankroll add 500` - Adaugă funds
 • `/bankroll reset` - Resetează bankroll
+• `/bankroll sim` - Simulare Monte Carlo (risc de ruină)
+• `/bankroll slate 0.55@1.90 0.60@1.75` - Stake-uri comune
 """
+        slate = context.user_data.get('slate')
+        if slate:
+            status_text += "\n" + slate_allocation_text(slate, current_bankroll)
         help_text = status_text
     
     keyboard = [
@@ -2325,17 +2589,175 @@ async def cmd_bankroll(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await _reply(update, help_text, reply_markup=reply_markup)
 
 
+LIVE_EVENT_LABELS = {
+    "GOAL": "⚽ GOL", "GOAL_CANCELLED": "🚫 Gol anulat", "KICKOFF": "🟢 Start",
+    "HALF_TIME": "⏸️ Pauză", "SECOND_HALF": "▶️ Repriza 2", "FULL_TIME": "🏁 Final",
+}
+
+
+def _live_event_line(event: dict) -> str:
+    label = LIVE_EVENT_LABELS.get(event["type"], event["type"])
+    team = f" {event['team']}" if event.get("team") else ""
+    return f"• {label}{team}: {event['match']} {event['score'][0]}-{event['score'][1]} ({event['minute']})"
+
+
+def live_matches_text() -> str:
+    """Live table from the live engine (no upstream request)"""
+    rows = live_engine.live_matches()
+    lines = ["🔴 **LIVE MATCHES**", ""]
+    if not rows:
+        lines.append("😴 Niciun meci live acum în competițiile urmărite.")
+    for row in rows:
+        finished = row["status"] not in LIVE_STATUSES
+        lines.append(f"{'🏁' if finished else '⚽'} **{row['home_name']} vs {row['away_name']}** - "
+                     f"{row['score'][0]}-{row['score'][1]} ({row['display_minute']})")
+        goals = [e for e in live_engine.recent_events(50) if e["match_id"] == row["match_id"] and e["type"] == "GOAL"]
+        lines.append(f"└ {row['competition']} • " + (", ".join(f"{e['team']} {e['minute']}" for e in reversed(goals)) or "fără goluri"))
+        lines.append("")
+    if live_engine.last_poll:
+        lines.append(f"🕐 Actualizat acum {int(time.time() - live_engine.last_poll)}s")
+    return "\n".join(lines)
+
+
+def live_picks_text() -> str:
+    """Best current prices for the live matches, from the odds store"""
+    rows = live_engine.live_matches(include_finished=False)
+    lines = ["🎯 **LIVE PICKS**", ""]
+    if not rows:
+        lines.append("😴 Niciun meci live acum - picks live apar la primul fluier.")
+        return "\n".join(lines)
+    for row in rows:
+        lines.append(f"⚡ **{row['home_name']} vs {row['away_name']}** {row['score'][0]}-{row['score'][1]} ({row['display_minute']})")
+        event_id = odds_store.find_event(row["home_name"], row["away_name"])
+        best = odds_store.best_prices(event_id) if event_id else {}
+        if len(best) == 3:
+            fav = min(best, key=lambda k: best[k]["price"])
+            lines.append(f"├ 1: {best['Home']['price']:.2f} | X: {best['Draw']['price']:.2f} | 2: {best['Away']['price']:.2f}")
+            lines.append(f"└ Favorit acum: {fav} @ {best[fav]['price']:.2f} ({best[fav]['bookmaker']})")
+        else:
+            lines.append("└ Cote live indisponibile")
+        lines.append("")
+    lines.append("💡 Cotele live se mișcă rapid - verifică înainte de a paria!")
+    return "\n".join(lines)
+
+
+def route_live_alert(dispatcher: AlertDispatcher, event: dict) -> None:
+    """Live engine listener: goals and HT/FT whistles to 'goals' subscribers"""
+    if event["type"] == "KICKOFF":
+        return
+    chats = alert_registry.subscribers("goals", str(event["match_id"]))
+    dispatcher.publish(chats, format_live_alert(event))
+
+
+def route_settlement(dispatcher: AlertDispatcher, fixture: dict, bets: list) -> None:
+    """Settler listener: tell each bettor how their bets on the fixture were graded"""
+    home, away = fixture.get("home_name"), fixture.get("away_name")
+    goals_home, goals_away = final_score(fixture) or ("?", "?")
+    icons = {"won": "✅", "lost": "❌", "void": "↩️"}
+    for bet in bets:
+        if not str(bet["user_id"]).lstrip("-").isdigit():
+            continue
+        dispatcher.publish([int(bet["user_id"])],
+                           f"{icons[bet['status']]} #{bet['id']} {home} {goals_home}-{goals_away} {away}: "
+                           f"{bet['market']} {bet['selection']} @ {bet['odds']} → {bet['status'].upper()} "
+                           f"({bet['actual_return']:.0f} RON)")
+
+
+def route_odds_alert(dispatcher: AlertDispatcher, signal: dict) -> None:
+    """Movement tracker listener: odds moves, plus value when a drift beats the consensus price"""
+    dispatcher.publish(alert_registry.subscribers("odds", signal["event_id"], signal["change_pct"]),
+                       format_odds_alert(signal))
+    if signal["direction"] != "drifting":
+        return
+    meta = odds_store.events.get(signal["event_id"], {})
+    outcome = {meta.get("home_team"): "Home", meta.get("away_team"): "Away"}.get(signal["outcome"], signal["outcome"])
+    probability = odds_store.consensus_probability(signal["event_id"], signal["market"], outcome, signal["line"] or 0.0)
+    if probability:
+        ev_pct = (signal["to"] * probability - 1.0) * 100
+        if ev_pct > 0:
+            dispatcher.publish(alert_registry.subscribers("value", signal["event_id"], ev_pct),
+                               format_value_alert(signal, ev_pct, probability))
+
+
+def notify_settings_text(chat_id: int) -> str:
+    """Current /notify subscriptions of a chat"""
+    subs = alert_registry.settings_for(chat_id)
+    labels = {"goals": "⚽ Goluri & HT/FT", "odds": "📊 Schimbare cote", "value": "💎 Value bets"}
+    lines = ["📱 **CONFIGURARE ALERTĂ**", "", "🔔 **Alerte active:**"]
+    for alert_type in ALERT_TYPES:
+        for event_key, threshold in subs.get(alert_type, {}).items():
+            scope = "toate meciurile" if event_key == ALL_EVENTS else f"meci {event_key}"
+            limit = f" ≥{threshold:g}%" if alert_type != "goals" else ""
+            lines.append(f"• {labels[alert_type]}{limit} ({scope}) ✅")
+    if not subs:
+        lines.append("• Nicio alertă activă")
+    lines.extend([
+        "",
+        "⚙️ **Comenzi:**",
+        "• `/notify goals on|off` - Alertă goluri",
+        "• `/notify odds 10` - Alertă schimbare cote >10%",
+        "• `/notify value 5` - Alertă value bets EV >5%",
+        "• `/notify goals on <match_id>` - Doar un meci",
+        "• `/notify off` - Oprește toate alertele",
+    ])
+    return "\n".join(lines)
+
+
+async def cmd_notify(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """🔔 Push alert subscriptions: /notify goals on | odds 10 | value 5 | off"""
+    chat_id = update.effective_chat.id
+    lang = get_lang(update.effective_user.id)
+    args = [a.lower() for a in (context.args or [])]
+
+    if args == ["off"]:
+        alert_registry.unsubscribe(chat_id)
+        await _reply(update, "🔕 Toate alertele au fost oprite.", reply_markup=_kb_main(lang))
+        return
+
+    if len(args) >= 2 and args[0] in ALERT_TYPES:
+        alert_type, value = args[0], args[1]
+        event_key = args[2] if len(args) >= 3 else ALL_EVENTS
+        if value == "off":
+            alert_registry.unsubscribe(chat_id, alert_type, event_key if len(args) >= 3 else None)
+            await _reply(update, f"🔕 Alertă {alert_type} oprită.", reply_markup=_kb_main(lang))
+            return
+        try:
+            threshold = None if value == "on" else float(value.rstrip("%"))
+        except ValueError:
+            threshold = -1
+        if threshold is None or threshold >= 0:
+            alert_registry.subscribe(chat_id, alert_type, threshold, event_key)
+            await _reply(update, "✅ Alertă activată!\n\n" + notify_settings_text(chat_id), reply_markup=_kb_main(lang))
+            return
+
+    await _reply(update, notify_settings_text(chat_id), reply_markup=_kb_main(lang))
+
+
 async def cmd_live(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """⚡ Live match alerts and notifications"""
     user_id = str(update.effective_user.id) if update.effective_user else "unknown"
     lang = get_lang(user_id)
     
-    live_text = """⚡ **Live Match Center** 
+    live_rows = live_engine.live_matches(include_finished=False)
+    if live_rows:
+        now_lines = "\n".join(
+            f"• {r['home_name']} vs {r['away_name']} - {r['score'][0]}-{r['score'][1]} ({r['display_minute']}) "
+            f"{'⏸️' if r['status'] == 'PAUSED' else '⚽'}"
+            for r in live_rows[:8]
+        )
+    else:
+        now_lines = "• Niciun meci live în acest moment 😴"
+
+    events = live_engine.recent_events(3)
+    event_lines = "\n".join(_live_event_line(e) for e in events) if events else "• Încă nimic - revino la primul fluier!"
+
+    live_text = f"""⚡ **Live Match Center** 
 
 🔴 **LIVE ACUM:**
-• Arsenal vs Chelsea - 1-0 (78') ⚽
-• Bayern vs Dortmund - 2-1 (65') 🔥
-• Madrid vs Barcelona - 0-0 (43') 😴
+{now_lines}
+
+📢 **Ultimele evenimente:**
+{event_lines}
 
 📱 **Notificări Active:**
 • 🚨 Value bets (EV >5%)
@@ -2343,19 +2765,10 @@ async def cmd_live(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • 📊 Odds movements >10%
 • ⏰ HT/FT whistle alerts
 
-🎯 **Live Opportunities:**
-• Arsenal Over 1.5 goals ✅ HIT!
-• Bayern BTTS ✅ HIT!  
-• Madrid Under 0.5 goals ❌ MISS
-
 ⚙️ **Configurare Alertă:**
 • `/notify goals on` - Alertă goluri
 • `/notify odds 10` - Alertă schimbare cote >10%
 • `/notify value 5` - Alertă value bets >5%
-
-🔥 **Hot Picks LIVE:**
-• Chelsea +1 AH @ 1.95 | EV: +8.2%
-• Barcelona BTTS @ 2.10 | EV: +12.5%
 """
 
     keyboard = [
@@ -2370,12 +2783,70 @@ async def cmd_live(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await _reply(update, live_text, reply_markup=reply_markup)
 
 
+def odds_monitor_text(limit: int = 6) -> str:
+    """Biggest odds movements and steam moves from the movement tracker"""
+    movers = movement_tracker.biggest_movers(limit)
+    lines = ["📊 **ODDS MONITOR**", "", "📈 **BIGGEST MOVEMENTS:**", ""]
+    if not movers:
+        lines.append("😴 Nicio mișcare semnificativă de cote încă (prag 10% sau steam pe 3+ case).")
+        return "\n".join(lines)
+
+    for signal in movers:
+        outcome = signal['outcome'] + (f" {signal['line']:g}" if signal['line'] is not None else "")
+        arrow = "📈" if signal['direction'] == 'drifting' else "📉"
+        lines.append(f"{'🔥' if signal['type'] == 'steam' else '⚡'} **{outcome}** ({signal['match']}) - {signal['market'].upper()}")
+        if signal['type'] == 'steam':
+            lines.append(f"├ STEAM: {len(signal['bookmakers'])} case în aceeași direcție ({', '.join(signal['bookmakers'][:4])})")
+            lines.append(f"└ Acum: {signal['to']:.2f} ({signal['change_pct']:+.1f}%) {arrow}")
+        else:
+            lines.append(f"├ Was: {signal['from']:.2f} → Now: {signal['to']:.2f} ({signal['change_pct']:+.1f}%) {arrow}")
+            lines.append(f"└ Casa: {signal['bookmaker']}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def refresh_all_odds() -> None:
+    """Refresh the due h2h + totals odds of every tracked competition (feeds the odds store via listener)"""
+    odds_planner.refresh_all(ODDS_SPORT_KEYS.values())
+
+
+def arbitrage_text(limit: int = 8) -> str:
+    """Ranked arbitrage board from the odds store"""
+    opportunities = get_arbitrage_opportunities(limit=limit)
+    summary = arbitrage_summary()
+    lines = ["💎 **Arbitrage Scanner**",
+             f"📊 {summary['events']} meciuri scanate • {summary['sure_bets']} sure-bets • {summary['near_arbs']} near-arbs",
+             ""]
+    if not opportunities:
+        lines.append("😴 Nicio oportunitate acum - revino după următorul refresh de cote.")
+        return "\n".join(lines)
+
+    for i, opp in enumerate(opportunities, 1):
+        market = opp['market'].upper() + (f" {opp['line']:g}" if opp['line'] is not None else "")
+        tag = "✅ SURE-BET" if opp['sure_bet'] else "🟡 near-arb"
+        lines.append(f"**{i}. {opp['match']}** - {market}")
+        lines.append(f"├ {tag}: {opp['profit_margin']:+.2f}% (carte {opp['book_percentage']:.1f}%)")
+        for leg in opp['legs']:
+            lines.append(f"├ {leg['outcome']} @ {leg['odds']:.2f} ({leg['bookmaker']}) → {leg['stake']:.0f} RON")
+        lines.append("")
+    lines.append(f"💡 Stake-uri pentru {opportunities[0]['total_stake']:.0f} RON total • verifică cotele înainte de a paria!")
+    return "\n".join(lines)
+
+
 async def cmd_strategies(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """🎯 Advanced betting strategies and tools"""
     user_id = str(update.effective_user.id) if update.effective_user else "unknown"
     lang = get_lang(user_id)
     
-    strategies_text = """🎯 **Strategii Avansate de Betting**
+    arb = arbitrage_summary()
+    if arb['sure_bets']:
+        arb_line = f"{arb['sure_bets']} arbitrage detectate (profit {arb['min_margin']:.1f}-{arb['max_margin']:.1f}%)"
+    elif arb['events']:
+        arb_line = f"0 arbitrage acum, {arb['near_arbs']} aproape (<1% marjă) din {arb['events']} meciuri"
+    else:
+        arb_line = "Arbitrage: apasă 💎 pentru scanare"
+
+    strategies_text = f"""🎯 **Strategii Avansate de Betting**
 
 💎 **Arbitrage Scanner**
 • Detectează oportunități de arbitraj
@@ -2408,7 +2879,7 @@ async def cmd_strategies(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • Adaptare strategies la profilul tău de risc
 
 🔥 **TODAY'S OPPORTUNITIES:**
-• 3 arbitrage detectate (profit 2.1-4.3%)
+• {arb_line}
 • 12 value bets cu EV > 5%
 • Express optim: 4 legs, 6.2x odds, 34% prob
 """
@@ -2514,9 +2985,9 @@ async def cmd_ai(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Load user data for analysis
     stats = load_user_stats(user_id)
     
-    # For demo, create sample betting history
-    sample_history = []
-    if stats.get('total_bets', 0) < 5:
+    # Patterns come from incremental per-user counters (no history scan)
+    patterns = analyze_betting_patterns(user_id)
+    if 'error' in patterns or patterns['total_bets'] < 5:
         ai_text = """🤖 **Personal AI Assistant**
 
 🔍 **Learning Status:** Insufficient Data
@@ -2550,55 +3021,79 @@ async def cmd_ai(update: Update, context: ContextTypes.DEFAULT_TYPE):
 💡 **Start tracking bets with `/track` to unlock AI features!**
 """
     else:
-        # Analyze patterns (simulated for demo)
-        patterns = {
-            'favorite_markets': {'1X2': 8, 'OU25': 5, 'BTTS': 3},
-            'risk_profile': 'moderate',
-            'win_rate_by_market': {'1X2': 62.5, 'OU25': 60.0, 'BTTS': 66.7},
-            'win_rate_by_odds_range': {'low': 70.0, 'medium': 55.0, 'high': 45.0}
-        }
-        
-        # Generate recommendations
-        insights = [
-            "📊 Preferi piața 1X2 (50% din pariuri)",
-            "🏆 Cea mai bună piață: BTTS (66.7% win rate)", 
-            "💰 Performezi cel mai bine la cote mici (70% win rate)",
-            "⚖️ Profil moderat - balans bun între risc și recompensă"
-        ]
-        
+        insights = [line for line in generate_insights(patterns) if line]
         strategy_rec = get_strategy_recommendation(patterns, stats.get('bankroll', 1000))
-        
+        strategy = strategy_rec['recommended_strategy']
+
+        # Strengths per market / odds band (settled bets only)
+        strengths = []
+        by_market = patterns['win_rate_by_market']
+        if by_market:
+            best_market = max(by_market.items(), key=lambda x: x[1])
+            strengths.append(f"• Piața ta cea mai bună: {best_market[0]} ({best_market[1]:.1f}% win rate)")
+        by_odds = patterns['win_rate_by_odds_range']
+        if by_odds:
+            best_band = max(by_odds.items(), key=lambda x: x[1])
+            strengths.append(f"• Cote {best_band[0]}: {best_band[1]:.1f}% win rate")
+        if not strengths:
+            strengths.append("• Decontează pariurile cu `/result` pentru rate de câștig pe piețe")
+
+        # Behaviour after wins / losses
+        after_wins = patterns['streak_behavior']['after_wins']
+        after_losses = patterns['streak_behavior']['after_losses']
+        alerts = []
+        if after_losses['bets'] >= 3 and after_wins['bets'] >= 3 and \
+                after_losses['avg_stake'] > 1.3 * after_wins['avg_stake']:
+            alerts.append(f"• ⚠️ Mărești miza după pierderi ({after_losses['avg_stake']:.0f} vs "
+                          f"{after_wins['avg_stake']:.0f} RON după câștiguri) - risc de chasing")
+        if after_losses['bets'] >= 3 and after_wins['bets'] >= 3 and \
+                after_losses['avg_odds'] > 1.3 * after_wins['avg_odds']:
+            alerts.append(f"• ⚠️ Cote mai mari după pierderi ({after_losses['avg_odds']:.2f} vs "
+                          f"{after_wins['avg_odds']:.2f})")
+        if patterns['risk_profile'] == 'aggressive':
+            alerts.append("• ⚠️ Profil agresiv: respectă limita de 5% din bankroll pe pariu")
+        if not alerts:
+            alerts.append("• Niciun tipar periculos detectat ✅")
+
+        model = model_trainer.model(user_id)
+        if model is not None:
+            model_line = (f"✅ Model personal antrenat pe {model['n_samples']} pariuri "
+                          f"({dt.datetime.fromtimestamp(model['trained_at']):%d.%m %H:%M})")
+        else:
+            model_line = f"⏳ Model personal: {patterns['settled_bets']}/{MODEL_MIN_SETTLED} pariuri decontate"
+
+        def _after_line(label, row):
+            if not row['bets']:
+                return f"• {label}: fără date"
+            wr = f" | WR {row['win_rate']:.0f}%" if row['win_rate'] is not None else ""
+            return f"• {label}: {row['bets']} pariuri | miză medie {row['avg_stake']:.0f} RON | cotă {row['avg_odds']:.2f}{wr}"
+
         ai_text = f"""🤖 **Personal AI Assistant**
 
-🔍 **Analysis Complete** - Based on {stats.get('total_bets', 0)} tracked bets
+🔍 **Analysis Complete** - Based on {patterns['total_bets']} tracked bets ({patterns['settled_bets']} decontate)
+{model_line}
 
 📊 **Your Betting DNA:**
 {chr(10).join([f"• {insight}" for insight in insights])}
 
-🎯 **Today's AI Recommendations:**
+🎯 **Puncte forte:**
+{chr(10).join(strengths)}
 
-🔥 **Top Pick for You:**
-• Arsenal vs Chelsea | 1X2 | Arsenal
-• Odds: 1.85 | Confidence: 89%
-• Reason: Matches your strong 1X2 performance
+🔁 **Comportament după rezultat:**
+{_after_line("După câștig", after_wins)}
+{_after_line("După pierdere", after_losses)}
 
-💰 **Stake Suggestion:** {strategy_rec['recommended_strategy']['stake_amount']:.0f} RON
+💰 **Stake Suggestion:** {strategy['stake_amount']:.0f} RON
 (Based on your {patterns['risk_profile']} risk profile)
 
 🧠 **Strategy Recommendation:**
-• {strategy_rec['recommended_strategy']['name']}
-• {strategy_rec['recommended_strategy']['description']}
-• Daily budget: {strategy_rec['recommended_strategy']['daily_budget']:.0f} RON
-
-📈 **Performance Optimization:**
-• Continue focusing on BTTS market (best win rate)
-• Increase bets on lower odds (your strength)
-• Consider reducing stakes on high-odds bets
+• {strategy['name']}
+• {strategy['description']}
+• Daily budget: {strategy['daily_budget']:.0f} RON
+{chr(10).join(f"• {c}" for c in strategy_rec['customizations'])}
 
 ⚠️ **Risk Alerts:**
-• No dangerous patterns detected ✅
-• Bankroll management: Excellent ✅
-• Streak behavior: Healthy ✅
+{chr(10).join(alerts)}
 """
     
     keyboard = [
@@ -2687,14 +3182,76 @@ def main():
     token = settings.telegram_token or os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
         raise RuntimeError("Set TELEGRAM_BOT_TOKEN")
-    app = ApplicationBuilder().token(token).build()
+    if settings.multi_worker and settings.bot_mode != "webhook":
+        # Several getUpdates loops on one token conflict (409) and each update reaches only one of them
+        raise RuntimeError("WORKERS>1 requires BOT_MODE=webhook")
+
+    def _start_jobs():
+        refresh_scheduler.start()
+        season_results.start()
+        live_engine.start()
+        settler.start()
+
+    async def _stop_jobs():
+        await settler.stop()
+        await live_engine.stop()
+        await season_results.stop()
+        await refresh_scheduler.stop()
+
+    async def _post_init(application):
+        alert_dispatcher.start()
+        if leader is None:
+            _start_jobs()
+        else:
+            leader.on_elected(_start_jobs)
+            leader.on_demoted(_stop_jobs)
+            leader.start()
+
+    async def _post_shutdown(application):
+        if leader is None:
+            await _stop_jobs()
+        else:
+            await leader.stop()
+        await alert_dispatcher.stop()
+        model_trainer.shutdown()
+        flush_preferences()
+
+    builder = ApplicationBuilder().token(token).post_init(_post_init).post_shutdown(_post_shutdown)
+    if settings.telegram_api_base_url:
+        builder = builder.base_url(settings.telegram_api_base_url)
+    # Users are served in parallel; each user's updates stay in order (wizard state in user_data)
+    builder = builder.concurrent_updates(PerUserUpdateProcessor(settings.concurrent_updates))
+    user_persistence = None
+    if settings.multi_worker:
+        # A user's next update may land on another worker: user_data lives in users.db
+        user_persistence = SQLiteUserDataPersistence()
+        builder = builder.persistence(user_persistence)
+    app = builder.build()
+
+    # Push alerts: live/odds events -> registry lookup -> rate-limited send queue
+    alert_dispatcher = AlertDispatcher(
+        lambda chat_id, text: app.bot.send_message(chat_id=chat_id, text=text),
+        on_blocked=alert_registry.unsubscribe,
+        blocked_errors=(Forbidden,)
+    )
+    live_engine.add_listener(lambda event: route_live_alert(alert_dispatcher, event))
+    live_engine.add_listener(settler.on_live_event)
+    settler.add_listener(lambda fixture, bets: route_settlement(alert_dispatcher, fixture, bets))
+    movement_tracker.add_listener(lambda signal: route_odds_alert(alert_dispatcher, signal))
+
+    # Every fresh odds fetch feeds the columnar store used by the arbitrage scanner
+    # (window/event-id deltas are merged per event, full listings replace the sport)
+    add_odds_listener(lambda sport_key, events, markets, complete: odds_store.update_events(
+        sport_key, events, markets, replace_sport=complete))
+    # ...and the movement tracker (ring-buffer price history, move/steam signals)
+    add_odds_listener(record_odds)
     
     # Core commands
     app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("today", cmd_today))
-    app.add_handler(CommandHandler("markets", cmd_markets))
-    app.add_handler(CommandHandler("all", cmd_all_markets))
-    app.add_handler(CommandHandler("express", cmd_express))
+    app.add_handler(CommandHandler("today", heavy("today", cmd_today)))
+    app.add_handler(CommandHandler("markets", heavy("markets", cmd_markets)))
+    app.add_handler(CommandHandler("all", heavy("all", cmd_all_markets)))
+    app.add_handler(CommandHandler("express", heavy("express", cmd_express)))
     app.add_handler(CommandHandler("lang", cmd_lang))
     app.add_handler(CommandHandler("health", health))
     app.add_handler(CommandHandler("help", cmd_help))
@@ -2702,12 +3259,14 @@ def main():
     # 🚀 NEW: Advanced betting features
     app.add_handler(CommandHandler("stats", cmd_stats))
     app.add_handler(CommandHandler("track", cmd_track))  
+    app.add_handler(CommandHandler("result", cmd_result))
     app.add_handler(CommandHandler("bankroll", cmd_bankroll))
     app.add_handler(CommandHandler("live", cmd_live))
+    app.add_handler(CommandHandler("notify", cmd_notify))
     app.add_handler(CommandHandler("strategies", cmd_strategies))
     app.add_handler(CommandHandler("social", cmd_social))
     app.add_handler(CommandHandler("ai", cmd_ai))
-    app.add_handler(CommandHandler("leaderboard", lambda u,c: _reply(u, get_leaderboard())))
+    app.add_handler(CommandHandler("leaderboard", cmd_leaderboard))
 
     # --- SUBSCRIPTIONS MVP ---
     from src.utils.subs import (
@@ -2831,21 +3390,8 @@ După plată, folosește /redeem CODUL_TĂU pentru activare.
         expires = (dt.datetime.now() + dt.timedelta(days=30)).strftime('%Y-%m-%d')
         
         # Create user if doesn't exist and grant plan
-        from src.utils.subs import _load, _save
-        data = _load()
-        uid_str = str(target_uid)
-        
-        if uid_str not in data['users']:
-            data['users'][uid_str] = {
-                'plan': 'free',
-                'expires': None,
-                'trial_used': 0,
-                'joined': dt.datetime.now().isoformat()
-            }
-        
-        data['users'][uid_str]['plan'] = plan
-        data['users'][uid_str]['expires'] = expires
-        _save(data)
+        from src.utils.subs import set_plan
+        set_plan(target_uid, plan, expires)
         
         # Log activity
         log_user_activity(target_uid, f"ADMIN_GRANT: {plan} plan by admin {uid}")
@@ -2873,9 +3419,8 @@ După plată, folosește /redeem CODUL_TĂU pentru activare.
         
         await send_animated_sticker(update, "prediction")
         
-        from src.utils.subs import _load
-        data = _load()
-        users = data.get('users', {})
+        from src.utils.subs import list_users
+        users = list_users()
         
         if not users:
             await update.message.reply_text("📭 Niciun utilizator înregistrat.")
@@ -2960,9 +3505,32 @@ După plată, folosește /redeem CODUL_TĂU pentru activare.
 
     app.add_handler(CallbackQueryHandler(on_callback))
 
+    if user_persistence is not None:
+        async def _store_user_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            # Last group: write this update's user_data now instead of on the next persistence tick
+            if update.effective_user:
+                await user_persistence.update_user_data(update.effective_user.id, context.user_data)
+
+        app.add_handler(TypeHandler(Update, _store_user_data), group=1)
+
     print("🤖⚽✨ PariuSmart AI Bot started with ADVANCED FEATURES!")
     print("🚀 New commands: /stats /track /bankroll /live /leaderboard /subscribe /redeem /status /grant")
-    app.run_polling()
+    if settings.bot_mode == "webhook":
+        if not settings.webhook_url:
+            raise RuntimeError("Set WEBHOOK_URL (or RAILWAY_PUBLIC_DOMAIN) for BOT_MODE=webhook")
+        path = settings.webhook_path.strip("/")
+        print(f"🌐 Webhook mode on port {settings.port} (/{path})")
+        # PTB's embedded server checks X-Telegram-Bot-Api-Secret-Token and answers 403 otherwise
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=settings.port,
+            url_path=path,
+            webhook_url=f"{settings.webhook_url.rstrip('/')}/{path}",
+            secret_token=settings.webhook_secret_token(),
+            allowed_updates=Update.ALL_TYPES,
+        )
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
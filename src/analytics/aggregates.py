@@ -0,0 +1,353 @@
+"""
+🧮 Stats Aggregates
+Per-user betting statistics derived from the bet ledger: maintained in O(1) per ledger
+event, and rebuilt from the whole ledger with one vectorized pandas pass on startup
+"""
+
+from __future__ import annotations
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from src.analytics.ledger import BetLedger, ledger
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MARKETS = ("1X2", "OU25", "BTTS")
+
+# Fields derived from the ledger; anything else in user_stats.json (bankroll, ...) is profile data
+DERIVED_FIELDS = (
+    "total_bets", "won_bets", "lost_bets", "void_bets", "pending_bets", "settled_bets",
+    "total_staked", "settled_staked", "total_returns", "best_odds", "average_odds",
+    "longest_win_streak", "current_streak", "streak_type", "favorite_market", "last_bet",
+    "roi_percentage", "profit_loss", "win_rate", "monthly_stats", "weekly_stats", "market_performance",
+)
+
+
+def _empty() -> Dict:
+    return {
+        "total_bets": 0, "won_bets": 0, "lost_bets": 0, "void_bets": 0, "pending_bets": 0,
+        "total_staked": 0.0, "settled_staked": 0.0, "total_returns": 0.0,
+        "sum_odds": 0.0, "best_odds": 0.0,
+        "longest_win_streak": 0, "current_streak": 0, "streak_type": "none",
+        "favorite_market": "unknown", "last_bet": None,
+        "markets": {},       # market -> {bets, wins, profit, last}
+        "months": {},        # YYYY-MM -> {bets, wins, losses, staked, settled_staked, returns}
+        "weeks": {},         # YYYY-Www (ISO week of the bet) -> same counters
+        "seq": 0,
+    }
+
+
+def _month(date: Optional[str]) -> str:
+    return (date or "")[:7] or "unknown"
+
+
+def _week(date: Optional[str]) -> str:
+    try:
+        year, week, _ = datetime.fromisoformat(date).isocalendar()
+    except (TypeError, ValueError):
+        return "unknown"
+    return f"{year}-W{week:02d}"
+
+
+def _period() -> Dict:
+    return {"bets": 0, "wins": 0, "losses": 0, "staked": 0.0, "settled_staked": 0.0, "returns": 0.0}
+
+
+PERIODS = (("months", _month), ("weeks", _week))
+
+
+class StatsAggregates:
+    """
+    Running per-user counters.
+
+    Wins/losses, ROI and P&L count settled bets only (won/lost/void); pending
+    stakes are reported separately, so total_bets = won + lost + void + pending
+    always holds. Streaks follow settlement order.
+    """
+
+    def __init__(self, source: BetLedger = ledger):
+        self.source = source
+        self._lock = threading.RLock()
+        self._users: Dict[str, Dict] = {}
+        self._bets: Dict[int, tuple] = {}     # bet_id -> (user_id, status)
+        self._built = False
+        self._listeners: List[Callable[[str], None]] = []
+
+    def add_listener(self, callback: Callable[[str], None]) -> None:
+        """Register callback(user_id) called after a user's aggregates change"""
+        self._listeners.append(callback)
+
+    # --- incremental --------------------------------------------------
+
+    def apply_event(self, event: Dict, bet: Dict) -> None:
+        """Fold one placement/settlement into the owner's counters (O(1))"""
+        self.apply_events([(event, bet)])
+
+    def apply_events(self, pairs: List[Tuple[Dict, Dict]]) -> None:
+        """Ledger batch listener: fold a write's events under one lock, notify each user once"""
+        with self._lock:
+            if not self._built:
+                return   # the initial rebuild reads them from the ledger file
+            changed = []
+            for event, bet in pairs:
+                user_id = self._fold(event, bet)
+                if user_id is not None and user_id not in changed:
+                    changed.append(user_id)
+        for user_id in changed:
+            for callback in self._listeners:
+                try:
+                    callback(user_id)
+                except Exception as e:
+                    logger.error(f"Aggregates listener failed: {e}")
+
+    def _fold(self, event: Dict, bet: Dict) -> Optional[str]:
+        op, bet_id = event.get("op"), event.get("id")
+        if op == "bet":
+            if bet_id in self._bets:
+                return None
+            user_id = str(event["uid"])
+            self._bets[bet_id] = (user_id, "pending")
+            agg = self._users.setdefault(user_id, _empty())
+            agg["seq"] += 1
+            stake, odds = float(event.get("stake", 0.0)), float(event.get("odds", 1.0))
+            agg["total_bets"] += 1
+            agg["pending_bets"] += 1
+            agg["total_staked"] += stake
+            agg["sum_odds"] += odds
+            agg["best_odds"] = max(agg["best_odds"], odds)
+            agg["last_bet"] = {k: event.get(k) for k in ("id", "match", "market", "selection", "odds", "stake", "date")}
+            market = agg["markets"].setdefault(event.get("market", "Unknown"),
+                                               {"bets": 0, "wins": 0, "profit": 0.0, "last": 0})
+            market["bets"] += 1
+            market["last"] = agg["seq"]
+            favorite = agg["markets"].get(agg["favorite_market"])
+            if favorite is None or market["bets"] >= favorite["bets"]:
+                agg["favorite_market"] = event.get("market", "Unknown")
+            for field, key in PERIODS:
+                period = agg[field].setdefault(key(event.get("date")), _period())
+                period["bets"] += 1
+                period["staked"] += stake
+            return user_id
+
+        if op == "settle":
+            known = self._bets.get(bet_id)
+            if known is None or known[1] != "pending":
+                return None
+            user_id = known[0]
+            status = event["status"]
+            self._bets[bet_id] = (user_id, status)
+            agg = self._users[user_id]
+            stake = float(bet.get("stake", 0.0))
+            ret = float(event.get("actual_return") or 0.0)
+            market = agg["markets"].get(bet.get("market", "Unknown"))
+            periods = [agg[field][key(bet.get("date"))] for field, key in PERIODS]
+            agg["pending_bets"] -= 1
+            agg["settled_staked"] += stake
+            agg["total_returns"] += ret
+            for period in periods:
+                period["settled_staked"] += stake
+                period["returns"] += ret
+            market["profit"] += ret - stake
+            if status == "void":
+                agg["void_bets"] += 1
+                return user_id
+            won = status == "won"
+            agg["won_bets" if won else "lost_bets"] += 1
+            for period in periods:
+                period["wins" if won else "losses"] += 1
+            if won:
+                market["wins"] += 1
+            streak_type = "win" if won else "loss"
+            if agg["streak_type"] == streak_type:
+                agg["current_streak"] += 1
+            else:
+                agg["streak_type"], agg["current_streak"] = streak_type, 1
+            if won:
+                agg["longest_win_streak"] = max(agg["longest_win_streak"], agg["current_streak"])
+            return user_id
+        return None
+
+    # --- full rebuild -------------------------------------------------
+
+    def rebuild(self, events: Optional[Iterable[Dict]] = None) -> int:
+        """Recompute every user's aggregates from the ledger in one vectorized pass"""
+        with self._lock:
+            events = list(self.source.events() if events is None else events)
+            self._users, self._bets = self._vectorized(events)
+            self._built = True
+            return len(self._users)
+
+    @staticmethod
+    def _vectorized(events: List[Dict]) -> tuple:
+        placed = pd.DataFrame([e for e in events if e.get("op") == "bet"])
+        if placed.empty:
+            return {}, {}
+        placed["seq"] = np.arange(len(placed))
+        placed["uid"] = placed["uid"].astype(str)
+        placed["market"] = placed["market"].fillna("Unknown")
+        placed["months"] = placed["date"].fillna("").str.slice(0, 7).replace("", "unknown")
+        iso = pd.to_datetime(placed["date"], errors="coerce", format="ISO8601").dt.isocalendar()
+        placed["weeks"] = (iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)).where(
+            iso["week"].notna(), "unknown")
+        placed["stake"] = placed["stake"].astype(float)
+        placed["odds"] = placed["odds"].astype(float)
+
+        settled = pd.DataFrame([e for e in events if e.get("op") == "settle"],
+                               columns=["id", "status", "actual_return"])
+        settled["settle_seq"] = np.arange(len(settled))
+        # A bet is settled once; keep the first settlement, as the ledger does
+        settled = settled.drop_duplicates("id", keep="first")
+        df = placed.drop(columns=["status"], errors="ignore").merge(settled, on="id", how="left")
+        df["status"] = df["status"].fillna("pending")
+        df["actual_return"] = df["actual_return"].fillna(0.0).astype(float)
+        is_settled = df["status"] != "pending"
+        df["settled_stake"] = np.where(is_settled, df["stake"], 0.0)
+        df["won"] = df["status"] == "won"
+        df["lost"] = df["status"] == "lost"
+        df["profit"] = np.where(is_settled, df["actual_return"] - df["stake"], 0.0)
+
+        per_user = df.groupby("uid").agg(
+            total_bets=("id", "size"), won_bets=("won", "sum"), lost_bets=("lost", "sum"),
+            void_bets=("status", lambda s: int((s == "void").sum())),
+            pending_bets=("status", lambda s: int((s == "pending").sum())),
+            total_staked=("stake", "sum"), settled_staked=("settled_stake", "sum"),
+            total_returns=("actual_return", "sum"), sum_odds=("odds", "sum"), best_odds=("odds", "max"),
+            seq=("seq", "size"),
+        )
+        markets = df.assign(user_seq=df.groupby("uid").cumcount() + 1).groupby(["uid", "market"]).agg(
+            bets=("id", "size"), wins=("won", "sum"), profit=("profit", "sum"), last=("user_seq", "max"))
+        # Favorite: most bets, ties go to the market bet on most recently
+        favorite = markets.reset_index().sort_values(["uid", "bets", "last"]).groupby("uid")["market"].last()
+        periods = {field: df.assign(losses=df["lost"]).groupby(["uid", field]).agg(
+            bets=("id", "size"), wins=("won", "sum"), losses=("losses", "sum"), staked=("stake", "sum"),
+            settled_staked=("settled_stake", "sum"), returns=("actual_return", "sum")) for field, _ in PERIODS}
+        last_bets = df.sort_values("seq").groupby("uid").tail(1).set_index("uid")
+
+        # Streaks over won/lost bets in settlement order: run-length encode per user
+        runs = df[df["won"] | df["lost"]].sort_values(["uid", "settle_seq"])[["uid", "won"]]
+        streaks = {}
+        if not runs.empty:
+            new_run = (runs["won"] != runs["won"].shift()) | (runs["uid"] != runs["uid"].shift())
+            runs = runs.assign(run=new_run.cumsum())
+            lengths = runs.groupby("run").agg(uid=("uid", "first"), won=("won", "first"), length=("won", "size"))
+            last_run = lengths.groupby("uid").tail(1).set_index("uid")
+            longest = lengths[lengths["won"]].groupby("uid")["length"].max()
+            for uid, row in last_run.iterrows():
+                streaks[uid] = ("win" if row["won"] else "loss", int(row["length"]), int(longest.get(uid, 0)))
+
+        users: Dict[str, Dict] = {}
+        for uid, row in per_user.iterrows():
+            agg = _empty()
+            for field in ("total_bets", "won_bets", "lost_bets", "void_bets", "pending_bets", "seq"):
+                agg[field] = int(row[field])
+            for field in ("total_staked", "settled_staked", "total_returns", "sum_odds", "best_odds"):
+                agg[field] = float(row[field])
+            agg["streak_type"], agg["current_streak"], agg["longest_win_streak"] = streaks.get(uid, ("none", 0, 0))
+            agg["favorite_market"] = favorite[uid]
+            agg["markets"] = {m: {"bets": int(r["bets"]), "wins": int(r["wins"]), "profit": float(r["profit"]),
+                                  "last": int(r["last"])} for m, r in markets.loc[uid].iterrows()}
+            for field, table in periods.items():
+                agg[field] = {k: {"bets": int(r["bets"]), "wins": int(r["wins"]), "losses": int(r["losses"]),
+                                  "staked": float(r["staked"]), "settled_staked": float(r["settled_staked"]),
+                                  "returns": float(r["returns"])} for k, r in table.loc[uid].iterrows()}
+            last = last_bets.loc[uid]
+            agg["last_bet"] = {k: (last[k].item() if hasattr(last[k], "item") else last[k])
+                               for k in ("id", "match", "market", "selection", "odds", "stake", "date")}
+            users[uid] = agg
+        bets = dict(zip(df["id"].astype(int), zip(df["uid"], df["status"])))
+        return users, bets
+
+    def _ensure_built(self) -> None:
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self.rebuild()
+
+    # --- reads --------------------------------------------------------
+
+    def user_stats(self, user_id: str) -> Dict:
+        """Derived stats in the user_stats.json shape (ratios computed on read)"""
+        self._ensure_built()
+        with self._lock:
+            agg = self._users.get(str(user_id)) or _empty()
+            settled = agg["won_bets"] + agg["lost_bets"]
+            profit = agg["total_returns"] - agg["settled_staked"]
+            markets = {m: {"bets": 0, "wins": 0, "profit": 0.0} for m in DEFAULT_MARKETS}
+            markets.update({m: {"bets": v["bets"], "wins": v["wins"], "profit": round(v["profit"], 2)}
+                            for m, v in agg["markets"].items()})
+            monthly = {month: self._period_view(v) for month, v in agg["months"].items()}
+            weekly = {week: self._period_view(v) for week, v in agg["weeks"].items()}
+            return {
+                "total_bets": agg["total_bets"],
+                "won_bets": agg["won_bets"],
+                "lost_bets": agg["lost_bets"],
+                "void_bets": agg["void_bets"],
+                "pending_bets": agg["pending_bets"],
+                "settled_bets": settled,
+                "total_staked": agg["total_staked"],
+                "settled_staked": agg["settled_staked"],
+                "total_returns": agg["total_returns"],
+                "best_odds": agg["best_odds"],
+                "average_odds": agg["sum_odds"] / agg["total_bets"] if agg["total_bets"] else 0.0,
+                "longest_win_streak": agg["longest_win_streak"],
+                "current_streak": agg["current_streak"],
+                "streak_type": agg["streak_type"],
+                "favorite_market": agg["favorite_market"],
+                "last_bet": dict(agg["last_bet"]) if agg["last_bet"] else None,
+                "profit_loss": profit,
+                "roi_percentage": profit / agg["settled_staked"] * 100 if agg["settled_staked"] > 0 else 0.0,
+                "win_rate": agg["won_bets"] / settled * 100 if settled else 0.0,
+                "monthly_stats": monthly,
+                "weekly_stats": weekly,
+                "market_performance": markets,
+            }
+
+    @staticmethod
+    def _period_view(v: Dict) -> Dict:
+        profit = v["returns"] - v["settled_staked"]
+        return {
+            "bets": v["bets"], "wins": v["wins"], "losses": v["losses"], "staked": v["staked"],
+            "profit": profit,
+            "roi": profit / v["settled_staked"] * 100 if v["settled_staked"] > 0 else 0.0,
+        }
+
+    def summary(self, user_id: str, period: Optional[str] = None) -> Optional[Dict]:
+        """
+        ROI / win rate / profit for one user, all-time or for one period
+        ("2026-10" month or "2026-W42" ISO week), in O(1). None if the user has no bets there.
+        """
+        self._ensure_built()
+        with self._lock:
+            agg = self._users.get(str(user_id))
+            if agg is None:
+                return None
+            if period is None:
+                c = {"bets": agg["total_bets"], "wins": agg["won_bets"], "losses": agg["lost_bets"],
+                     "settled_staked": agg["settled_staked"], "returns": agg["total_returns"]}
+            else:
+                c = agg["weeks" if "-W" in period else "months"].get(period)
+                if c is None:
+                    return None
+            settled = c["wins"] + c["losses"]
+            profit = c["returns"] - c["settled_staked"]
+            return {
+                "bets": c["bets"],
+                "settled_bets": settled,
+                "win_rate": c["wins"] / settled * 100 if settled else 0.0,
+                "profit": profit,
+                "roi": profit / c["settled_staked"] * 100 if c["settled_staked"] > 0 else 0.0,
+            }
+
+    def user_ids(self) -> List[str]:
+        self._ensure_built()
+        with self._lock:
+            return list(self._users)
+
+
+# Process-wide aggregates, kept current by the ledger
+aggregates = StatsAggregates()
+ledger.add_batch_listener(aggregates.apply_events)
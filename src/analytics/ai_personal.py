@@ -4,121 +4,260 @@ Personal model training, betting pattern analysis, adaptive strategies
 """
 
 import json
+import logging
+import threading
 import numpy as np
 from typing import Dict, List, Tuple, Optional
-from collections import defaultdict, Counter
+from collections import Counter
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from src.analytics.ledger import BetLedger, ledger
+
+logger = logging.getLogger(__name__)
+
 # Storage paths
 AI_DIR = Path(__file__).resolve().parents[2] / "storage" / "ai_models"
-PATTERNS_FILE = AI_DIR / "user_patterns.json"
+PATTERNS_DIR = AI_DIR / "patterns"          # one counters file per user
 RECOMMENDATIONS_FILE = AI_DIR / "recommendations.json"
+PATTERNS_VERSION = 1
+
+ODDS_BANDS = (('low', 1.0, 1.8), ('medium', 1.8, 2.5), ('high', 2.5, float('inf')))
+STAKE_BANDS = (('conservative', 50), ('moderate', 100), ('aggressive', float('inf')))
 
 def ensure_ai_files():
     """Ensure AI storage directory and files exist"""
-    AI_DIR.mkdir(parents=True, exist_ok=True)
-    if not PATTERNS_FILE.exists():
-        PATTERNS_FILE.write_text(json.dumps({}))
+    PATTERNS_DIR.mkdir(parents=True, exist_ok=True)
     if not RECOMMENDATIONS_FILE.exists():
         RECOMMENDATIONS_FILE.write_text(json.dumps({}))
 
-def analyze_betting_patterns(user_id: str, bet_history: List[Dict]) -> Dict:
-    """Analyze user's betting patterns and preferences"""
-    if not bet_history:
+def odds_band(odds: float) -> str:
+    for name, low, high in ODDS_BANDS:
+        if low <= odds < high:
+            return name
+    return 'low'
+
+def stake_band(stake: float) -> str:
+    for name, high in STAKE_BANDS:
+        if stake < high:
+            return name
+    return 'aggressive'
+
+def time_bucket(date: str) -> Optional[str]:
+    try:
+        hour = datetime.fromisoformat(date.replace('Z', '+00:00')).hour
+    except (AttributeError, ValueError):
+        return None
+    if 9 <= hour < 12:
+        return 'morning'
+    if 12 <= hour < 18:
+        return 'afternoon'
+    if 18 <= hour < 22:
+        return 'evening'
+    return 'night'
+
+def _new_counters() -> Dict:
+    return {
+        'version': PATTERNS_VERSION,
+        'total_bets': 0,
+        'settled_bets': 0,
+        'wins': 0,
+        'markets': {},          # market -> [bets, wins, losses]
+        'odds_bands': {},       # low/medium/high -> [bets, wins, losses]
+        'stakes': {},           # conservative/moderate/aggressive -> bets
+        'times': {},            # morning/afternoon/evening/night -> bets
+        # Bets placed right after a settled win / loss: [bets, wins, losses, stake_sum, odds_sum]
+        'after': {'won': [0, 0, 0, 0.0, 0.0], 'lost': [0, 0, 0, 0.0, 0.0]},
+        'last_result': None,
+        'pending': {},          # bet_id -> [market, band, after]
+    }
+
+def _fold(counters: Dict, event: Dict, bet: Dict) -> None:
+    """Apply one ledger event to a user's counters (O(1))"""
+    if event.get('op') == 'bet':
+        market = bet.get('market', 'unknown')
+        odds = float(bet.get('odds', 1.0) or 1.0)
+        stake = float(bet.get('stake', 0.0) or 0.0)
+        band = odds_band(odds)
+        counters['total_bets'] += 1
+        counters['markets'].setdefault(market, [0, 0, 0])[0] += 1
+        counters['odds_bands'].setdefault(band, [0, 0, 0])[0] += 1
+        stakes = counters['stakes']
+        stakes[stake_band(stake)] = stakes.get(stake_band(stake), 0) + 1
+        bucket = time_bucket(bet.get('date') or '')
+        if bucket:
+            counters['times'][bucket] = counters['times'].get(bucket, 0) + 1
+        after = counters['last_result']
+        if after in counters['after']:
+            row = counters['after'][after]
+            row[0] += 1
+            row[3] += stake
+            row[4] += odds
+        counters['pending'][str(bet['id'])] = [market, band, after]
+    elif event.get('op') == 'settle':
+        info = counters['pending'].pop(str(bet['id']), None)
+        status = event.get('status')
+        if info is None or status not in ('won', 'lost'):
+            return
+        market, band, after = info
+        col = 1 if status == 'won' else 2
+        counters['settled_bets'] += 1
+        counters['wins'] += status == 'won'
+        counters['markets'][market][col] += 1
+        counters['odds_bands'][band][col] += 1
+        if after in counters['after']:
+            counters['after'][after][col] += 1
+        counters['last_result'] = status
+
+
+class PatternStore:
+    """
+    Per-user pattern counters kept current by the bet ledger.
+
+    Each placement/settlement updates a handful of counters and rewrites that
+    user's small JSON file under storage/ai_models/patterns/, so /ai reads
+    patterns without walking the bet history. A user without a counters file
+    (bets tracked before this store existed) is rebuilt once from the ledger.
+    """
+
+    def __init__(self, source: BetLedger = ledger, directory: Path = PATTERNS_DIR):
+        self.source = source
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._users: Dict[str, Dict] = {}
+        self._listeners = []
+
+    def add_listener(self, callback) -> None:
+        """Register callback(user_id, counters) called after a settlement"""
+        self._listeners.append(callback)
+
+    def _path(self, user_id: str) -> Path:
+        return self.directory / f"{user_id}.json"
+
+    def _save(self, user_id: str, counters: Dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(user_id)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(counters, separators=(',', ':')))
+        tmp.replace(path)
+
+    def _rebuild(self, user_id: str) -> Dict:
+        counters = _new_counters()
+        # Placements and settlements replayed in time order (post-win/loss context depends on it)
+        events = []
+        for bet in self.source.user_bets(user_id):
+            events.append((bet.get('date') or '', 0, bet['id'], {'op': 'bet', 'id': bet['id']}, bet))
+            if bet.get('settled_at'):
+                events.append((bet['settled_at'], 1, bet['id'],
+                               {'op': 'settle', 'id': bet['id'], 'status': bet['status']}, bet))
+        for _, _, _, event, bet in sorted(events, key=lambda e: e[:3]):
+            _fold(counters, event, bet)
+        return counters
+
+    def _get(self, user_id: str) -> Tuple[Dict, bool]:
+        """(counters, rebuilt_from_ledger)"""
+        counters = self._users.get(user_id)
+        if counters is not None:
+            return counters, False
+        try:
+            counters = json.loads(self._path(user_id).read_text())
+        except FileNotFoundError:
+            counters = None
+        except Exception as e:
+            logger.error(f"Could not read patterns of {user_id}: {e}")
+            counters = None
+        rebuilt = counters is None or counters.get('version') != PATTERNS_VERSION
+        if rebuilt:
+            counters = self._rebuild(user_id)
+            if counters['total_bets']:
+                self._save(user_id, counters)
+        self._users[user_id] = counters
+        return counters, rebuilt
+
+    def counters(self, user_id: str) -> Dict:
+        with self._lock:
+            return self._get(str(user_id))[0]
+
+    def on_ledger_event(self, event: Dict, bet: Dict) -> None:
+        """Ledger listener: fold the event into the owner's counters and persist them"""
+        user_id = str(event['uid']) if 'uid' in event else self.source.get(event['id'])['user_id']
+        if event.get('remote'):
+            # Written (and folded, saved, trained on) by another worker: reload the file on next use
+            with self._lock:
+                self._users.pop(user_id, None)
+            return
+        with self._lock:
+            counters, rebuilt = self._get(user_id)
+            if not rebuilt:
+                # A rebuild replays the ledger, which already contains this event
+                _fold(counters, event, bet)
+                self._save(user_id, counters)
+        if event.get('op') == 'settle':
+            for callback in self._listeners:
+                try:
+                    callback(user_id, counters)
+                except Exception as e:
+                    logger.error(f"Pattern listener failed: {e}")
+
+
+# Process-wide pattern store, kept current by the ledger
+pattern_store = PatternStore()
+ledger.add_listener(pattern_store.on_ledger_event)
+
+
+def _rate(row: List) -> Optional[float]:
+    settled = row[1] + row[2]
+    return row[1] / settled * 100 if settled else None
+
+def analyze_betting_patterns(user_id: str, bet_history: Optional[List[Dict]] = None) -> Dict:
+    """
+    Analyze user's betting patterns and preferences.
+
+    Reads the user's incremental counters (constant time); pass bet_history to
+    analyze an arbitrary list of bets instead.
+    """
+    if bet_history is None:
+        counters = pattern_store.counters(user_id)
+    else:
+        counters = _new_counters()
+        for i, bet in enumerate(bet_history):
+            bet = dict(bet, id=bet.get('id', i))
+            _fold(counters, {'op': 'bet'}, bet)
+            status = bet.get('status', bet.get('result'))
+            if status in ('won', 'lost'):
+                _fold(counters, {'op': 'settle', 'status': status}, bet)
+    
+    total_bets = counters['total_bets']
+    if not total_bets:
         return {'error': 'No betting history available'}
     
     patterns = {
-        'favorite_markets': Counter(),
-        'favorite_odds_range': {'low': 0, 'medium': 0, 'high': 0},
-        'stake_patterns': {'conservative': 0, 'moderate': 0, 'aggressive': 0},
-        'time_preferences': Counter(),
+        'total_bets': total_bets,
+        'settled_bets': counters['settled_bets'],
+        'overall_win_rate': counters['wins'] / counters['settled_bets'] * 100 if counters['settled_bets'] else None,
+        'favorite_markets': Counter({m: row[0] for m, row in counters['markets'].items()}),
+        'favorite_odds_range': {name: counters['odds_bands'].get(name, [0])[0] for name, _, _ in ODDS_BANDS},
+        'stake_patterns': {name: counters['stakes'].get(name, 0) for name, _ in STAKE_BANDS},
+        'time_preferences': Counter(counters['times']),
         'league_preferences': Counter(),
-        'win_rate_by_market': defaultdict(list),
-        'win_rate_by_odds_range': defaultdict(list),
-        'streak_behavior': {'after_wins': [], 'after_losses': []},
+        'win_rate_by_market': {m: _rate(row) for m, row in counters['markets'].items() if _rate(row) is not None},
+        'win_rate_by_odds_range': {b: _rate(row) for b, row in counters['odds_bands'].items() if _rate(row) is not None},
+        'streak_behavior': {},
         'risk_profile': 'unknown'
     }
     
-    for i, bet in enumerate(bet_history):
-        market = bet.get('market', 'unknown')
-        odds = bet.get('odds', 1.0)
-        stake = bet.get('stake', 0)
-        result = bet.get('result', 'pending')
-        date = bet.get('date', '')
-        
-        # Market preferences
-        patterns['favorite_markets'][market] += 1
-        
-        # Odds range analysis
-        if odds < 1.8:
-            patterns['favorite_odds_range']['low'] += 1
-            patterns['win_rate_by_odds_range']['low'].append(1 if result == 'won' else 0)
-        elif odds < 2.5:
-            patterns['favorite_odds_range']['medium'] += 1
-            patterns['win_rate_by_odds_range']['medium'].append(1 if result == 'won' else 0)
-        else:
-            patterns['favorite_odds_range']['high'] += 1
-            patterns['win_rate_by_odds_range']['high'].append(1 if result == 'won' else 0)
-        
-        # Stake patterns (assuming bankroll context)
-        if stake < 50:
-            patterns['stake_patterns']['conservative'] += 1
-        elif stake < 100:
-            patterns['stake_patterns']['moderate'] += 1
-        else:
-            patterns['stake_patterns']['aggressive'] += 1
-        
-        # Time analysis
-        if date:
-            try:
-                dt = datetime.fromisoformat(date.replace('Z', '+00:00'))
-                hour = dt.hour
-                if 9 <= hour < 12:
-                    patterns['time_preferences']['morning'] += 1
-                elif 12 <= hour < 18:
-                    patterns['time_preferences']['afternoon'] += 1
-                elif 18 <= hour < 22:
-                    patterns['time_preferences']['evening'] += 1
-                else:
-                    patterns['time_preferences']['night'] += 1
-            except:
-                pass
-        
-        # Win rate by market
-        if result in ['won', 'lost']:
-            patterns['win_rate_by_market'][market].append(1 if result == 'won' else 0)
-        
-        # Streak behavior analysis
-        if i > 0:
-            prev_result = bet_history[i-1].get('result')
-            if prev_result == 'won':
-                patterns['streak_behavior']['after_wins'].append({
-                    'odds': odds,
-                    'stake': stake,
-                    'market': market,
-                    'result': result
-                })
-            elif prev_result == 'lost':
-                patterns['streak_behavior']['after_losses'].append({
-                    'odds': odds,
-                    'stake': stake,
-                    'market': market,
-                    'result': result
-                })
-    
-    # Calculate win rates
-    for market, results in patterns['win_rate_by_market'].items():
-        if results:
-            patterns['win_rate_by_market'][market] = sum(results) / len(results) * 100
-    
-    for odds_range, results in patterns['win_rate_by_odds_range'].items():
-        if results:
-            patterns['win_rate_by_odds_range'][odds_range] = sum(results) / len(results) * 100
+    # Behaviour right after a win / a loss
+    for result, key in (('won', 'after_wins'), ('lost', 'after_losses')):
+        bets, wins, losses, stake_sum, odds_sum = counters['after'][result]
+        patterns['streak_behavior'][key] = {
+            'bets': bets,
+            'win_rate': _rate([bets, wins, losses]),
+            'avg_stake': stake_sum / bets if bets else 0.0,
+            'avg_odds': odds_sum / bets if bets else 0.0,
+        }
     
     # Determine risk profile
     aggressive_bets = patterns['stake_patterns']['aggressive']
-    total_bets = len(bet_history)
     high_odds_bets = patterns['favorite_odds_range']['high']
     
     if aggressive_bets / total_bets > 0.4 or high_odds_bets / total_bets > 0.5:
@@ -310,8 +449,16 @@ def adaptive_odds_evaluation(user_id: str, prediction: Dict, user_patterns: Dict
     win_rates_by_odds = user_patterns.get('win_rate_by_odds_range', {})
     user_odds_wr = win_rates_by_odds.get(odds_range, 50) / 100 if odds_range else 0.5
     
-    # Weighted adjustment (70% base prediction, 20% market performance, 10% odds performance)
-    adjusted_probability = (0.7 * base_probability + 0.2 * user_market_wr + 0.1 * user_odds_wr)
+    # Trained personal model (one dot product); falls back to the raw win rates
+    from src.analytics.personal_model import model_trainer
+    model_probability = model_trainer.score(user_id, market, odds, prediction.get('expected_value', 0))
+    
+    if model_probability is not None:
+        # 70% base prediction, 30% personal model
+        adjusted_probability = 0.7 * base_probability + 0.3 * model_probability
+    else:
+        # Weighted adjustment (70% base prediction, 20% market performance, 10% odds performance)
+        adjusted_probability = (0.7 * base_probability + 0.2 * user_market_wr + 0.1 * user_odds_wr)
     
     # Ensure probability stays within reasonable bounds
     adjusted_probability = max(0.1, min(0.9, adjusted_probability))
@@ -331,6 +478,7 @@ def adaptive_odds_evaluation(user_id: str, prediction: Dict, user_patterns: Dict
         'personalization_factor': {
             'market_performance': user_market_wr,
             'odds_performance': user_odds_wr,
+            'model_probability': model_probability,
             'adjustment_made': abs(adjusted_probability - base_probability) > 0.05
         }
     })
@@ -346,16 +494,12 @@ def get_strategy_recommendation(user_patterns: Dict, bankroll: float = 1000) ->
         }
     
     risk_profile = user_patterns.get('risk_profile', 'moderate')
-    win_rates = user_patterns.get('win_rate_by_market', {})
     favorite_markets = user_patterns.get('favorite_markets', {})
     
-    # Calculate overall win rate
-    all_results = []
-    for market_results in win_rates.values():
-        if isinstance(market_results, list):
-            all_results.extend(market_results)
-    
-    overall_wr = sum(all_results) / len(all_results) * 100 if all_results else 50
+    # Overall win rate over settled bets (50% until something is settled)
+    overall_wr = user_patterns.get('overall_win_rate')
+    if overall_wr is None:
+        overall_wr = 50
     
     strategies = {
         'conservative_value': {
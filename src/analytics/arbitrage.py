@@ -0,0 +1,142 @@
+"""
+💎 Arbitrage Scanner
+Sure-bets and near-arbs across every competition, market, line and bookmaker in the odds store
+"""
+
+from __future__ import annotations
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+from src.fetchers.odds_store import OddsStore, odds_store, MARKETS, OUTCOMES, OUTCOME_COUNTS
+
+# Books summing to less than 1 + NEAR_ARB_MARGIN are kept (below 1.0 = guaranteed profit)
+NEAR_ARB_MARGIN = 0.01
+# Quotes older than this (relative to the newest quote) are ignored as stale
+MAX_QUOTE_AGE = 30 * 60
+# Bookmaker prices above this are almost always palps/errors
+MAX_PRICE = 50.0
+DEFAULT_TOTAL_STAKE = 1000.0
+
+_board_lock = threading.Lock()
+_board = {'store': None, 'version': -1, 'opportunities': [], 'first_seen': {}, 'scanned_at': 0.0}
+
+
+def scan_arbitrage(store: OddsStore, near_margin: float = NEAR_ARB_MARGIN,
+                   total_stake: float = DEFAULT_TOTAL_STAKE) -> List[Dict]:
+    """
+    One vectorized pass over all quotes in the store.
+
+    Quotes are sorted by (event, market, line, outcome, price) so the best price of
+    every outcome is the last row of its run; summing inverse best prices per
+    (event, market, line) gives the book percentage of the best combination.
+
+    Returns:
+        Opportunities sorted by profit margin (highest first)
+    """
+    cols = store.columns()
+    if cols['price'].size == 0:
+        return []
+
+    valid = (cols['price'] > 1.0) & (cols['price'] <= MAX_PRICE)
+    updated = cols['updated']
+    if updated.max() > 0:
+        valid &= (updated == 0) | (updated >= updated.max() - MAX_QUOTE_AGE)
+    rows = np.flatnonzero(valid)
+    if rows.size == 0:
+        return []
+
+    event = cols['event'][rows].astype(np.int64)
+    market = cols['market'][rows].astype(np.int64)
+    line_code = np.round(cols['line'][rows] * 4).astype(np.int64) + 512
+    group_key = (event * len(MARKETS) + market) * 1024 + line_code
+    outcome_key = group_key * 4 + cols['outcome'][rows]
+    price = cols['price'][rows]
+
+    order = np.lexsort((price, outcome_key))
+    sorted_key = outcome_key[order]
+    is_best = np.empty(order.size, dtype=bool)
+    is_best[:-1] = sorted_key[1:] != sorted_key[:-1]
+    is_best[-1] = True
+    best = rows[order[is_best]]          # store row of the best price per outcome
+    best_group = group_key[order[is_best]]
+
+    starts = np.flatnonzero(np.r_[True, best_group[1:] != best_group[:-1]])
+    n_outcomes = np.diff(np.r_[starts, best.size])
+    book = np.add.reduceat(1.0 / cols['price'][best], starts)
+    group_market = cols['market'][best[starts]]
+    # A low book at a single bookmaker is just a low-margin price, not a cross-book arb
+    best_bookmaker = cols['bookmaker'][best]
+    cross_book = np.minimum.reduceat(best_bookmaker, starts) != np.maximum.reduceat(best_bookmaker, starts)
+    hits = np.flatnonzero((n_outcomes == OUTCOME_COUNTS[group_market]) & cross_book
+                          & (book < 1.0 + near_margin))
+
+    opportunities = []
+    for g in hits:
+        legs_rows = best[starts[g]:starts[g] + n_outcomes[g]]
+        info = store.event_info(int(cols['event'][legs_rows[0]]))
+        market_code = int(group_market[g])
+        line = float(cols['line'][legs_rows[0]])
+        legs = []
+        for r in legs_rows:
+            odds = float(cols['price'][r])
+            legs.append({
+                'outcome': OUTCOMES[market_code][int(cols['outcome'][r])],
+                'odds': odds,
+                'bookmaker': store.bookmakers[int(cols['bookmaker'][r])],
+                'stake': total_stake * (1.0 / odds) / float(book[g]),
+            })
+        opportunities.append({
+            'id': f"{info['id']}:{MARKETS[market_code]}:{line:g}",
+            'event_id': info['id'],
+            'match': f"{info.get('home_team')} vs {info.get('away_team')}",
+            'sport_key': info.get('sport_key'),
+            'commence_time': info.get('commence_time'),
+            'market': MARKETS[market_code],
+            'line': line if market_code == 1 else None,
+            'book_percentage': float(book[g]) * 100,
+            'profit_margin': (1.0 / float(book[g]) - 1.0) * 100,
+            'sure_bet': bool(book[g] < 1.0),
+            'total_stake': total_stake,
+            'legs': legs,
+        })
+    return sorted(opportunities, key=lambda x: x['profit_margin'], reverse=True)
+
+
+def get_arbitrage_opportunities(limit: Optional[int] = 10, sure_only: bool = False,
+                                store: OddsStore = odds_store) -> List[Dict]:
+    """
+    Ranked, deduplicated opportunities (one per event/market/line).
+
+    The scan reruns only when the store changed since the last call, so repeated
+    reads between refreshes are served from memory.
+    """
+    with _board_lock:
+        if _board['store'] is not store or _board['version'] != store.version:
+            found = scan_arbitrage(store)
+            now = time.time()
+            first_seen = {opp['id']: _board['first_seen'].get(opp['id'], now) for opp in found}
+            for opp in found:
+                opp['first_seen'] = first_seen[opp['id']]
+            _board.update(store=store, version=store.version, opportunities=found,
+                          first_seen=first_seen, scanned_at=now)
+        opportunities = _board['opportunities']
+
+    if sure_only:
+        opportunities = [o for o in opportunities if o['sure_bet']]
+    return opportunities[:limit] if limit else list(opportunities)
+
+
+def arbitrage_summary(store: OddsStore = odds_store) -> Dict:
+    """Counts and margin range for the current board"""
+    opportunities = get_arbitrage_opportunities(limit=None, store=store)
+    sure = [o['profit_margin'] for o in opportunities if o['sure_bet']]
+    return {
+        'sure_bets': len(sure),
+        'near_arbs': len(opportunities) - len(sure),
+        'min_margin': min(sure) if sure else 0.0,
+        'max_margin': max(sure) if sure else 0.0,
+        'events': len(store),
+        'scanned_at': _board['scanned_at'],
+    }
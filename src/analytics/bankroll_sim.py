@@ -0,0 +1,232 @@
+"""
+🎲 Monte Carlo Bankroll Simulator
+Vectorized bankroll paths for Kelly, flat-stake and tracked-history staking plans
+"""
+
+from __future__ import annotations
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+
+DEFAULT_PATHS = 100_000
+DEFAULT_BETS = 200
+# Paths per batch (unit of work for the process pool) and bets drawn per RNG call
+BATCH_PATHS = 25_000
+DRAW_CHUNK = 50
+DRAWDOWN_BUCKETS = [0.0, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+
+
+def kelly_plan(probability: float, odds: float, fraction: float) -> Dict:
+    """Plan that stakes `fraction` of the *current* bankroll on a (probability, odds) bet"""
+    return {'mode': 'kelly', 'probability': probability, 'odds': odds, 'fraction': fraction}
+
+
+def flat_plan(probability: float, odds: float, stake: float, bankroll: float) -> Dict:
+    """Plan that stakes the same amount every bet (stake expressed in bankroll units)"""
+    return {'mode': 'flat', 'probability': probability, 'odds': odds,
+            'fraction': stake / bankroll if bankroll > 0 else 0.0}
+
+
+def history_plan(bets: List[Dict], bankroll: float) -> Dict:
+    """Plan that bootstraps the P&L of the user's settled bets (won/lost)"""
+    returns = []
+    for bet in bets:
+        status = bet.get('status', bet.get('result'))
+        stake = float(bet.get('stake', 0.0) or 0.0)
+        if stake <= 0 or status not in ('won', 'lost'):
+            continue
+        if status == 'won':
+            returns.append(stake * (float(bet.get('odds', 1.0)) - 1.0))
+        else:
+            returns.append(-stake)
+    scale = bankroll if bankroll > 0 else 1.0
+    return {'mode': 'history', 'returns': [r / scale for r in returns]}
+
+
+def _step_values(plan: Dict, draws: np.ndarray) -> np.ndarray:
+    """Per-bet increments of the running series for a block of uint16 draws"""
+    if plan['mode'] == 'history':
+        returns = np.asarray(plan['returns'], dtype=np.float32)
+        return returns[(draws.astype(np.uint32) * np.uint32(len(returns))) >> 16]
+
+    b = float(plan['odds']) - 1.0
+    f = min(float(plan['fraction']), 0.999)
+    # 16-bit uniform draws: Bernoulli threshold with 1/65536 resolution
+    threshold = np.uint16(min(65535, int(float(plan['probability']) * 65536)))
+    if plan['mode'] == 'kelly':
+        win, loss = np.log1p(f * b), np.log1p(-f)
+    else:
+        win, loss = f * b, -f
+    # loss + won * (win - loss): plain arithmetic on the mask is several times faster than np.where
+    return (draws < threshold) * np.float32(win - loss) + np.float32(loss)
+
+
+def _advance(g: np.ndarray, peak: np.ndarray, worst: np.ndarray, steps: np.ndarray,
+             multiplicative: bool, low: Optional[np.ndarray] = None,
+             ruin_g: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    Advance the running series in place over a block of increments.
+
+    Fast path (low given): unmasked updates, tracking the running minimum so the
+    caller can spot paths that touched the ruin level. Exact path (ruin_g given):
+    paths freeze at the first bet that hits the ruin level; returns the hit mask.
+    """
+    tmp = np.empty_like(g)
+    active = None if ruin_g is None else np.ones(g.shape, dtype=bool)
+    for inc in steps:
+        if active is None:
+            g += inc
+            np.minimum(low, g, out=low)
+        else:
+            np.add(g, inc, out=g, where=active)
+        np.maximum(peak, g, out=peak)
+        if multiplicative:
+            np.subtract(g, peak, out=tmp)
+        else:
+            np.divide(g + 1.0, peak + 1.0, out=tmp)
+            tmp -= 1.0
+        np.minimum(worst, tmp, out=worst)
+        if active is not None:
+            active &= g > ruin_g
+    return None if active is None else ~active
+
+
+def _simulate_batch(plan: Dict, n_paths: int, n_bets: int, ruin_level: float,
+                    seed) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Simulate one batch of bankroll paths (bankroll normalised to 1.0).
+
+    Paths are advanced one bet at a time across the whole batch, so only a few
+    vectors of length n_paths are kept (no n_paths x n_bets matrices). Each plan
+    is tracked as a running series `g`: log-wealth for Kelly (multiplicative)
+    plans, wealth - 1 for flat/history (additive) plans. Ruin is absorbing: the
+    few paths that hit the ruin level inside a chunk are replayed with masking
+    and frozen at their stop value.
+
+    Returns:
+        (final_bankroll, max_drawdown, ruined) arrays of length n_paths
+    """
+    rng = np.random.default_rng(seed)
+    multiplicative = plan['mode'] == 'kelly'
+    ruin_g = np.float32(np.log(ruin_level) if multiplicative else ruin_level - 1.0)
+
+    g = np.zeros(n_paths, dtype=np.float32)
+    peak = np.zeros(n_paths, dtype=np.float32)
+    worst = np.zeros(n_paths, dtype=np.float32)  # most negative g - peak (log) or ratio - 1
+    low = np.zeros(n_paths, dtype=np.float32)
+    ruined = np.zeros(n_paths, dtype=bool)
+    stop_g = np.zeros(n_paths, dtype=np.float32)
+    stop_worst = np.zeros(n_paths, dtype=np.float32)
+
+    words = -(-n_paths // 4)  # uint64 words per bet, 4 x uint16 draws each
+    for chunk_start in range(0, n_bets, DRAW_CHUNK):
+        chunk = min(DRAW_CHUNK, n_bets - chunk_start)
+        draws = rng.bit_generator.random_raw((chunk, words)).view(np.uint16)[:, :n_paths]
+        steps = _step_values(plan, draws)
+        saved = (g.copy(), peak.copy(), worst.copy())
+
+        _advance(g, peak, worst, steps, multiplicative, low=low)
+
+        fresh = np.flatnonzero((low <= ruin_g) & ~ruined)
+        if fresh.size:
+            sub_g, sub_peak, sub_worst = (a[fresh] for a in saved)
+            _advance(sub_g, sub_peak, sub_worst, steps[:, fresh], multiplicative, ruin_g=ruin_g)
+            ruined[fresh] = True
+            stop_g[fresh] = sub_g
+            stop_worst[fresh] = sub_worst
+
+    final_g = np.where(ruined, stop_g, g)
+    worst = np.where(ruined, stop_worst, worst)
+    if multiplicative:
+        return np.exp(final_g), 1.0 - np.exp(worst), ruined
+    return 1.0 + final_g, np.clip(-worst, 0.0, 1.0), ruined
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Lazily create (and reuse) the process pool so fork cost is paid once"""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def simulate_bankroll(plan: Dict, n_paths: int = DEFAULT_PATHS, n_bets: int = DEFAULT_BETS,
+                      ruin_level: float = 0.5, seed: Optional[int] = None,
+                      workers: int = 0) -> Dict:
+    """
+    Run a Monte Carlo simulation of a staking plan.
+
+    Args:
+        plan: Plan dict from kelly_plan(), flat_plan() or history_plan()
+        n_paths: Number of bankroll paths
+        n_bets: Number of sequential bets per path
+        ruin_level: Bankroll multiple (of the starting bankroll) that counts as ruin
+        seed: Optional seed for reproducible results
+        workers: Process pool size; 0/1 runs batches in-process
+
+    Returns:
+        Dict with ruin probability, drawdown distribution and growth quantiles
+    """
+    if plan.get('mode') == 'history' and not plan.get('returns'):
+        return {'error': 'No settled bets to simulate'}
+    if plan.get('mode') in ('kelly', 'flat') and (plan.get('fraction', 0) <= 0 or plan.get('odds', 0) <= 1):
+        return {'error': 'Plan has no stake or invalid odds'}
+
+    started = time.perf_counter()
+    batches = [BATCH_PATHS] * (n_paths // BATCH_PATHS)
+    if n_paths % BATCH_PATHS:
+        batches.append(n_paths % BATCH_PATHS)
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+
+    if workers and workers > 1 and len(batches) > 1:
+        pool = _get_pool(workers)
+        futures = [pool.submit(_simulate_batch, plan, size, n_bets, ruin_level, s)
+                   for size, s in zip(batches, seeds)]
+        results = [f.result() for f in futures]
+    else:
+        results = [_simulate_batch(plan, size, n_bets, ruin_level, s) for size, s in zip(batches, seeds)]
+
+    final = np.concatenate([r[0] for r in results])
+    drawdown = np.concatenate([r[1] for r in results])
+    ruined = np.concatenate([r[2] for r in results])
+
+    dd_q = np.percentile(drawdown, [50, 90, 95, 99])
+    growth_q = np.percentile(final, [5, 25, 50, 75, 95])
+    hist, _ = np.histogram(drawdown, bins=DRAWDOWN_BUCKETS)
+    median_final = max(float(growth_q[2]), 1e-9)
+
+    return {
+        'mode': plan['mode'],
+        'n_paths': int(final.size),
+        'n_bets': n_bets,
+        'ruin_level': ruin_level,
+        'ruin_probability': float(ruined.mean() * 100),
+        'drawdown': {
+            'mean': float(drawdown.mean() * 100),
+            'p50': float(dd_q[0] * 100),
+            'p90': float(dd_q[1] * 100),
+            'p95': float(dd_q[2] * 100),
+            'p99': float(dd_q[3] * 100),
+        },
+        'drawdown_histogram': {
+            f"{int(lo * 100)}-{int(hi * 100)}%": float(count / final.size * 100)
+            for lo, hi, count in zip(DRAWDOWN_BUCKETS[:-1], DRAWDOWN_BUCKETS[1:], hist)
+        },
+        'growth': {
+            'mean': float(final.mean()),
+            'p5': float(growth_q[0]),
+            'p25': float(growth_q[1]),
+            'p50': float(growth_q[2]),
+            'p75': float(growth_q[3]),
+            'p95': float(growth_q[4]),
+        },
+        'median_growth_per_bet': float((median_final ** (1.0 / n_bets) - 1.0) * 100),
+        'elapsed_ms': (time.perf_counter() - started) * 1000,
+    }
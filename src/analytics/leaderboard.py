@@ -0,0 +1,116 @@
+"""
+🏆 Leaderboard Index
+Sorted ROI boards (all-time, current week, current month) updated when a user's stats change
+"""
+
+from __future__ import annotations
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.analytics.aggregates import StatsAggregates, aggregates
+
+MIN_BETS = 5        # settled bets needed to appear on a board
+PERIODS = ("all", "week", "month")
+
+
+def current_period(period: str, now: Optional[datetime] = None) -> Optional[str]:
+    """Aggregates period key for "week"/"month" (None for all-time)"""
+    now = now or datetime.now()
+    if period == "week":
+        year, week, _ = now.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return now.strftime("%Y-%m")
+    return None
+
+
+class Board:
+    """
+    Entries kept in a list sorted by (-roi, -profit, user_id).
+
+    update() locates the user's old key by bisection and re-inserts the new one;
+    top(n) is a slice and rank() one bisect_left.
+    """
+
+    def __init__(self, min_bets: int = MIN_BETS):
+        self.min_bets = min_bets
+        self._keys: List[Tuple[float, float, str]] = []
+        self._entries: Dict[str, Dict] = {}
+
+    @staticmethod
+    def _key(user_id: str, entry: Dict) -> Tuple[float, float, str]:
+        return (-round(entry["roi"], 6), -round(entry["profit"], 6), user_id)
+
+    def update(self, user_id: str, entry: Optional[Dict]) -> None:
+        old = self._entries.pop(user_id, None)
+        if old is not None:
+            i = bisect_left(self._keys, self._key(user_id, old))
+            del self._keys[i]
+        if entry is not None and entry["settled_bets"] >= self.min_bets:
+            self._entries[user_id] = entry
+            insort(self._keys, self._key(user_id, entry))
+
+    def top(self, n: int = 10) -> List[Dict]:
+        return [dict(self._entries[key[2]], user_id=key[2]) for key in self._keys[:n]]
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based position, or None if the user does not qualify"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        return bisect_left(self._keys, self._key(user_id, entry)) + 1
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class Leaderboard:
+    """
+    All-time board plus boards for the current ISO week and calendar month.
+
+    Boards are filled from the aggregates once, on first request, and then kept
+    current by the aggregates listener. A period board is replaced when the
+    week/month rolls over.
+    """
+
+    def __init__(self, source: StatsAggregates = aggregates, min_bets: int = MIN_BETS):
+        self.source = source
+        self.min_bets = min_bets
+        self._lock = threading.Lock()
+        self._boards: Dict[Optional[str], Board] = {}
+
+    def _board(self, key: Optional[str]) -> Board:
+        board = self._boards.get(key)
+        if board is None:
+            if key is not None:
+                # Period rolled over: drop boards of past periods
+                for old in [k for k in self._boards if k is not None and ("-W" in k) == ("-W" in key)]:
+                    del self._boards[old]
+            board = Board(self.min_bets)
+            for user_id in self.source.user_ids():
+                board.update(user_id, self.source.summary(user_id, key))
+            self._boards[key] = board
+        return board
+
+    def on_stats_changed(self, user_id: str) -> None:
+        """Aggregates listener: re-rank the user on every board that is already built"""
+        with self._lock:
+            for key, board in self._boards.items():
+                board.update(user_id, self.source.summary(user_id, key))
+
+    def top(self, n: int = 10, period: str = "all") -> List[Dict]:
+        with self._lock:
+            return self._board(current_period(period)).top(n)
+
+    def rank(self, user_id: str, period: str = "all") -> Tuple[Optional[int], int]:
+        """(rank or None, number of ranked users)"""
+        with self._lock:
+            board = self._board(current_period(period))
+            return board.rank(str(user_id)), len(board)
+
+
+# Process-wide leaderboard, kept current by the aggregates
+leaderboard = Leaderboard()
+aggregates.add_listener(leaderboard.on_stats_changed)
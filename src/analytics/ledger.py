@@ -0,0 +1,399 @@
+"""
+📒 Bet Ledger
+Append-only log of bet placements and settlements with a per-user index in memory
+"""
+
+from __future__ import annotations
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:      # no advisory locks (Windows): single worker only
+    fcntl = None
+
+from src.utils.config import settings
+
+logger = logging.getLogger(__name__)
+
+STORAGE_DIR = Path(__file__).resolve().parents[2] / "storage"
+LEDGER_FILE = STORAGE_DIR / "bets.jsonl"
+LEGACY_BETS_FILE = STORAGE_DIR / "user_bets.json"   # imported once when the ledger is created
+
+FSYNC_INTERVAL = 0.5     # seconds; appends are fsync'ed in batches at most this far apart
+FSYNC_BATCH = 64         # ... or as soon as this many records are waiting
+SETTLED_STATUSES = ("won", "lost", "void")
+
+
+class BetLedger:
+    """
+    One JSON line per event: {"op":"bet",...} when a bet is placed and
+    {"op":"settle","id":..} when it is settled. Nothing is rewritten in place.
+
+    Replaying the file on first use builds {bet_id: bet} and {user_id: [bet_id]},
+    so placing a bet is one append and settling it is a dict lookup plus one
+    append. Ids are global and handed out under the ledger lock.
+
+    Appends reach the OS immediately (flush) and are fsync'ed in batches by a
+    background thread; a torn last line after a crash is dropped on replay, and
+    a line that does not parse is logged and skipped.
+
+    With shared=True several worker processes use the same file: writes hold an
+    exclusive flock, and every read or write first applies the lines other
+    workers appended since this process last looked (one stat when nothing
+    changed). Their events reach the listeners flagged remote=True. A writer
+    that died mid-append leaves an unterminated fragment: the next writer cuts
+    it off under the flock before appending.
+    """
+
+    def __init__(self, path: Path = LEDGER_FILE, legacy_path: Optional[Path] = LEGACY_BETS_FILE,
+                 shared: bool = False):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.shared = shared and fcntl is not None
+        self._lock = threading.RLock()
+        self._bets: Dict[int, Dict] = {}
+        self._by_user: Dict[str, List[int]] = {}
+        self._owner: Dict[int, str] = {}
+        self._last_id = 0
+        self._offset = 0             # bytes of the file already applied
+        self._flock_depth = 0
+        self._file = None
+        self._loaded = False
+        self._unsynced = 0
+        self._sync_wake = threading.Event()
+        self._syncer: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Dict, Dict], None]] = []
+        self._batch_listeners: List[Callable[[List[Tuple[Dict, Dict]]], None]] = []
+
+    def add_listener(self, callback: Callable[[Dict, Dict], None]) -> None:
+        """Register callback(event, bet) called after every placement/settlement"""
+        self._listeners.append(callback)
+
+    def add_batch_listener(self, callback: Callable[[List[Tuple[Dict, Dict]]], None]) -> None:
+        """Register callback([(event, bet), ...]) called once per write (settle_many is one write)"""
+        self._batch_listeners.append(callback)
+
+    # --- replay -------------------------------------------------------
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            with self._exclusive(catch_up=False):
+                fresh = self.path.stat().st_size == 0
+                if not fresh:
+                    self._replay()
+                self._loaded = True
+                if fresh:
+                    self._migrate()
+
+    @contextmanager
+    def _exclusive(self, catch_up: bool = True):
+        """Cross-process write lock (shared mode); yields events other workers appended meanwhile"""
+        if not self.shared or self._flock_depth:
+            yield []
+            return
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        self._flock_depth += 1
+        try:
+            remote = []
+            if catch_up:
+                remote = self._catch_up()
+                self._drop_torn_tail()
+            yield remote
+        finally:
+            self._flock_depth -= 1
+            self._file.flush()
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def _catch_up(self) -> List[Tuple[Dict, Dict]]:
+        """Apply complete lines appended by other workers after our offset"""
+        if self.path.stat().st_size <= self._offset:
+            return []
+        pairs = []
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break       # still being written
+                self._offset += len(raw)
+                try:
+                    event = json.loads(raw)
+                except ValueError:
+                    logger.error(f"Ledger {self.path.name}: skipping corrupt record "
+                                 f"at byte {self._offset - len(raw)}")
+                    continue
+                bet = self._apply(event)
+                if bet is not None:
+                    uid = event.get("uid") or self._owner.get(event["id"])
+                    pairs.append((dict(event, uid=uid, remote=True), dict(bet)))
+        return pairs
+
+    def _drop_torn_tail(self) -> None:
+        """Under the flock nobody is mid-append: bytes past our offset are a dead writer's fragment"""
+        size = self.path.stat().st_size
+        if size > self._offset:
+            logger.warning(f"Ledger {self.path.name}: dropping {size - self._offset} bytes "
+                           f"of a partial record at byte {self._offset}")
+            os.truncate(self.path, self._offset)
+
+    def _refresh(self) -> None:
+        """Before a read in shared mode: pick up other workers' events and notify listeners"""
+        if not self.shared:
+            return
+        with self._lock:
+            pairs = self._catch_up()
+        if pairs:
+            self._notify(pairs)
+
+    def _replay(self) -> None:
+        good_bytes = 0
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    # Torn write from a crash: the unterminated last record is discarded
+                    logger.warning(f"Ledger {self.path.name}: dropping partial record at byte {good_bytes}")
+                    break
+                good_bytes += len(raw)
+                try:
+                    event = json.loads(raw)
+                except ValueError:
+                    logger.error(f"Ledger {self.path.name}: skipping corrupt record at byte {good_bytes - len(raw)}")
+                    continue
+                self._apply(event)
+        if good_bytes < self.path.stat().st_size:
+            with open(self.path, "r+b") as f:
+                f.truncate(good_bytes)
+        self._offset = good_bytes
+
+    def _apply(self, event: Dict) -> Optional[Dict]:
+        op = event.get("op")
+        if op == "bet":
+            bet = {k: v for k, v in event.items() if k not in ("op", "uid")}
+            self._bets[event["id"]] = bet
+            self._last_id = max(self._last_id, event["id"])
+            self._by_user.setdefault(str(event["uid"]), []).append(event["id"])
+            self._owner[event["id"]] = str(event["uid"])
+            return bet
+        if op == "settle":
+            bet = self._bets.get(event["id"])
+            if bet is not None:
+                bet["status"] = event["status"]
+                bet["settled_at"] = event.get("ts")
+                if event.get("actual_return") is not None:
+                    bet["actual_return"] = event["actual_return"]
+            return bet
+        return None
+
+    def _migrate(self) -> None:
+        """Import the old user_bets.json ({user_id: [bets]}) into a new ledger"""
+        if not self.legacy_path or not self.legacy_path.exists():
+            return
+        try:
+            data = json.loads(self.legacy_path.read_text() or "{}")
+        except Exception as e:
+            logger.error(f"Could not read {self.legacy_path} for migration: {e}")
+            return
+        legacy = [(bet.get("date") or "", user_id, bet) for user_id, bets in data.items() for bet in bets]
+        for _, user_id, bet in sorted(legacy, key=lambda x: x[0]):
+            record = self.add_bet(user_id, bet, date=bet.get("date"), status="pending")
+            if bet.get("status") in SETTLED_STATUSES:
+                self.settle(record["id"], bet["status"], bet.get("actual_return"))
+        if legacy:
+            self.sync()
+            logger.info(f"Migrated {len(legacy)} bets from {self.legacy_path.name}")
+
+    # --- writes -------------------------------------------------------
+
+    def _append(self, event: Dict) -> None:
+        line = json.dumps(event, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self._file.write(line)
+        self._file.flush()
+        self._offset += len(line.encode("utf-8"))
+        self._unsynced += 1
+        if self._syncer is None:
+            self._syncer = threading.Thread(target=self._sync_loop, name="ledger-fsync", daemon=True)
+            self._syncer.start()
+        if self._unsynced >= FSYNC_BATCH:
+            self._sync_locked()
+        else:
+            self._sync_wake.set()
+
+    def _notify(self, pairs: List[Tuple[Dict, Dict]]) -> None:
+        for callback in self._batch_listeners:
+            try:
+                callback(pairs)
+            except Exception as e:
+                logger.error(f"Ledger listener failed: {e}")
+        for event, bet in pairs:
+            for callback in self._listeners:
+                try:
+                    callback(event, bet)
+                except Exception as e:
+                    logger.error(f"Ledger listener failed: {e}")
+
+    def add_bet(self, user_id: str, bet_data: Dict, date: Optional[str] = None,
+                status: str = "pending") -> Dict:
+        """Append a new bet; returns the stored record (with its id)"""
+        self._ensure_loaded()
+        stake = float(bet_data.get("stake", 0.0) or 0.0)
+        odds = float(bet_data.get("odds", 1.0) or 1.0)
+        with self._lock, self._exclusive() as remote:
+            event = {
+                "op": "bet",
+                "id": self._last_id + 1,
+                "uid": str(user_id),
+                "date": date or datetime.now().isoformat(),
+                "match": bet_data.get("match", "Unknown"),
+                "market": bet_data.get("market", "Unknown"),
+                "selection": bet_data.get("selection", "Unknown"),
+                "odds": odds,
+                "stake": stake,
+                "status": status,
+                "potential_return": stake * odds,
+                "ev": bet_data.get("ev", 0.0),
+                "probability": bet_data.get("probability", 0.0),
+            }
+            for key in ("match_id", "kickoff", "event_id", "line"):
+                if bet_data.get(key) is not None:
+                    event[key] = bet_data[key]
+            self._append(event)
+            bet = self._apply(event)
+            record = dict(bet)
+        self._notify(remote + [(event, record)])
+        return record
+
+    def settle(self, bet_id: int, result: str, actual_return: Optional[float] = None,
+               user_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Settle a pending bet.
+
+        Returns the updated record, or None when the id is unknown, belongs to another
+        user or the bet is already settled.
+        """
+        if result not in SETTLED_STATUSES:
+            raise ValueError(f"Unknown result: {result}")
+        self._ensure_loaded()
+        with self._lock, self._exclusive() as remote:
+            if user_id is not None and self._owner.get(int(bet_id)) != str(user_id):
+                pair = None
+            else:
+                pair = self._settle_locked(int(bet_id), result, actual_return, datetime.now().isoformat())
+        if remote or pair is not None:
+            self._notify(remote + ([pair] if pair is not None else []))
+        return pair[1] if pair is not None else None
+
+    def settle_many(self, results: List[Tuple[int, str, Optional[float]]]) -> List[Dict]:
+        """
+        Settle several bets as one write: [(bet_id, result, actual_return or None)].
+
+        All settlement records are appended and fsync'ed together and listeners get
+        one batch. Unknown or already settled ids are skipped; returns the settled bets.
+        """
+        for _, result, _ in results:
+            if result not in SETTLED_STATUSES:
+                raise ValueError(f"Unknown result: {result}")
+        self._ensure_loaded()
+        ts = datetime.now().isoformat()
+        with self._lock, self._exclusive() as remote:
+            pairs = [pair for pair in (self._settle_locked(int(bet_id), result, actual_return, ts)
+                                       for bet_id, result, actual_return in results) if pair is not None]
+            if pairs:
+                self._sync_locked()
+        if remote or pairs:
+            self._notify(remote + pairs)
+        return [dict(bet, user_id=event["uid"]) for event, bet in pairs]
+
+    def _settle_locked(self, bet_id: int, result: str, actual_return: Optional[float],
+                       ts: str) -> Optional[Tuple[Dict, Dict]]:
+        bet = self._bets.get(bet_id)
+        if bet is None or bet["status"] != "pending":
+            return None
+        if actual_return is None:
+            actual_return = bet["stake"] * bet["odds"] if result == "won" else \
+                bet["stake"] if result == "void" else 0.0
+        event = {"op": "settle", "id": bet_id, "status": result,
+                 "actual_return": float(actual_return), "ts": ts}
+        self._append(event)
+        record = dict(self._apply(event))
+        # Owner passed along so listeners need no lookup (not written to the file)
+        return dict(event, uid=self._owner[bet_id]), record
+
+    # --- durability ---------------------------------------------------
+
+    def _sync_locked(self) -> None:
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def sync(self) -> None:
+        """fsync pending appends now"""
+        with self._lock:
+            self._sync_locked()
+
+    def _sync_loop(self) -> None:
+        while True:
+            self._sync_wake.wait()
+            time.sleep(FSYNC_INTERVAL)
+            self._sync_wake.clear()
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Ledger fsync failed: {e}")
+
+    # --- reads --------------------------------------------------------
+
+    def get(self, bet_id: int) -> Optional[Dict]:
+        self._ensure_loaded()
+        self._refresh()
+        with self._lock:
+            bet = self._bets.get(int(bet_id))
+            return dict(bet, user_id=self._owner[int(bet_id)]) if bet else None
+
+    def user_bets(self, user_id: str, status: Optional[str] = None) -> List[Dict]:
+        """A user's bets, oldest first"""
+        self._ensure_loaded()
+        self._refresh()
+        with self._lock:
+            bets = [self._bets[i] for i in self._by_user.get(str(user_id), [])]
+            return [dict(b) for b in bets if status is None or b["status"] == status]
+
+    def pending_bets(self) -> List[Dict]:
+        """Every pending bet of every user, with its user id"""
+        self._ensure_loaded()
+        self._refresh()
+        with self._lock:
+            return [dict(bet, user_id=self._owner[bet_id]) for bet_id, bet in self._bets.items()
+                    if bet["status"] == "pending"]
+
+    def events(self):
+        """Iterate over the raw ledger events (rebuilds, exports)"""
+        self._ensure_loaded()
+        self.sync()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    continue
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                yield event
+
+
+# Process-wide ledger (shared between worker processes when WORKERS > 1)
+ledger = BetLedger(shared=settings.multi_worker)
+atexit.register(ledger.sync)
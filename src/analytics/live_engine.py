@@ -0,0 +1,313 @@
+"""
+⚡ Live Match Engine
+Polls Football-Data only for competitions with live (or kicking-off) matches and keeps
+an in-memory live table; goals and status changes are detected by diffing polls.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, List, Optional
+
+from src.fetchers.football_data import get_matches_for_date, get_live_matches, get_match
+
+logger = logging.getLogger(__name__)
+
+LIVE_STATUSES = ("IN_PLAY", "PAUSED")
+LIVE_INTERVAL = 30              # seconds between polls while matches are live
+KICKOFF_INTERVAL = 60           # a kickoff is due within KICKOFF_LEAD
+KICKOFF_LEAD = 10 * 60
+IDLE_INTERVAL_MAX = 15 * 60     # nothing live: sleep until shortly before the next kickoff
+FIXTURES_REFRESH = 30 * 60
+MATCH_DURATION = 130 * 60       # kickoff + 2h10 still counts as possibly live
+KEEP_FINISHED = 30 * 60         # finished matches stay in the table for this long
+MAX_EVENTS = 100
+SHARED_KEY = "live_engine:snapshot"     # table + events published for the other workers
+
+
+def _kickoff(utc_date: Optional[str]) -> Optional[float]:
+    if not utc_date:
+        return None
+    try:
+        return datetime.fromisoformat(utc_date.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _score(match: Dict) -> tuple:
+    full = (match.get("score") or {}).get("fullTime") or {}
+    return (full.get("home") or 0, full.get("away") or 0)
+
+
+def estimate_minute(row: Dict, now: Optional[float] = None) -> str:
+    """Match minute from the API when available, otherwise estimated from kickoff"""
+    if row["status"] == "PAUSED":
+        return "HT"
+    if row["status"] == "FINISHED":
+        return "FT"
+    if row.get("minute"):
+        return f"{row['minute']}'"
+    kickoff = row.get("kickoff")
+    if not kickoff:
+        return "LIVE"
+    elapsed = int(((now or time.time()) - kickoff) // 60)
+    if elapsed >= 60:            # second half, after a ~15 minute break
+        elapsed -= 15
+    if elapsed > 90:
+        return "90+'"
+    return f"{max(1, elapsed)}'"
+
+
+class LiveEngine:
+    """
+    In-memory live table keyed by match id, refreshed by a background asyncio task.
+
+    Today's fixtures (cached) tell which competitions can have live matches; only
+    those are polled, with one /v4/matches request per cycle. The interval adapts:
+    LIVE_INTERVAL while something is live, KICKOFF_INTERVAL near a kickoff, and a
+    long sleep until the next kickoff otherwise.
+
+    With a shared store (several workers) only the leader polls; it publishes the
+    table and recent events after every cycle and the other workers answer
+    queries from that snapshot.
+    """
+
+    def __init__(self, token: Optional[str], comp_codes: List[str], shared=None, fixtures=None):
+        self.token = token
+        self.comp_codes = list(comp_codes)
+        self.shared = shared
+        self.fixtures = fixtures
+        self._lock = threading.Lock()
+        self.table: Dict[int, Dict] = {}
+        self.events: Deque[Dict] = deque(maxlen=MAX_EVENTS)
+        self._fixtures: List[Dict] = []
+        self._fixtures_at = 0.0
+        self._fixtures_date = None
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.last_poll = 0.0
+        self.next_poll = 0.0
+        self.polls = 0
+
+    def add_listener(self, callback: Callable[[Dict], None]) -> None:
+        """Register callback(event) for goal/status events"""
+        self._listeners.append(callback)
+
+    # --- polling ------------------------------------------------------
+
+    def _refresh_fixtures(self, now: float) -> None:
+        today = datetime.now(timezone.utc).date().isoformat()
+        if self._fixtures_date == today and now - self._fixtures_at < FIXTURES_REFRESH:
+            return
+        if self.fixtures is not None:
+            fixtures = self.fixtures.matches_for_date(today, self.comp_codes)
+        else:
+            fixtures = get_matches_for_date(self.token, self.comp_codes, today)
+        if fixtures or self._fixtures_date != today:
+            self._fixtures = fixtures
+        self._fixtures_at, self._fixtures_date = now, today
+
+    def _active_competitions(self, now: float) -> tuple:
+        """Competitions that may have live matches now, and seconds until the next kickoff"""
+        active = {row["competition"] for row in self.table.values() if row["status"] in LIVE_STATUSES}
+        next_kickoff = None
+        for fixture in self._fixtures:
+            kickoff = _kickoff(fixture.get("utcDate"))
+            if kickoff is None or fixture.get("status") == "FINISHED":
+                continue
+            if kickoff - KICKOFF_LEAD <= now <= kickoff + MATCH_DURATION:
+                active.add(fixture["competition"])
+            elif kickoff > now and (next_kickoff is None or kickoff < next_kickoff):
+                next_kickoff = kickoff
+        return active, (next_kickoff - now if next_kickoff else None)
+
+    def poll(self) -> float:
+        """One engine cycle (blocking I/O); returns seconds until the next cycle"""
+        now = time.time()
+        self._refresh_fixtures(now)
+        active, until_kickoff = self._active_competitions(now)
+
+        if active:
+            live = get_live_matches(self.token, sorted(c for c in active if c))
+            if live is not None:
+                self._apply(live, now)
+            self.polls += 1
+            self.last_poll = now
+        self._prune(now)
+
+        with self._lock:
+            has_live = any(row["status"] in LIVE_STATUSES for row in self.table.values())
+        if has_live:
+            return LIVE_INTERVAL
+        if active:
+            return KICKOFF_INTERVAL
+        if until_kickoff is not None:
+            return max(KICKOFF_INTERVAL, min(IDLE_INTERVAL_MAX, until_kickoff - KICKOFF_LEAD))
+        return IDLE_INTERVAL_MAX
+
+    def _apply(self, live: List[Dict], now: float) -> None:
+        """Diff a live poll against the table and emit goal/status events"""
+        new_events = []
+        with self._lock:
+            seen = set()
+            for match in live:
+                match_id = match["match_id"]
+                seen.add(match_id)
+                score = _score(match)
+                row = self.table.get(match_id)
+                if row is None:
+                    row = {
+                        "match_id": match_id,
+                        "competition": match.get("competition"),
+                        "home_name": match.get("home_name"),
+                        "away_name": match.get("away_name"),
+                        "kickoff": _kickoff(match.get("utcDate")),
+                        "status": match["status"],
+                        "minute": match.get("minute"),
+                        "score": score,
+                        "updated": now,
+                    }
+                    self.table[match_id] = row
+                    if score == (0, 0) and match["status"] == "IN_PLAY":
+                        new_events.append(self._event("KICKOFF", row, now))
+                    continue
+                new_events.extend(self._diff(row, match["status"], score, match.get("minute"), now))
+
+            missing = [m for m, row in self.table.items() if row["status"] in LIVE_STATUSES and m not in seen]
+
+        # Matches that left the live list: confirm the final whistle and score
+        for match_id in missing:
+            final = get_match(self.token, match_id)
+            if final and final.get("status") not in LIVE_STATUSES:
+                with self._lock:
+                    new_events.extend(self._diff(self.table[match_id], final["status"], _score(final), None, now))
+
+        self.events.extend(new_events)
+        for event in new_events:
+            for callback in self._listeners:
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.error(f"Live engine listener failed: {e}")
+
+    def _diff(self, row: Dict, status: str, score: tuple, minute, now: float) -> List[Dict]:
+        events = []
+        old_home, old_away = row["score"]
+        row["minute"] = minute
+        if score != row["score"]:
+            row["score"] = score
+            row["updated"] = now
+            for _ in range(max(0, score[0] - old_home)):
+                events.append(self._event("GOAL", row, now, team=row["home_name"]))
+            for _ in range(max(0, score[1] - old_away)):
+                events.append(self._event("GOAL", row, now, team=row["away_name"]))
+            if score[0] < old_home or score[1] < old_away:
+                events.append(self._event("GOAL_CANCELLED", row, now))
+        if status != row["status"]:
+            previous = row["status"]
+            row["status"] = status
+            row["updated"] = now
+            if status == "PAUSED":
+                events.append(self._event("HALF_TIME", row, now))
+            elif status == "IN_PLAY" and previous == "PAUSED":
+                events.append(self._event("SECOND_HALF", row, now))
+            elif status == "FINISHED":
+                row["finished_at"] = now
+                events.append(self._event("FULL_TIME", row, now))
+            else:
+                events.append(self._event(status, row, now))
+        return events
+
+    @staticmethod
+    def _event(kind: str, row: Dict, now: float, **extra) -> Dict:
+        return {
+            "type": kind,
+            "match_id": row["match_id"],
+            "competition": row["competition"],
+            "match": f"{row['home_name']} vs {row['away_name']}",
+            "score": row["score"],
+            "minute": estimate_minute(row, now),
+            "time": now,
+            **extra,
+        }
+
+    def _prune(self, now: float) -> None:
+        with self._lock:
+            for match_id in [m for m, row in self.table.items()
+                             if row["status"] not in LIVE_STATUSES
+                             and now - row.get("finished_at", row["updated"]) > KEEP_FINISHED]:
+                del self.table[match_id]
+
+    # --- background task ----------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                interval = await asyncio.to_thread(self.poll)
+            except Exception as e:
+                logger.error(f"Live engine poll failed: {e}")
+                interval = KICKOFF_INTERVAL
+            self.next_poll = time.time() + interval
+            if self.shared is not None:
+                try:
+                    await asyncio.to_thread(self._publish, interval)
+                except Exception as e:
+                    logger.error(f"Live engine publish failed: {e}")
+            await asyncio.sleep(interval)
+
+    def _publish(self, interval: float) -> None:
+        with self._lock:
+            rows = [dict(row) for row in self.table.values()]
+        snapshot = {"rows": rows, "events": list(self.events), "last_poll": self.last_poll,
+                    "next_poll": self.next_poll, "polls": self.polls}
+        # Outlives one missed cycle, so a leader failover does not blank /live
+        self.shared.set(SHARED_KEY, snapshot, interval * 2 + 60)
+
+    def _snapshot(self) -> Optional[Dict]:
+        """Leader's published state when this worker is not polling itself"""
+        if self.shared is None or (self._task is not None and not self._task.done()):
+            return None
+        try:
+            snapshot = self.shared.get(SHARED_KEY)
+        except Exception as e:
+            logger.error(f"Live engine snapshot read failed: {e}")
+            return None
+        if snapshot is not None:
+            self.last_poll, self.next_poll, self.polls = \
+                snapshot["last_poll"], snapshot["next_poll"], snapshot["polls"]
+        return snapshot
+
+    def start(self) -> None:
+        """Start polling on the running event loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # --- queries ------------------------------------------------------
+
+    def live_matches(self, include_finished: bool = True) -> List[Dict]:
+        """Rows of the live table (live first, then recently finished), with display minute"""
+        now = time.time()
+        snapshot = self._snapshot()
+        with self._lock:
+            table = snapshot["rows"] if snapshot is not None else self.table.values()
+            rows = [dict(row, display_minute=estimate_minute(row, now)) for row in table
+                    if include_finished or row["status"] in LIVE_STATUSES]
+        return sorted(rows, key=lambda r: (r["status"] not in LIVE_STATUSES, r["competition"] or "", r["kickoff"] or 0))
+
+    def recent_events(self, limit: int = 10) -> List[Dict]:
+        snapshot = self._snapshot()
+        events = snapshot["events"] if snapshot is not None else list(self.events)
+        return events[-limit:][::-1]
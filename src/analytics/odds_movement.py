@@ -0,0 +1,282 @@
+"""
+📈 Odds Movement Tracker
+Per (event, bookmaker, outcome) price history in ring buffers, with move and steam detection
+"""
+
+from __future__ import annotations
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RING_SIZE = 32                  # prices kept per (event, bookmaker, market, line, outcome)
+INITIAL_SLOTS = 4096
+MOVE_THRESHOLD = 0.10           # |change| vs the oldest price inside MOVE_WINDOW
+MOVE_WINDOW = 6 * 3600
+STEAM_MIN_CHANGE = 0.03         # per-bookmaker change counted towards a steam move
+STEAM_MIN_BOOKS = 3             # bookmakers moving the same way inside STEAM_WINDOW
+STEAM_WINDOW = 15 * 60
+SIGNAL_COOLDOWN = 30 * 60       # same signal is not repeated within this interval
+MAX_SIGNALS = 200
+
+SeriesKey = Tuple[str, str, str, float, str]   # (event_id, bookmaker, market, line, outcome)
+GroupKey = Tuple[str, str, float, str]         # (event_id, market, line, outcome)
+
+
+def _epoch(ts: Optional[str]) -> Optional[int]:
+    if not ts:
+        return None
+    try:
+        return int(datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return None
+
+
+class OddsMovementTracker:
+    """
+    Keeps the last RING_SIZE prices of every quote in preallocated numpy rings.
+
+    Each payload is diffed incrementally: bookmakers whose `last_update` did not
+    change since the previous payload are skipped entirely, and only prices that
+    actually changed are written, so a refresh costs O(changed prices).
+    """
+
+    def __init__(self, ring_size: int = RING_SIZE, capacity: int = INITIAL_SLOTS):
+        self._lock = threading.RLock()
+        self.ring_size = ring_size
+        self.prices = np.zeros((capacity, ring_size), dtype=np.float32)
+        self.times = np.zeros((capacity, ring_size), dtype=np.int64)
+        self.head = np.zeros(capacity, dtype=np.int16)
+        self.count = np.zeros(capacity, dtype=np.int16)
+        self._slots: Dict[SeriesKey, int] = {}
+        self._free: List[int] = []
+        self._next_slot = 0
+        self._bookmaker_updates: Dict[Tuple[str, str, str], str] = {}
+        self._sport_events: Dict[str, set] = {}
+        self._events: Dict[str, Dict] = {}
+        self._group_moves: Dict[GroupKey, Dict[str, Tuple[int, float]]] = {}
+        self._last_signal: Dict[tuple, int] = {}
+        self.signals: Deque[Dict] = deque(maxlen=MAX_SIGNALS)
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    def add_listener(self, callback: Callable[[Dict], None]) -> None:
+        """Register callback(signal) called for every move/steam signal"""
+        self._listeners.append(callback)
+
+    # --- ring buffers -------------------------------------------------
+
+    def _slot(self, key: SeriesKey) -> int:
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self._next_slot
+            self._next_slot += 1
+            if slot >= self.prices.shape[0]:
+                grow = self.prices.shape[0]
+                self.prices = np.concatenate([self.prices, np.zeros((grow, self.ring_size), dtype=np.float32)])
+                self.times = np.concatenate([self.times, np.zeros((grow, self.ring_size), dtype=np.int64)])
+                self.head = np.concatenate([self.head, np.zeros(grow, dtype=np.int16)])
+                self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.int16)])
+        self.head[slot] = 0
+        self.count[slot] = 0
+        self._slots[key] = slot
+        return slot
+
+    def _ordered(self, slot: int) -> Tuple[np.ndarray, np.ndarray]:
+        n, head = int(self.count[slot]), int(self.head[slot])
+        idx = (np.arange(head - n, head)) % self.ring_size
+        return self.times[slot, idx], self.prices[slot, idx]
+
+    def _drop_events(self, event_ids: set) -> None:
+        for key in [k for k in self._slots if k[0] in event_ids]:
+            self._free.append(self._slots.pop(key))
+        for key in [k for k in self._bookmaker_updates if k[0] in event_ids]:
+            del self._bookmaker_updates[key]
+        for key in [k for k in self._group_moves if k[0] in event_ids]:
+            del self._group_moves[key]
+        for key in [k for k in self._last_signal if k[1] in event_ids]:   # (kind, event_id, ...)
+            del self._last_signal[key]
+        for event_id in event_ids:
+            self._events.pop(event_id, None)
+
+    # --- diffing ------------------------------------------------------
+
+    def record(self, sport_key: str, events: List[Dict], markets: Optional[str] = None,
+               replace_sport: bool = False) -> List[Dict]:
+        """
+        Diff an odds payload against the previous one.
+
+        Args:
+            sport_key: Odds API sport key the events belong to
+            events: Events with bookmakers/markets/outcomes
+            markets: Comma separated market keys that were requested
+            replace_sport: Payload lists every event of the sport; free the ones that disappeared
+
+        Returns:
+            New signals raised by this payload
+        """
+        now = int(time.time())
+        new_signals = []
+        with self._lock:
+            listed = set()
+            for event in events:
+                event_id = event.get("id")
+                if not event_id:
+                    continue
+                listed.add(event_id)
+                self._events[event_id] = {
+                    "sport_key": sport_key,
+                    "match": f"{event.get('home_team')} vs {event.get('away_team')}",
+                    "commence_time": event.get("commence_time"),
+                }
+                for bookmaker in event.get("bookmakers", []):
+                    book = bookmaker.get("key") or bookmaker.get("title", "?")
+                    stamp = bookmaker.get("last_update")
+                    # Same bookmaker can be seen in payloads for different market sets
+                    seen_key = (event_id, book, markets or "")
+                    if stamp and self._bookmaker_updates.get(seen_key) == stamp:
+                        continue
+                    self._bookmaker_updates[seen_key] = stamp
+                    ts = _epoch(stamp) or now
+                    for market in bookmaker.get("markets", []):
+                        market_key = "btts" if market.get("key") == "both_teams_to_score" else market.get("key")
+                        for outcome in market.get("outcomes", []):
+                            price = outcome.get("price")
+                            if not price:
+                                continue
+                            line = float(outcome.get("point", market.get("point", 0.0)) or 0.0)
+                            key = (event_id, book, market_key, line, outcome.get("name", ""))
+                            new_signals.extend(self._update_price(key, float(price), ts))
+
+            known = self._sport_events.setdefault(sport_key, set())
+            if replace_sport:
+                # Events no longer listed for this sport have finished: free their slots
+                gone = known - listed
+                if gone:
+                    self._drop_events(gone)
+                known.clear()
+            known.update(listed)
+
+        for signal in new_signals:
+            for callback in self._listeners:
+                try:
+                    callback(signal)
+                except Exception as e:
+                    logger.error(f"Odds movement listener failed: {e}")
+        return new_signals
+
+    def _update_price(self, key: SeriesKey, price: float, ts: int) -> List[Dict]:
+        slot = self._slot(key)
+        n, head = int(self.count[slot]), int(self.head[slot])
+        previous = float(self.prices[slot, (head - 1) % self.ring_size]) if n else None
+        if previous is not None and abs(previous - price) < 1e-6:
+            return []
+
+        self.prices[slot, head] = price
+        self.times[slot, head] = ts
+        self.head[slot] = (head + 1) % self.ring_size
+        self.count[slot] = min(n + 1, self.ring_size)
+        if previous is None:
+            return []
+
+        signals = []
+        event_id, book, market_key, line, outcome = key
+
+        # Single-bookmaker move vs the oldest price inside the window
+        times, prices = self._ordered(slot)
+        in_window = np.flatnonzero(times >= ts - MOVE_WINDOW)
+        reference = float(prices[in_window[0]]) if in_window.size else previous
+        change = price / reference - 1.0
+        if abs(change) >= MOVE_THRESHOLD:
+            signal = self._signal('move', key, ts, {
+                'bookmaker': book, 'from': reference, 'to': price, 'change_pct': change * 100,
+            })
+            if signal:
+                signals.append(signal)
+
+        # Steam: several bookmakers moving the same outcome in the same direction
+        step = price / previous - 1.0
+        if abs(step) >= STEAM_MIN_CHANGE:
+            group = (event_id, market_key, line, outcome)
+            moves = self._group_moves.setdefault(group, {})
+            moves[book] = (ts, step)
+            agreeing = {b: s for b, (t, s) in moves.items() if t >= ts - STEAM_WINDOW and (s > 0) == (step > 0)}
+            if len(agreeing) >= STEAM_MIN_BOOKS:
+                signal = self._signal('steam', group + (step > 0,), ts, {
+                    'bookmakers': sorted(agreeing), 'change_pct': float(np.mean(list(agreeing.values()))) * 100,
+                    'to': price,
+                })
+                if signal:
+                    signals.append(signal)
+        return signals
+
+    def _signal(self, kind: str, dedup_key: tuple, ts: int, details: Dict) -> Optional[Dict]:
+        cooldown_key = (kind,) + dedup_key
+        if ts - self._last_signal.get(cooldown_key, -SIGNAL_COOLDOWN) < SIGNAL_COOLDOWN:
+            return None
+        self._last_signal[cooldown_key] = ts
+
+        event_id = dedup_key[0]
+        market_key, line, outcome = (dedup_key[2], dedup_key[3], dedup_key[4]) if kind == 'move' \
+            else (dedup_key[1], dedup_key[2], dedup_key[3])
+        meta = self._events.get(event_id, {})
+        signal = {
+            'type': kind,
+            'event_id': event_id,
+            'match': meta.get('match'),
+            'sport_key': meta.get('sport_key'),
+            'commence_time': meta.get('commence_time'),
+            'market': market_key,
+            'line': line if market_key == 'totals' else None,
+            'outcome': outcome,
+            'direction': 'drifting' if details['change_pct'] > 0 else 'shortening',
+            'time': ts,
+            **details,
+        }
+        self.signals.appendleft(signal)
+        return signal
+
+    # --- queries ------------------------------------------------------
+
+    def series(self, event_id: str, bookmaker: str, market: str, outcome: str,
+               line: float = 0.0) -> List[Tuple[int, float]]:
+        """Price history (epoch seconds, price), oldest first"""
+        with self._lock:
+            slot = self._slots.get((event_id, bookmaker, market, float(line), outcome))
+            if slot is None:
+                return []
+            times, prices = self._ordered(slot)
+            return [(int(t), float(p)) for t, p in zip(times, prices)]
+
+    def recent_signals(self, limit: int = 10, kind: Optional[str] = None) -> List[Dict]:
+        """Latest signals, newest first"""
+        with self._lock:
+            signals = [s for s in self.signals if kind is None or s['type'] == kind]
+        return signals[:limit]
+
+    def biggest_movers(self, limit: int = 5) -> List[Dict]:
+        """Latest signal per (event, market, line, outcome), steam first, ranked by absolute change"""
+        best: Dict[tuple, Dict] = {}
+        for signal in self.recent_signals(limit=MAX_SIGNALS):
+            key = (signal['event_id'], signal['market'], signal['line'], signal['outcome'])
+            if key not in best or (signal['type'] == 'steam' and best[key]['type'] == 'move'):
+                best[key] = signal
+        return sorted(best.values(), key=lambda s: abs(s['change_pct']), reverse=True)[:limit]
+
+
+# Process-wide tracker fed by fetchers.odds_api listeners
+movement_tracker = OddsMovementTracker()
+
+
+def record_odds(sport_key: str, events: List[Dict], markets: Optional[str] = None,
+                complete: bool = True) -> List[Dict]:
+    """Odds listener entry point (see fetchers.odds_api.add_odds_listener); deltas are merged per event"""
+    return movement_tracker.record(sport_key, events, markets, replace_sport=complete)
@@ -0,0 +1,224 @@
+"""
+🧠 Personal Model
+Per-user logistic model (market, odds band, EV) trained in a background process pool
+"""
+
+from __future__ import annotations
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from src.analytics.ai_personal import AI_DIR, ODDS_BANDS, pattern_store
+from src.analytics.ledger import BetLedger, ledger
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = AI_DIR / "weights"             # one .npz of float32 coefficients per user
+
+# Feature layout (bump MODEL_VERSION when it changes so stale weights are ignored)
+MODEL_VERSION = 1
+MODEL_MARKETS = ("1X2", "OU25", "BTTS")
+FEATURES = ("bias",) + tuple(f"market_{m}" for m in MODEL_MARKETS) + ("market_other",) + \
+    tuple(f"band_{name}" for name, _, _ in ODDS_BANDS) + ("implied_prob", "ev")
+
+MIN_SETTLED = 20        # settled (won/lost) bets before a user gets a model
+RETRAIN_EVERY = 5       # new settlements before the model is refitted
+MAX_WORKERS = 2         # training processes
+L2 = 1.0                # ridge penalty (keeps small samples close to the prior)
+MAX_ITERATIONS = 25
+
+
+def _market_key(market: Optional[str]) -> str:
+    market = (market or "").upper().replace(" ", "")
+    if market in ("1X2", "H2H"):
+        return "1X2"
+    if market.startswith("OU") or market.startswith("OVER") or market == "TOTALS":
+        return "OU25"
+    if market in ("BTTS", "GG", "BOTH_TEAMS_TO_SCORE"):
+        return "BTTS"
+    return "other"
+
+
+def features(market: Optional[str], odds: float, ev_pct: float = 0.0) -> np.ndarray:
+    """Feature vector for one bet/prediction (layout in FEATURES)"""
+    x = np.zeros(len(FEATURES), dtype=np.float32)
+    x[0] = 1.0
+    key = _market_key(market)
+    x[1 + (MODEL_MARKETS.index(key) if key in MODEL_MARKETS else len(MODEL_MARKETS))] = 1.0
+    odds = max(float(odds or 1.0), 1.01)
+    band = next((i for i, (_, low, high) in enumerate(ODDS_BANDS) if low <= odds < high), 0)
+    x[2 + len(MODEL_MARKETS) + band] = 1.0
+    x[-2] = 1.0 / odds
+    x[-1] = float(ev_pct or 0.0) / 100.0
+    return x
+
+
+def fit_logistic(X: np.ndarray, y: np.ndarray, l2: float = L2,
+                 max_iterations: int = MAX_ITERATIONS) -> np.ndarray:
+    """
+    L2-regularized logistic regression by Newton's method (IRLS).
+
+    Runs in a worker process. The bias is not penalized; other weights shrink
+    towards 0, so a handful of bets cannot produce extreme probabilities.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    w = np.zeros(X.shape[1])
+    penalty = np.full(X.shape[1], l2)
+    penalty[0] = 0.0
+    for _ in range(max_iterations):
+        p = 1.0 / (1.0 + np.exp(-np.clip(X @ w, -30, 30)))
+        grad = X.T @ (p - y) + penalty * w
+        hessian = (X * (p * (1 - p))[:, None]).T @ X + np.diag(penalty + 1e-6)
+        step = np.linalg.solve(hessian, grad)
+        w -= step
+        if np.max(np.abs(step)) < 1e-6:
+            break
+    return w.astype(np.float32)
+
+
+def training_data(bets: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """(X, y) from a user's won/lost bets"""
+    settled = [b for b in bets if b.get("status") in ("won", "lost")]
+    if not settled:
+        return np.zeros((0, len(FEATURES)), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    X = np.stack([features(b.get("market"), b.get("odds", 1.0), b.get("ev", 0.0)) for b in settled])
+    y = np.array([1.0 if b["status"] == "won" else 0.0 for b in settled], dtype=np.float32)
+    return X, y
+
+
+class ModelTrainer:
+    """
+    Background training queue.
+
+    request(user_id) is cheap and safe from any thread. The training set is
+    built in the calling process, fitted in a ProcessPoolExecutor with at most
+    MAX_WORKERS jobs, and the weights are saved as a small .npz per user.
+    A user already in training is marked dirty and refitted once more when the
+    running job finishes, so bursts of settlements coalesce into one refit.
+    """
+
+    def __init__(self, source: BetLedger = ledger, directory: Path = MODELS_DIR,
+                 max_workers: int = MAX_WORKERS):
+        self.source = source
+        self.directory = directory
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._running: Dict[str, Future] = {}
+        self._dirty: set = set()
+        self._models: Dict[str, Optional[Dict]] = {}
+        self.stats = {"trained": 0, "failed": 0, "coalesced": 0}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn, not fork: by now the bot runs flush/fsync threads and holds sqlite and
+            # logging locks that a forked child could inherit held
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _path(self, user_id: str) -> Path:
+        return self.directory / f"{user_id}.npz"
+
+    # --- queue --------------------------------------------------------
+
+    def request(self, user_id: str) -> bool:
+        """Queue a (re)fit; returns False if it was coalesced into a running one"""
+        user_id = str(user_id)
+        with self._lock:
+            if user_id in self._running:
+                self._dirty.add(user_id)
+                self.stats["coalesced"] += 1
+                return False
+            X, y = training_data(self.source.user_bets(user_id))
+            if len(y) < MIN_SETTLED:
+                return False
+            future = self._get_pool().submit(fit_logistic, X, y)
+            self._running[user_id] = future
+        future.add_done_callback(lambda f, uid=user_id, n=len(y): self._done(uid, n, f))
+        return True
+
+    def _done(self, user_id: str, n_samples: int, future: Future) -> None:
+        try:
+            weights = future.result()
+            self._save(user_id, weights, n_samples)
+            self.stats["trained"] += 1
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Personal model training for {user_id} failed: {e}")
+        with self._lock:
+            self._running.pop(user_id, None)
+            again = user_id in self._dirty
+            self._dirty.discard(user_id)
+        if again:
+            self.request(user_id)
+
+    def is_training(self, user_id: str) -> bool:
+        with self._lock:
+            return str(user_id) in self._running
+
+    def on_settled(self, user_id: str, counters: Dict) -> None:
+        """Pattern store listener: refit every RETRAIN_EVERY settlements once MIN_SETTLED is reached"""
+        settled = counters.get("settled_bets", 0)
+        if settled < MIN_SETTLED:
+            return
+        model = self.model(user_id)
+        if model is None or settled - model["n_samples"] >= RETRAIN_EVERY:
+            self.request(user_id)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # --- weights ------------------------------------------------------
+
+    def _save(self, user_id: str, weights: np.ndarray, n_samples: int) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f"{user_id}.tmp.npz"
+        np.savez(tmp, weights=weights.astype(np.float32), version=MODEL_VERSION,
+                 n_samples=n_samples, trained_at=time.time())
+        tmp.replace(self._path(user_id))
+        with self._lock:
+            self._models[user_id] = {"weights": weights.astype(np.float32), "n_samples": n_samples,
+                                     "trained_at": time.time()}
+
+    def model(self, user_id: str) -> Optional[Dict]:
+        """{'weights', 'n_samples', 'trained_at'} or None (loaded once per user)"""
+        user_id = str(user_id)
+        with self._lock:
+            if user_id in self._models:
+                return self._models[user_id]
+        model = None
+        try:
+            with np.load(self._path(user_id)) as data:
+                if int(data["version"]) == MODEL_VERSION and data["weights"].shape == (len(FEATURES),):
+                    model = {"weights": data["weights"].astype(np.float32),
+                             "n_samples": int(data["n_samples"]), "trained_at": float(data["trained_at"])}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Could not load personal model of {user_id}: {e}")
+        with self._lock:
+            self._models.setdefault(user_id, model)
+            return self._models[user_id]
+
+    def score(self, user_id: str, market: Optional[str], odds: float, ev_pct: float = 0.0) -> Optional[float]:
+        """Personal win probability for a pick (one dot product), or None without a model"""
+        model = self.model(user_id)
+        if model is None:
+            return None
+        z = float(np.dot(model["weights"], features(market, odds, ev_pct)))
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+
+# Process-wide trainer, fed by the pattern store's settlement notifications
+model_trainer = ModelTrainer()
+pattern_store.add_listener(model_trainer.on_settled)
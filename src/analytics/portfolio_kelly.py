@@ -0,0 +1,184 @@
+"""
+📐 Portfolio Kelly
+Simultaneous Kelly staking across a slate of concurrent bets
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Tuple
+import numpy as np
+
+from src.utils.cache import cache, get_cache
+
+# Slates up to this size are solved on all 2^n outcomes, larger ones on sampled scenarios
+EXACT_MAX_BETS = 12
+SAMPLED_SCENARIOS = 20_000
+# Same safety rules as kelly_criterion_stake (conservative quarter Kelly, 5% cap per bet)
+KELLY_MULTIPLIER = 0.25
+MAX_BET_FRACTION = 0.05
+SOLVE_CACHE_TTL = 3600
+MAX_ITERATIONS = 100
+TOLERANCE = 1e-12
+
+
+def _scenarios(probs: np.ndarray, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, str]:
+    """
+    Outcome matrix (scenarios x bets, True = bet won) and scenario weights.
+
+    Exact: every win/lose combination weighted by its probability. Sampled: equally
+    weighted draws, always including the all-lose scenario so exposure stays < 100%.
+    """
+    n = probs.size
+    if n <= EXACT_MAX_BETS:
+        codes = np.arange(1 << n, dtype=np.uint32)[:, None]
+        wins = ((codes >> np.arange(n, dtype=np.uint32)) & 1).astype(bool)
+        weights = np.where(wins, probs, 1.0 - probs).prod(axis=1)
+        return wins, weights, 'exact'
+
+    rng = np.random.default_rng(seed)
+    wins = rng.random((SAMPLED_SCENARIOS, n)) < probs
+    wins[0] = False
+    weights = np.full(SAMPLED_SCENARIOS, 1.0 / SAMPLED_SCENARIOS)
+    return wins, weights, 'sampled'
+
+
+def _log_growth(returns: np.ndarray, weights: np.ndarray, f: np.ndarray) -> float:
+    wealth = 1.0 + returns @ f
+    if wealth.min() <= 0:
+        return -np.inf
+    return float(weights @ np.log(wealth))
+
+
+def _solve(returns: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, float, int]:
+    """
+    Maximize E[log(1 + R f)] subject to f >= 0 with a projected Newton method.
+
+    Bets at zero whose gradient points outwards are held fixed; the Newton step is
+    taken on the remaining (free) bets and projected back onto f >= 0 with a
+    backtracking line search. The all-lose scenario keeps total exposure below 100%.
+    """
+    f = np.zeros(returns.shape[1])
+    value = 0.0
+    iteration = 0
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        inv_wealth = 1.0 / (1.0 + returns @ f)
+        grad = returns.T @ (weights * inv_wealth)
+        free = (f > 0) | (grad > 0)
+        if not free.any():
+            break
+        scaled = returns[:, free] * (inv_wealth * np.sqrt(weights))[:, None]
+        hessian = scaled.T @ scaled + 1e-12 * np.eye(int(free.sum()))
+        direction = np.zeros_like(f)
+        direction[free] = np.linalg.solve(hessian, grad[free])
+
+        step = 1.0
+        while True:
+            candidate = np.maximum(f + step * direction, 0.0)
+            cand_value = _log_growth(returns, weights, candidate)
+            if cand_value >= value + 1e-4 * float(grad @ (candidate - f)) or step < 1e-10:
+                break
+            step *= 0.5
+        if cand_value <= value:
+            break
+        converged = cand_value - value < TOLERANCE
+        f, value = candidate, cand_value
+        if converged:
+            break
+    return f, value, iteration
+
+
+def _leg_key(bet: Dict) -> Tuple[float, float]:
+    return round(float(bet['probability']), 4), round(float(bet['odds']), 3)
+
+
+def _canonical_order(bets: List[Dict]) -> List[int]:
+    """Indices of bets in canonical (sorted) order; cached solutions are stored in this order"""
+    return sorted(range(len(bets)), key=lambda i: _leg_key(bets[i]))
+
+
+def _slate_key(bets: List[Dict], bankroll: float) -> str:
+    legs = sorted(_leg_key(b) for b in bets)
+    return f"portfolio_kelly:{bankroll:.2f}:{legs}"
+
+
+def portfolio_kelly(bets: List[Dict], bankroll: float, conservative: bool = True) -> Dict:
+    """
+    Jointly size stakes for bets that settle at the same time.
+
+    Maximizes expected log growth over all simultaneous outcomes (bets are assumed
+    independent), instead of sizing each bet as if the whole bankroll were free.
+
+    Args:
+        bets: List of dicts with 'probability' (0-1) and 'odds' (decimal); other keys are kept
+        bankroll: Current bankroll
+        conservative: Apply the quarter-Kelly multiplier and 5% per-bet cap
+
+    Returns:
+        Dict with per-bet joint and independent stakes, totals and solver details
+    """
+    if not bets:
+        return {'error': 'Slate is empty'}
+    for bet in bets:
+        if not 0 < float(bet.get('probability', 0)) < 1:
+            return {'error': 'Probability must be between 0 and 1'}
+        if float(bet.get('odds', 0)) <= 1:
+            return {'error': 'Odds must be greater than 1'}
+
+    # Solve on the canonical (sorted) slate so permutations share a cache entry; the
+    # cached arrays are in canonical order and mapped back through this call's order
+    order = _canonical_order(bets)
+    cache_key = _slate_key(bets, bankroll) + f":{conservative}"
+    cached = get_cache(cache_key)
+    if cached is not None:
+        solution = cached
+    else:
+        probs = np.array([float(bets[i]['probability']) for i in order])
+        net_odds = np.array([float(bets[i]['odds']) - 1.0 for i in order])
+
+        wins, weights, method = _scenarios(probs)
+        returns = np.where(wins, net_odds, -1.0)
+
+        independent = np.maximum((net_odds * probs - (1.0 - probs)) / net_odds, 0.0)
+        full, growth, iterations = _solve(returns, weights)
+
+        joint = full.copy()
+        single = independent.copy()
+        if conservative:
+            joint = np.minimum(joint * KELLY_MULTIPLIER, MAX_BET_FRACTION)
+            single = np.minimum(single * KELLY_MULTIPLIER, MAX_BET_FRACTION)
+
+        solution = {
+            'full_kelly': full.tolist(),
+            'joint': joint.tolist(),
+            'independent': single.tolist(),
+            'expected_log_growth': _log_growth(returns, weights, joint),
+            'full_kelly_log_growth': growth,
+            'method': method,
+            'scenarios': int(weights.size),
+            'iterations': iterations,
+        }
+        cache(cache_key, solution, SOLVE_CACHE_TTL)
+
+    allocation = [dict(bet) for bet in bets]
+    for pos, idx in enumerate(order):
+        allocation[idx].update({
+            'joint_fraction': solution['joint'][pos],
+            'joint_stake': solution['joint'][pos] * bankroll,
+            'independent_fraction': solution['independent'][pos],
+            'independent_stake': solution['independent'][pos] * bankroll,
+        })
+
+    total_joint = sum(solution['joint'])
+    total_single = sum(solution['independent'])
+    return {
+        'bets': allocation,
+        'total_fraction': total_joint,
+        'total_stake': total_joint * bankroll,
+        'independent_total_fraction': total_single,
+        'independent_total_stake': total_single * bankroll,
+        'expected_log_growth': solution['expected_log_growth'],
+        'method': solution['method'],
+        'scenarios': solution['scenarios'],
+        'iterations': solution['iterations'],
+        'conservative_mode': conservative,
+        'cached': cached is not None,
+    }
@@ -0,0 +1,145 @@
+"""
+♻️ Prediction Cache
+Per-fixture predictions keyed by their inputs (odds content hash, team form version):
+a refresh recomputes only the fixtures whose prices or form changed, and logs what moved
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+MAX_ENTRIES = 5000          # (kind, match_id) predictions kept, least recently used evicted
+FORM_TTL = 6 * 3600         # team results are re-fetched after this long
+CHANGE_LOG_SIZE = 500
+
+
+def _digest(parts) -> str:
+    return hashlib.blake2b(json.dumps(parts, separators=(",", ":"), default=str).encode(),
+                           digest_size=8).hexdigest()
+
+
+def odds_fingerprint(event: Optional[Dict]) -> str:
+    """
+    Content hash of an Odds API event's prices.
+
+    Only (bookmaker, market, outcome, point, price) enter the hash, sorted, so
+    a refetch with the same prices (new last_update, reordered bookmakers)
+    keeps the fingerprint and the cached prediction.
+    """
+    if not event:
+        return "none"
+    prices = sorted(
+        (b.get("key", ""), m.get("key", ""), o.get("name", ""), o.get("point"), o.get("price"))
+        for b in event.get("bookmakers", []) for m in b.get("markets", []) for o in m.get("outcomes", []))
+    return _digest([event.get("id"), prices])
+
+
+def results_fingerprint(results: List[Dict]) -> str:
+    """Form version of a team: its finished matches and their scores"""
+    return _digest(sorted(
+        (m.get("id"), ((m.get("score") or {}).get("fullTime") or {}).get("home"),
+         ((m.get("score") or {}).get("fullTime") or {}).get("away"))
+        for m in results or [] if m.get("status") in ("FINISHED", "AWARDED")))
+
+
+class PredictionCache:
+    """
+    (kind, match_id) -> prediction computed from a given set of inputs.
+
+    get() compares the caller's input versions ({"odds": hash, "form": version})
+    with the ones the cached value was computed from; only a mismatch runs
+    compute(), and the change log records which inputs moved together with the
+    before/after summary from describe(). Team results are cached here as well
+    (per team and date, FORM_TTL), which is what makes the form version cheap.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, form_ttl: float = FORM_TTL,
+                 log_size: int = CHANGE_LOG_SIZE):
+        self.max_entries = max_entries
+        self.form_ttl = form_ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, Hashable], Dict]" = OrderedDict()
+        self._forms: Dict[Tuple[Hashable, str], Tuple[float, List[Dict], str]] = {}
+        self.changes: Deque[Dict] = deque(maxlen=log_size)
+        self.stats = {"hits": 0, "computed": 0, "evicted": 0, "form_fetches": 0}
+
+    # --- team form ----------------------------------------------------
+
+    def team_results(self, team_id: Hashable, date_iso: str,
+                     fetch: Callable[[], List[Dict]]) -> Tuple[List[Dict], str]:
+        """(recent results, form version) of a team up to date_iso; fetch() runs on a miss"""
+        key = (team_id, date_iso)
+        now = time.time()
+        with self._lock:
+            cached = self._forms.get(key)
+        if cached is not None and now - cached[0] < self.form_ttl:
+            return cached[1], cached[2]
+        results = fetch() or []
+        version = results_fingerprint(results)
+        with self._lock:
+            self.stats["form_fetches"] += 1
+            self._forms[key] = (now, results, version)
+            for stale in [k for k, v in self._forms.items() if now - v[0] > 2 * self.form_ttl]:
+                del self._forms[stale]
+        return results, version
+
+    # --- predictions --------------------------------------------------
+
+    def get(self, kind: str, match_id: Hashable, inputs: Dict[str, str], compute: Callable[[], Any],
+            describe: Optional[Callable[[Any], Dict]] = None, label: str = "") -> Any:
+        """Cached prediction for these inputs, recomputed (and logged) when any of them changed"""
+        key = (kind, match_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["inputs"] == inputs:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry["value"]
+
+        value = compute()
+        now = time.time()
+        with self._lock:
+            self.stats["computed"] += 1
+            self._entries[key] = {"inputs": dict(inputs), "value": value, "computed_at": now}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+            if entry is not None:
+                moved = sorted(k for k in set(inputs) | set(entry["inputs"])
+                               if inputs.get(k) != entry["inputs"].get(k))
+                self.changes.append({
+                    "time": now, "kind": kind, "match_id": match_id, "match": label, "moved": moved,
+                    "before": describe(entry["value"]) if describe else None,
+                    "after": describe(value) if describe else None,
+                })
+        return value
+
+    def recent_changes(self, limit: int = 10, match_id: Optional[Hashable] = None) -> List[Dict]:
+        """Newest first: which fixtures were recomputed, because of which inputs, and how the pick moved"""
+        with self._lock:
+            changes = [c for c in self.changes if match_id is None or c["match_id"] == match_id]
+        return changes[-limit:][::-1]
+
+    def invalidate(self, match_id: Optional[Hashable] = None) -> None:
+        """Forget one fixture's predictions, or everything"""
+        with self._lock:
+            if match_id is None:
+                self._entries.clear()
+                self._forms.clear()
+            else:
+                for key in [k for k in self._entries if k[1] == match_id]:
+                    del self._entries[key]
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "teams": len(self._forms),
+                    "changes": len(self.changes), **self.stats}
+
+
+# Process-wide cache shared by the picks, express and all-markets handlers
+prediction_cache = PredictionCache()
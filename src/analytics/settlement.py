@@ -0,0 +1,276 @@
+"""
+✅ Automatic Settlement
+Grades pending 1X2 / Over-Under / BTTS bets against finished Football-Data fixtures
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.analytics.ledger import BetLedger, ledger
+from src.fetchers.fixtures import DAYS_AHEAD
+from src.fetchers.football_data import get_matches_for_date
+from src.utils.matching import teams_match
+
+logger = logging.getLogger(__name__)
+
+SETTLE_INTERVAL = 15 * 60     # seconds between sweeps (a FULL_TIME event triggers one sooner)
+FULL_TIME_DELAY = 60          # let Football-Data publish the final score first
+LOOKAHEAD_DAYS = DAYS_AHEAD   # a bet without a kickoff is matched up to this many days after placement
+DEFAULT_LINE = 2.5
+
+_MATCH_SPLIT = re.compile(r"\s+(?:vs\.?|v|-)\s+", re.IGNORECASE)
+_LINE = re.compile(r"(\d+(?:[.,]\d+)?)")
+
+
+def final_score(fixture: Dict) -> Optional[Tuple[int, int]]:
+    """90-minute score of a fixture (regularTime for extra-time/penalty matches)"""
+    score = fixture.get("score") or {}
+    if isinstance(score, (tuple, list)):
+        return int(score[0]), int(score[1])
+    regular = score.get("regularTime") or score.get("fullTime") or {}
+    if regular.get("home") is None or regular.get("away") is None:
+        return None
+    return int(regular["home"]), int(regular["away"])
+
+
+def split_match(match: str) -> Optional[Tuple[str, str]]:
+    parts = _MATCH_SPLIT.split(match or "", maxsplit=1)
+    if len(parts) != 2 or not parts[0].strip() or not parts[1].strip():
+        return None
+    return parts[0].strip(), parts[1].strip()
+
+
+def _line(bet: Dict) -> float:
+    if bet.get("line") is not None:
+        return float(bet["line"])
+    for text in (bet.get("selection", ""), bet.get("market", "")):
+        found = _LINE.search(str(text))
+        if found:
+            value = found.group(1).replace(",", ".")
+            if "." not in value and len(value) == 2:
+                return float(value) / 10    # "OU25" style markets drop the decimal point
+            return float(value)
+    return DEFAULT_LINE
+
+
+def grade(bet: Dict, home: str, away: str, score: Tuple[int, int]) -> Optional[str]:
+    """won/lost/void for a bet on a finished fixture, or None if the selection is not understood"""
+    market = str(bet.get("market", "")).upper().replace(" ", "")
+    selection = str(bet.get("selection", "")).strip()
+    sel = selection.upper()
+    goals_home, goals_away = score
+
+    if market in ("1X2", "H2H", "REZULTATFINAL"):
+        if sel in ("1", "HOME", "GAZDE") or teams_match(selection, home):
+            winner = "home"
+        elif sel in ("X", "DRAW", "EGAL"):
+            winner = "draw"
+        elif sel in ("2", "AWAY", "OASPETI", "OASPEȚI") or teams_match(selection, away):
+            winner = "away"
+        else:
+            return None
+        actual = "home" if goals_home > goals_away else "away" if goals_away > goals_home else "draw"
+        return "won" if winner == actual else "lost"
+
+    if market.startswith(("OU", "O/U", "TOTAL", "OVER", "UNDER", "GOLURI")):
+        if sel.startswith(("OVER", "O", "PESTE", "+")):
+            over = True
+        elif sel.startswith(("UNDER", "U", "SUB", "-")):
+            over = False
+        else:
+            return None
+        line, total = _line(bet), goals_home + goals_away
+        if total == line:
+            return "void"
+        return "won" if (total > line) == over else "lost"
+
+    if market in ("BTTS", "GG", "GG/NG", "AMBELEMARCHEAZA", "BOTH_TEAMS_TO_SCORE"):
+        if sel in ("YES", "DA", "GG", "Y"):
+            wanted = True
+        elif sel in ("NO", "NU", "NG", "N"):
+            wanted = False
+        else:
+            return None
+        return "won" if (goals_home > 0 and goals_away > 0) == wanted else "lost"
+
+    return None
+
+
+class Settler:
+    """
+    Settles pending ledger bets from finished fixtures.
+
+    A sweep groups pending bets by the fixture they refer to (match_id when the
+    bet has one, otherwise the team-name matcher on "Home vs Away"), fetches the
+    needed dates once (in date-window requests with a fixtures repository), grades every bet of a fixture and writes them with one
+    ledger.settle_many call, so the aggregates and leaderboard see one batch
+    per fixture. Bets whose selection cannot be graded stay pending.
+
+    /track stores the fixture's match_id and kickoff (fixture_for), so such a
+    bet is looked up on its match day only; older bets are searched from their
+    placement date over the fixtures window (LOOKAHEAD_DAYS). A bet whose days
+    have all passed without a match is logged once and left pending.
+    """
+
+    def __init__(self, token: Optional[str], comp_codes: List[str], source: BetLedger = ledger,
+                 fixtures=None):
+        self.token = token
+        self.comp_codes = list(comp_codes)
+        self.source = source
+        self.fixtures = fixtures
+        self._listeners: List[Callable[[Dict, List[Dict]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.last_sweep = 0.0
+        self.settled = 0
+        self._unmatched: set = set()
+
+    def add_listener(self, callback: Callable[[Dict, List[Dict]], None]) -> None:
+        """Register callback(fixture, settled_bets) called after each fixture batch"""
+        self._listeners.append(callback)
+
+    # --- matching -----------------------------------------------------
+
+    @staticmethod
+    def _span(bet: Dict) -> Optional[Tuple[date, date]]:
+        """First and last date the bet's fixture can be on: its kickoff, else the lookahead from placement"""
+        try:
+            if bet.get("kickoff"):
+                day = datetime.fromisoformat(str(bet["kickoff"]).replace("Z", "+00:00")).date()
+                return day, day
+            placed = datetime.fromisoformat(bet["date"]).date()
+        except (KeyError, TypeError, ValueError):
+            return None
+        return placed, placed + timedelta(days=LOOKAHEAD_DAYS)
+
+    @classmethod
+    def _dates(cls, bet: Dict, today: datetime) -> List[str]:
+        span = cls._span(bet)
+        if span is None:
+            return []
+        first, last = span
+        return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)
+                if first + timedelta(days=i) <= today.date()]
+
+    @classmethod
+    def _aged_out(cls, bet: Dict, today: datetime) -> bool:
+        """Every candidate date is over (a day of slack for late finishes and score updates)"""
+        span = cls._span(bet)
+        return span is None or span[1] < today.date() - timedelta(days=1)
+
+    @staticmethod
+    def _find(bet: Dict, fixtures: List[Dict]) -> Optional[Dict]:
+        if bet.get("match_id") is not None:
+            return next((f for f in fixtures if f.get("match_id") == bet["match_id"]), None)
+        teams = split_match(bet.get("match", ""))
+        if teams is None:
+            return None
+        return next((f for f in fixtures if teams_match(teams[0], f.get("home_name") or "")
+                     and teams_match(teams[1], f.get("away_name") or "")), None)
+
+    def fixture_for(self, match: str) -> Optional[Dict]:
+        """Not yet finished fixture of a "Home vs Away" bet in the fixtures window, or None (blocking I/O)"""
+        if self.fixtures is None or split_match(match) is None:
+            return None
+        today = datetime.now(timezone.utc).date().isoformat()
+        days = [d for d in self.fixtures.window() if d >= today]
+        by_date = self.fixtures.matches_for_dates(days, self.comp_codes)
+        return self._find({"match": match}, [f for d in days for f in by_date.get(d, [])
+                                             if f.get("status") != "FINISHED"])
+
+    # --- settling -----------------------------------------------------
+
+    def settle_fixture(self, fixture: Dict, bets: List[Dict]) -> List[Dict]:
+        """Grade bets on one finished fixture and settle them in a single ledger write"""
+        score = final_score(fixture)
+        if score is None:
+            return []
+        results = []
+        for bet in bets:
+            result = grade(bet, fixture.get("home_name") or "", fixture.get("away_name") or "", score)
+            if result is not None:
+                results.append((bet["id"], result, None))
+        settled = self.source.settle_many(results) if results else []
+        if settled:
+            self.settled += len(settled)
+            logger.info(f"Settled {len(settled)} bets on {fixture.get('home_name')} vs "
+                        f"{fixture.get('away_name')} ({score[0]}-{score[1]})")
+            for callback in self._listeners:
+                try:
+                    callback(fixture, settled)
+                except Exception as e:
+                    logger.error(f"Settlement listener failed: {e}")
+        return settled
+
+    def sweep(self) -> int:
+        """Settle every pending bet whose fixture has finished (blocking I/O); returns bets settled"""
+        self.last_sweep = time.time()
+        pending = self.source.pending_bets()
+        if not pending:
+            return 0
+        today = datetime.now(timezone.utc)
+        wanted: Dict[str, List[Dict]] = {}
+        for bet in pending:
+            for date in self._dates(bet, today):
+                wanted.setdefault(date, [])
+        if self.fixtures is not None:
+            # All needed dates in as few window requests as possible
+            by_date = self.fixtures.matches_for_dates(list(wanted), self.comp_codes)
+        else:
+            by_date = {date: get_matches_for_date(self.token, self.comp_codes, date) for date in wanted}
+        for date in wanted:
+            wanted[date] = [f for f in by_date.get(date, []) if f.get("status") == "FINISHED"]
+
+        by_fixture: Dict[int, Tuple[Dict, List[Dict]]] = {}
+        for bet in pending:
+            candidates = [f for date in self._dates(bet, today) for f in wanted.get(date, [])]
+            fixture = self._find(bet, candidates)
+            if fixture is not None:
+                by_fixture.setdefault(fixture["match_id"], (fixture, []))[1].append(bet)
+            elif bet["id"] not in self._unmatched and self._aged_out(bet, today):
+                self._unmatched.add(bet["id"])
+                logger.warning(f"Bet {bet['id']} ({bet.get('match')}) matched no finished fixture "
+                               f"by its last candidate date; left pending for /result")
+        return sum(len(self.settle_fixture(fixture, bets)) for fixture, bets in by_fixture.values())
+
+    def on_live_event(self, event: Dict) -> None:
+        """Live engine listener: a FULL_TIME brings the next sweep forward"""
+        if event.get("type") == "FULL_TIME" and self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    # --- background task ----------------------------------------------
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Settlement sweep failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), SETTLE_INTERVAL)
+                await asyncio.sleep(FULL_TIME_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start sweeping on the running event loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
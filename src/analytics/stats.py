@@ -4,103 +4,100 @@ Personal betting performance tracking with visual charts
 """
 
 import json
+import logging
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
 import os
 
+from src.analytics.ledger import ledger
+from src.analytics.aggregates import aggregates, DERIVED_FIELDS
+from src.analytics.leaderboard import leaderboard, MIN_BETS
+from src.utils.db import connect
+
+logger = logging.getLogger(__name__)
+
 # Storage paths
 STATS_DIR = Path(__file__).resolve().parents[2] / "storage"
-STATS_FILE = STATS_DIR / "user_stats.json"
-BETS_FILE = STATS_DIR / "user_bets.json"
+PROFILES_DB = STATS_DIR / "users.db"
+STATS_FILE = STATS_DIR / "user_stats.json"      # legacy profiles, migrated once into users.db
+
+_PROFILES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_profiles (
+    user_id TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    updated TEXT NOT NULL DEFAULT (datetime('now'))
+)
+"""
+_profiles_conn = None
+_profiles_lock = threading.Lock()
+
+def _profiles_db():
+    """users.db connection; one row per user, so workers never overwrite each other's profiles"""
+    global _profiles_conn
+    if _profiles_conn is None:
+        conn = connect(PROFILES_DB)
+        conn.execute(_PROFILES_SCHEMA)
+        _migrate_profiles(conn)
+        _profiles_conn = conn
+    return _profiles_conn
 
-def ensure_stats_files():
-    """Ensure storage directory and files exist"""
-    STATS_DIR.mkdir(exist_ok=True)
+def _migrate_profiles(conn) -> None:
+    """Import the old user_stats.json ({user_id: profile}) once, then rename it"""
     if not STATS_FILE.exists():
-        STATS_FILE.write_text(json.dumps({}))
-    if not BETS_FILE.exists():
-        BETS_FILE.write_text(json.dumps({}))
+        return
+    try:
+        data = json.loads(STATS_FILE.read_text(encoding='utf-8') or "{}")
+    except Exception as e:
+        logger.error(f"Could not read {STATS_FILE} for migration: {e}")
+        return
+    rows = [(str(uid), json.dumps({k: v for k, v in profile.items() if k not in DERIVED_FIELDS}, ensure_ascii=False))
+            for uid, profile in data.items() if isinstance(profile, dict)]
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany("INSERT OR IGNORE INTO user_profiles (user_id, profile) VALUES (?, ?)", rows)
+    conn.execute("COMMIT")
+    try:
+        STATS_FILE.replace(STATS_FILE.with_suffix(".json.migrated"))
+    except OSError as e:
+        logger.warning(f"Could not rename {STATS_FILE}: {e}")
+    logger.info(f"Migrated {len(rows)} user profiles from {STATS_FILE.name}")
 
-def load_user_stats(user_id: str) -> Dict:
-    """Load user statistics"""
-    ensure_stats_files()
+def _load_profile(user_id: str) -> Dict:
     try:
-        with open(STATS_FILE, 'r', encoding='utf-8') as f:
-            all_stats = json.load(f)
-        return all_stats.get(str(user_id), {
-            'total_bets': 0,
-            'won_bets': 0,
-            'lost_bets': 0,
-            'pending_bets': 0,
-            'total_staked': 0.0,
-            'total_returns': 0.0,
-            'best_odds': 0.0,
-            'longest_win_streak': 0,
-            'current_streak': 0,
-            'streak_type': 'none',  # 'win', 'loss', 'none'
-            'favorite_market': 'unknown',
-            'join_date': datetime.now().isoformat(),
-            'last_bet': None,
-            'roi_percentage': 0.0,
-            'profit_loss': 0.0,
-            'average_odds': 0.0,
-            'win_rate': 0.0,
-            'monthly_stats': {},
-            'market_performance': {
-                '1X2': {'bets': 0, 'wins': 0, 'profit': 0.0},
-                'OU25': {'bets': 0, 'wins': 0, 'profit': 0.0},
-                'BTTS': {'bets': 0, 'wins': 0, 'profit': 0.0}
-            }
-        })
-    except Exception:
+        with _profiles_lock:
+            row = _profiles_db().execute("SELECT profile FROM user_profiles WHERE user_id = ?",
+                                         (str(user_id),)).fetchone()
+        return json.loads(row["profile"]) if row else {}
+    except Exception as e:
+        logger.error(f"Could not load profile of {user_id}: {e}")
         return {}
 
+def load_user_stats(user_id: str) -> Dict:
+    """Load user statistics: profile fields (bankroll, join date) + aggregates derived from the ledger"""
+    profile = _load_profile(user_id)
+    stats = {'join_date': datetime.now().isoformat()}
+    stats.update({k: v for k, v in profile.items() if k not in DERIVED_FIELDS})
+    stats.update(aggregates.user_stats(user_id))
+    return stats
+
 def save_user_stats(user_id: str, stats: Dict):
-    """Save user statistics"""
-    ensure_stats_files()
-    try:
-        with open(STATS_FILE, 'r', encoding='utf-8') as f:
-            all_stats = json.load(f)
-    except Exception:
-        all_stats = {}
-    
-    all_stats[str(user_id)] = stats
-    
-    with open(STATS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(all_stats, f, indent=2, ensure_ascii=False)
+    """Save user profile fields; bet-derived fields always come from the ledger and are not stored"""
+    profile = json.dumps({k: v for k, v in stats.items() if k not in DERIVED_FIELDS}, ensure_ascii=False)
+    with _profiles_lock:
+        _profiles_db().execute(
+            "INSERT INTO user_profiles (user_id, profile, updated) VALUES (?, ?, datetime('now')) "
+            "ON CONFLICT(user_id) DO UPDATE SET profile = excluded.profile, updated = excluded.updated",
+            (str(user_id), profile))
 
-def add_bet_record(user_id: str, bet_data: Dict):
-    """Add a new bet record"""
-    ensure_stats_files()
-    try:
-        with open(BETS_FILE, 'r', encoding='utf-8') as f:
-            all_bets = json.load(f)
-    except Exception:
-        all_bets = {}
-    
-    if str(user_id) not in all_bets:
-        all_bets[str(user_id)] = []
-    
-    bet_record = {
-        'id': len(all_bets[str(user_id)]) + 1,
-        'date': datetime.now().isoformat(),
-        'match': bet_data.get('match', 'Unknown'),
-        'market': bet_data.get('market', 'Unknown'),
-        'selection': bet_data.get('selection', 'Unknown'),
-        'odds': bet_data.get('odds', 1.0),
-        'stake': bet_data.get('stake', 0.0),
-        'status': 'pending',  # 'won', 'lost', 'pending'
-        'potential_return': bet_data.get('stake', 0.0) * bet_data.get('odds', 1.0),
-        'ev': bet_data.get('ev', 0.0),
-        'probability': bet_data.get('probability', 0.0)
-    }
-    
-    all_bets[str(user_id)].append(bet_record)
-    
-    with open(BETS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(all_bets, f, indent=2, ensure_ascii=False)
+def add_bet_record(user_id: str, bet_data: Dict) -> Dict:
+    """Add a new bet record (one ledger append); returns the record with its id"""
+    return ledger.add_bet(user_id, bet_data)
+
+def load_user_bets(user_id: str) -> List[Dict]:
+    """Load all bet records of a user (oldest first)"""
+    return ledger.user_bets(user_id)
 
 def create_ascii_chart(values: List[float], labels: List[str], width: int = 20) -> str:
     """Create ASCII bar chart"""
@@ -137,7 +134,8 @@ def get_stats_summary(user_id: str) -> str:
     
     total_bets = stats.get('total_bets', 0)
     won_bets = stats.get('won_bets', 0)
-    win_rate = (won_bets / total_bets * 100) if total_bets > 0 else 0
+    settled_bets = stats.get('settled_bets', 0)
+    win_rate = stats.get('win_rate', 0.0)
     profit_loss = stats.get('profit_loss', 0.0)
     roi = stats.get('roi_percentage', 0.0)
     current_streak = stats.get('current_streak', 0)
@@ -174,7 +172,7 @@ def get_stats_summary(user_id: str) -> str:
 
 🎯 **Performanță Generală:**
 • Total Pariuri: {total_bets}
-• Rate Câștig: {win_rate:.1f}% ({won_bets}/{total_bets})
+• Rate Câștig: {win_rate:.1f}% ({won_bets}/{settled_bets} decontate)
 • ROI: {roi:+.1f}%
 • Profit/Loss: {profit_loss:+.2f} RON
 
@@ -211,102 +209,38 @@ def get_monthly_chart(user_id: str) -> str:
     return create_ascii_chart(values, months, 15)
 
 def update_bet_result(user_id: str, bet_id: int, result: str, actual_return: float = 0.0):
-    """Update bet result (won/lost)"""
-    ensure_stats_files()
-    
-    # Update bet record
-    try:
-        with open(BETS_FILE, 'r', encoding='utf-8') as f:
-            all_bets = json.load(f)
-        
-        user_bets = all_bets.get(str(user_id), [])
-        for bet in user_bets:
-            if bet.get('id') == bet_id:
-                bet['status'] = result
-                if result == 'won':
-                    bet['actual_return'] = actual_return
-                break
-        
-        all_bets[str(user_id)] = user_bets
-        
-        with open(BETS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(all_bets, f, indent=2, ensure_ascii=False)
-    except Exception:
-        pass
-    
-    # Update user stats
-    stats = load_user_stats(user_id)
-    
-    if result == 'won':
-        stats['won_bets'] = stats.get('won_bets', 0) + 1
-        stats['total_returns'] = stats.get('total_returns', 0.0) + actual_return
-        # Update streak
-        if stats.get('streak_type') == 'win':
-            stats['current_streak'] = stats.get('current_streak', 0) + 1
-        else:
-            stats['current_streak'] = 1
-            stats['streak_type'] = 'win'
-        
-        stats['longest_win_streak'] = max(
-            stats.get('longest_win_streak', 0),
-            stats.get('current_streak', 0)
-        )
-    
-    elif result == 'lost':
-        stats['lost_bets'] = stats.get('lost_bets', 0) + 1
-        # Update streak
-        if stats.get('streak_type') == 'loss':
-            stats['current_streak'] = stats.get('current_streak', 0) + 1
-        else:
-            stats['current_streak'] = 1
-            stats['streak_type'] = 'loss'
-    
-    # Recalculate derived stats
-    total_bets = stats.get('total_bets', 0)
-    won_bets = stats.get('won_bets', 0)
-    total_staked = stats.get('total_staked', 0.0)
-    total_returns = stats.get('total_returns', 0.0)
-    
-    stats['win_rate'] = (won_bets / total_bets * 100) if total_bets > 0 else 0.0
-    stats['profit_loss'] = total_returns - total_staked
-    stats['roi_percentage'] = (stats['profit_loss'] / total_staked * 100) if total_staked > 0 else 0.0
-    
-    save_user_stats(user_id, stats)
+    """Update bet result (won/lost); returns the settled record or None if not pending"""
+    # Settle the bet in the ledger (O(1) by id); unknown or already settled bets are ignored
+    bet = ledger.settle(bet_id, result, actual_return if result == 'won' and actual_return else None,
+                        user_id=user_id)
+    if bet is None:
+        return None
+    # Aggregates are updated by the ledger listener
+    return bet
 
-def get_leaderboard() -> str:
-    """Get top performers leaderboard"""
-    ensure_stats_files()
-    try:
-        with open(STATS_FILE, 'r', encoding='utf-8') as f:
-            all_stats = json.load(f)
-    except Exception:
-        return "🏆 Leaderboard nu este disponibil"
-    
-    # Filter users with at least 5 bets
-    qualified_users = []
-    for user_id, stats in all_stats.items():
-        if stats.get('total_bets', 0) >= 5:
-            qualified_users.append({
-                'user_id': user_id,
-                'roi': stats.get('roi_percentage', 0.0),
-                'win_rate': stats.get('win_rate', 0.0),
-                'profit': stats.get('profit_loss', 0.0),
-                'bets': stats.get('total_bets', 0)
-            })
-    
-    if not qualified_users:
-        return "🏆 **Leaderboard**\n\nNu există utilizatori cu minim 5 pariuri încă!"
+PERIOD_TITLES = {'all': 'TOP Performeri', 'week': 'TOP Săptămâna Aceasta', 'month': 'TOP Luna Aceasta'}
+
+def get_leaderboard(period: str = 'all', user_id: Optional[str] = None) -> str:
+    """Get top performers leaderboard (all-time, week or month) and the user's own rank"""
+    if period not in PERIOD_TITLES:
+        period = 'all'
+    top_users = leaderboard.top(10, period)
     
-    # Sort by ROI
-    qualified_users.sort(key=lambda x: x['roi'], reverse=True)
+    if not top_users:
+        return f"🏆 **Leaderboard**\n\nNu există utilizatori cu minim {MIN_BETS} pariuri decontate încă!"
     
-    leaderboard = "🏆 **TOP Performeri** (min. 5 pariuri)\n\n"
+    text = f"🏆 **{PERIOD_TITLES[period]}** (min. {MIN_BETS} pariuri)\n\n"
     
-    for i, user in enumerate(qualified_users[:10], 1):
+    for i, user in enumerate(top_users, 1):
         emoji = ["🥇", "🥈", "🥉"][i-1] if i <= 3 else f"{i}."
         roi = user['roi']
         win_rate = user['win_rate']
         
-        leaderboard += f"{emoji} ROI: {roi:+.1f}% | WR: {win_rate:.1f}% | {user['bets']} pariuri\n"
+        text += f"{emoji} ROI: {roi:+.1f}% | WR: {win_rate:.1f}% | {user['bets']} pariuri\n"
+    
+    if user_id is not None:
+        rank, total = leaderboard.rank(user_id, period)
+        text += f"\n📍 Locul tău: **{rank}/{total}**" if rank else \
+            f"\n📍 Nu ești clasat încă (minim {MIN_BETS} pariuri decontate)"
     
-    return leaderboard
\ No newline at end of file
+    return text
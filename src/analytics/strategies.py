@@ -6,6 +6,7 @@ Arbitrage, Value Betting, Hedging, Risk Management
 from typing import Dict, List, Tuple, Optional
 import math
 from collections import defaultdict
+from src.analytics.bankroll_sim import DEFAULT_BETS
 
 def detect_arbitrage_opportunities(matches_odds: List[Dict]) -> List[Dict]:
     """Detect arbitrage opportunities across bookmakers"""
@@ -243,25 +244,41 @@ def kelly_criterion_stake(probability: float, odds: float, bankroll: float,
         'conservative_mode': conservative
     }
 
-def calculate_risk_of_ruin(kelly_fraction: float, win_prob: float, odds: float) -> float:
-    """Calculate approximate risk of ruin"""
+def calculate_risk_of_ruin(kelly_fraction: float, win_prob: float, odds: float,
+                           n_bets: int = DEFAULT_BETS, ruin_level: float = 0.5) -> float:
+    """
+    Risk of ruin (%) for repeatedly staking kelly_fraction of the current bankroll.
+
+    Closed form (microseconds, so every Kelly quote can carry it): log-bankroll is
+    treated as a random walk with the per-bet mean and variance of the plan, and
+    the finite-horizon first-passage probability of a drifted Brownian motion
+    gives the chance of dropping to ruin_level within n_bets bets. The Monte Carlo
+    report (bankroll_sim) simulates the plan itself for the full distribution.
+    """
     if kelly_fraction <= 0:
         return 0.0
     
-    # Simplified risk of ruin calculation
-    # This is an approximation for practical use
     edge = win_prob * odds - 1
     if edge <= 0:
         return 100.0
-    
-    # For Kelly betting with edge, risk of ruin is very low if fraction < full Kelly
-    variance = win_prob * (odds - 1)**2 + (1 - win_prob) * (-1)**2
-    
-    # Approximate using exponential decay based on edge and variance
-    risk_factor = (kelly_fraction / edge) * math.sqrt(variance)
-    risk_of_ruin = max(0, min(100, 10 * math.exp(-5 / risk_factor)))
-    
-    return risk_of_ruin
+    if kelly_fraction >= 1:
+        return 100.0
+
+    win, loss = math.log1p(kelly_fraction * (odds - 1)), math.log1p(-kelly_fraction)
+    mean = win_prob * win + (1 - win_prob) * loss
+    var = win_prob * (1 - win_prob) * (win - loss) ** 2
+    barrier = -math.log(ruin_level)          # distance to ruin in log-bankroll
+    scale = math.sqrt(var * n_bets)
+    if scale == 0:
+        return 0.0
+
+    def phi(x: float) -> float:
+        return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+    drift = mean * n_bets
+    exponent = -2 * mean * barrier / var
+    tail = math.exp(exponent) * phi((-barrier + drift) / scale) if exponent > -700 else 0.0
+    return min(100.0, 100 * (phi((-barrier - drift) / scale) + tail))
 
 def martingale_protection_check(user_history: List[Dict]) -> Dict:
     """Check for dangerous martingale patterns and warn user"""
@@ -0,0 +1,225 @@
+"""
+🎯 Event Odds Fetcher
+Per-event Odds API markets (BTTS and others the sport endpoint does not serve) for only
+the fixtures being shown: bounded parallel requests, per-event cache, quota accounting
+"""
+
+from __future__ import annotations
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from src.fetchers.odds_api import get_event_odds
+from src.fetchers.refresh_scheduler import kickoff_ttl
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = 4         # parallel event requests
+MAX_EVENTS = 12             # events fetched per call (the earliest kickoffs first)
+MIN_TTL = 10 * 60           # each event costs a request: never refetch more often than this
+MISS_TTL = 30 * 60          # event not listed / market not offered: don't ask again for a while
+RETRY_AFTER = 60            # failed request (timeout, 429, 5xx): retry after this, keep the cached prices
+QUOTA_RESERVE = 50          # below this many remaining requests only cached prices are served
+SHARED_PREFIX = "event_odds:"           # shared_state: <event id> -> {"fetched": ts, "event": extra or None}
+WANTED_KEY = SHARED_PREFIX + "wanted"   # events followers need, fetched by the leader (fetch_wanted)
+WANTED_TTL = 3600
+
+
+def _kickoff(event: Dict) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(event["commence_time"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, ValueError):
+        return None
+
+
+def merge_markets(event: Dict, extra: Optional[Dict]) -> Dict:
+    """Copy of an odds event with the markets of `extra` (same event, other markets) added per bookmaker"""
+    if not extra or not extra.get("bookmakers"):
+        return event
+    bookmakers = {b.get("key"): dict(b, markets=list(b.get("markets", []))) for b in event.get("bookmakers", [])}
+    for bookmaker in extra["bookmakers"]:
+        target = bookmakers.setdefault(bookmaker.get("key"), dict(bookmaker, markets=[]))
+        keys = {m.get("key") for m in target["markets"]}
+        target["markets"].extend(m for m in bookmaker.get("markets", []) if m.get("key") not in keys)
+    return dict(event, bookmakers=list(bookmakers.values()))
+
+
+class EventOddsFetcher:
+    """
+    {event_id: (fetched_at, event)} for the per-event markets (default btts).
+
+    fetch_many() takes the odds events of the fixtures on screen, keeps the ones
+    whose cached prices expired (kickoff_ttl, at least MIN_TTL), caps them at
+    MAX_EVENTS and requests them MAX_CONCURRENCY at a time. Each response goes to
+    the odds listeners as a delta, so the odds store gains the BTTS quotes next
+    to h2h/totals. Only a real miss (404, or no bookmaker offers the market) is
+    remembered for MISS_TTL; a failed request is retried after RETRY_AFTER and
+    the prices cached before it keep being served. Quota used and remaining are
+    read from the response headers; near the end of the quota only cached
+    prices are returned.
+
+    With a shared store (several workers) every result is published per event
+    and a read first takes the results another worker fetched more recently.
+    Only the jobs leader sends requests: a follower adds the events it lacks to
+    a shared wanted list, which the leader's refresh scheduler fetches
+    (fetch_wanted), and serves them on a later read.
+    """
+
+    def __init__(self, api_key: Optional[str], regions: str = "uk,eu", markets: str = "btts",
+                 max_concurrency: int = MAX_CONCURRENCY, max_events: int = MAX_EVENTS,
+                 fetch: Callable[..., Optional[tuple]] = get_event_odds,
+                 shared=None, leader=None):
+        self.api_key = api_key
+        self.regions = regions
+        self.markets = markets
+        self.max_concurrency = max_concurrency
+        self.max_events = max_events
+        self.fetch = fetch
+        self.shared = shared
+        self.leader = leader
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._cache: Dict[str, tuple] = {}
+        self._failed_at: Dict[str, float] = {}
+        self.remaining: Optional[int] = None
+        self.stats = {"requests": 0, "hits": 0, "failed": 0, "skipped": 0, "quota_used": 0}
+
+    def _fresh(self, event: Dict, now: float) -> bool:
+        if now - self._failed_at.get(event["id"], 0.0) < RETRY_AFTER:
+            return True
+        cached = self._cache.get(event["id"])
+        if cached is None:
+            return False
+        fetched_at, extra = cached
+        if extra is None:
+            return now - fetched_at < MISS_TTL
+        kickoff = _kickoff(event)
+        ttl = MIN_TTL if kickoff is None else max(MIN_TTL, kickoff_ttl(kickoff - now))
+        return now - fetched_at < ttl
+
+    def _fetch_one(self, event: Dict) -> None:
+        result = self.fetch(self.api_key, event["sport_key"], event["id"],
+                            regions=self.regions, markets=self.markets)
+        now = time.time()
+        with self._lock:
+            self.stats["requests"] += 1
+            if result is None:
+                self.stats["failed"] += 1
+                self._failed_at[event["id"]] = now
+                return
+            self._failed_at.pop(event["id"], None)
+            extra, headers = result
+            headers = {k.lower(): v for k, v in (headers or {}).items()}
+            try:
+                self.stats["quota_used"] += int(float(headers.get("x-requests-last", 0)))
+                if headers.get("x-requests-remaining") is not None:
+                    self.remaining = int(float(headers["x-requests-remaining"]))
+            except ValueError:
+                pass
+            self._cache[event["id"]] = (now, extra if extra.get("bookmakers") else None)
+        self._publish(event["id"])
+
+    # --- shared store -------------------------------------------------
+
+    def _follower(self) -> bool:
+        return self.leader is not None and not self.leader.is_leader
+
+    def _publish(self, event_id: str) -> None:
+        if self.shared is None:
+            return
+        with self._lock:
+            fetched_at, extra = self._cache[event_id]
+            remaining = self.remaining
+        try:
+            self.shared.set(SHARED_PREFIX + event_id, {"fetched": fetched_at, "event": extra,
+                                                       "remaining": remaining}, 24 * 3600)
+        except Exception as e:
+            logger.warning(f"Event odds publish failed for {event_id}: {e}")
+
+    def _adopt(self, events: List[Dict]) -> None:
+        """Take the results another worker fetched more recently (caller holds the fetch lock)"""
+        if self.shared is None:
+            return
+        for event in events:
+            try:
+                entry = self.shared.get(SHARED_PREFIX + event["id"])
+            except Exception as e:
+                logger.warning(f"Event odds shared read failed: {e}")
+                return
+            with self._lock:
+                if entry is not None and entry["fetched"] > self._cache.get(event["id"], (0.0, None))[0]:
+                    self._cache[event["id"]] = (entry["fetched"], entry["event"])
+                    if entry.get("remaining") is not None:
+                        self.remaining = entry["remaining"]
+
+    def _ask_leader(self, events: List[Dict]) -> None:
+        """Follower: ask the leader for these events through the shared wanted list"""
+        try:
+            wanted = self.shared.get(WANTED_KEY) or {}
+            missing = {e["id"]: {k: e.get(k) for k in ("id", "sport_key", "commence_time")}
+                       for e in events if e["id"] not in wanted}
+            if missing:
+                self.shared.set(WANTED_KEY, {**wanted, **missing}, WANTED_TTL)
+        except Exception as e:
+            logger.warning(f"Event odds request to the leader failed: {e}")
+
+    def fetch_wanted(self) -> int:
+        """Leader: fetch the events followers asked for (blocking I/O); returns how many were asked"""
+        if self.shared is None or self._follower():
+            return 0
+        try:
+            wanted = self.shared.get(WANTED_KEY)
+            if wanted:
+                self.shared.delete(WANTED_KEY)
+        except Exception as e:
+            logger.warning(f"Event odds wanted list read failed: {e}")
+            return 0
+        if wanted:
+            self.fetch_many(list(wanted.values()))
+        return len(wanted or {})
+
+    def _prune(self, now: float) -> None:
+        for event_id in [i for i, (fetched_at, _) in self._cache.items() if now - fetched_at > 24 * 3600]:
+            del self._cache[event_id]
+        for event_id in [i for i, failed_at in self._failed_at.items() if now - failed_at >= RETRY_AFTER]:
+            del self._failed_at[event_id]
+
+    def fetch_many(self, events: List[Dict]) -> Dict[str, Dict]:
+        """{event_id: event with the extra markets} for these odds events (blocking I/O)"""
+        events = [e for e in events if e.get("id") and e.get("sport_key")]
+        if not self.api_key or not events:
+            return {}
+        with self._fetch_lock:
+            self._adopt(events)
+            now = time.time()
+            with self._lock:
+                due = [e for e in events if not self._fresh(e, now)]
+                self.stats["hits"] += len(events) - len(due)
+            if due and self._follower():
+                self._ask_leader(due)
+                due = []
+            if self.remaining is not None and self.remaining < QUOTA_RESERVE:
+                self.stats["skipped"] += len(due)
+                due = []
+            due.sort(key=lambda e: e.get("commence_time") or "")
+            self.stats["skipped"] += max(0, len(due) - self.max_events)
+            due = due[:self.max_events]
+            if due:
+                with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(due))) as pool:
+                    for future in [pool.submit(self._fetch_one, e) for e in due]:
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logger.error(f"Event odds fetch failed: {e}")
+            with self._lock:
+                self._prune(now)
+                return {e["id"]: self._cache[e["id"]][1] for e in events
+                        if e["id"] in self._cache and self._cache[e["id"]][1] is not None}
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {"events": sum(1 for _, extra in self._cache.values() if extra is not None),
+                    "remaining": self.remaining, **self.stats}
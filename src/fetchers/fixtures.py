@@ -0,0 +1,229 @@
+"""
+📅 Fixtures Repository
+One Football-Data /v4/matches request per date window for all competitions, indexed in
+memory per date and competition; only stale dates (kickoff-aware TTLs) are refetched
+"""
+
+from __future__ import annotations
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.fetchers.football_data import get_matches_window
+from src.fetchers.refresh_scheduler import kickoff_ttl, refresh_lead, FINISHED_TTL, FAR_TTL
+
+logger = logging.getLogger(__name__)
+
+DAYS_BACK = 1               # window: yesterday ...
+DAYS_AHEAD = 6              # ... to six days ahead (7 days, under Football-Data's 10-day limit)
+MAX_SPAN = 10               # days per /v4/matches request
+KEEP_DAYS = 14              # dates older than this are dropped from the index
+RETRY_AFTER = 60            # seconds before retrying after a failed request
+SHARED_PREFIX = "fixtures:"     # shared_state key per date: {"fetched": ts, "by_comp": {...}}
+
+
+def _dates(first: date, last: date) -> List[str]:
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+class FixturesRepository:
+    """
+    {date: {competition: [fixtures]}} filled by multi-competition window calls.
+
+    Every date remembers when it was fetched and expires with its most urgent
+    fixture (kickoff_ttl: a minute while a match is live, minutes before a
+    kickoff, hours for days ahead, a day once everything is final). A read
+    first collects the stale dates of the rolling window (or of the requested
+    dates outside it), merges them into contiguous runs and fetches each run
+    with one request: a cold start is one call for the whole week, after that
+    usually the match day plus the date that just entered the window. A failed
+    request keeps serving the old index.
+
+    With a shared store (several workers) every fetched date is published there
+    and a stale date is first taken from it when another worker fetched it more
+    recently. Followers of the jobs leader never fetch the rolling window (the
+    leader's refresh scheduler keeps it warm), only dates outside it.
+    """
+
+    def __init__(self, token: Optional[str], comp_codes: List[str], days_back: int = DAYS_BACK,
+                 days_ahead: int = DAYS_AHEAD,
+                 fetch: Callable[[Optional[str], List[str], str, str], Optional[List[Dict]]] = get_matches_window,
+                 shared=None, leader=None):
+        self.token = token
+        self.comp_codes = list(comp_codes)
+        self.days_back = days_back
+        self.days_ahead = days_ahead
+        self.fetch = fetch
+        self.shared = shared
+        self.leader = leader
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._by_date: Dict[str, Dict[str, List[Dict]]] = {}
+        self._fetched: Dict[str, float] = {}
+        self._failed_at = 0.0
+        self.stats = {"requests": 0, "failed": 0, "hits": 0}
+
+    # --- freshness ----------------------------------------------------
+
+    @staticmethod
+    def _today() -> date:
+        return datetime.now(timezone.utc).date()
+
+    def window(self) -> List[str]:
+        today = self._today()
+        return _dates(today - timedelta(days=self.days_back), today + timedelta(days=self.days_ahead))
+
+    def _ttl(self, day: str, now: float, today: date) -> float:
+        """Shortest kickoff_ttl among the date's fixtures (caller holds the lock)"""
+        ttls = []
+        for fixtures in self._by_date.get(day, {}).values():
+            for fixture in fixtures:
+                try:
+                    kickoff = datetime.fromisoformat(fixture["utcDate"].replace("Z", "+00:00")).timestamp()
+                except (KeyError, AttributeError, ValueError):
+                    continue
+                ttls.append(kickoff_ttl(kickoff - now, fixture.get("status")))
+        if ttls:
+            return min(ttls)
+        return FINISHED_TTL if date.fromisoformat(day) < today else FAR_TTL
+
+    def _due_at(self, day: str, now: float, today: date, ahead: float = 0.0) -> float:
+        """When the date goes stale, or `ahead` s earlier (at most a quarter of its ttl)"""
+        fetched = self._fetched.get(day)
+        if fetched is None:
+            return 0.0
+        ttl = self._ttl(day, now, today)
+        return fetched + ttl - refresh_lead(ttl, ahead)
+
+    def _stale(self, days: Iterable[str], now: float, ahead: float = 0.0) -> List[str]:
+        today = self._today()
+        with self._lock:
+            return sorted(d for d in set(days) if self._due_at(d, now, today, ahead) <= now)
+
+    def next_refresh(self, ahead: float = 0.0) -> Optional[float]:
+        """When the first date of the window is due (the scheduler refreshes then)"""
+        now, today = time.time(), self._today()
+        with self._lock:
+            due = min(self._due_at(d, now, today, ahead) for d in self.window())
+        return max(due, self._failed_at + RETRY_AFTER)
+
+    @staticmethod
+    def _runs(days: List[str]) -> List[tuple]:
+        """Sorted dates -> [(first, last)] contiguous runs of at most MAX_SPAN days"""
+        runs = []
+        for day in days:
+            current = date.fromisoformat(day)
+            if runs:
+                first, last = runs[-1]
+                if (current - last).days == 1 and (current - first).days < MAX_SPAN:
+                    runs[-1] = (first, current)
+                    continue
+            runs.append((current, current))
+        return [(first.isoformat(), last.isoformat()) for first, last in runs]
+
+    # --- loading ------------------------------------------------------
+
+    def _load(self, first: str, last: str) -> bool:
+        fixtures = self.fetch(self.token, self.comp_codes, first, last)
+        now = time.time()
+        with self._lock:
+            self.stats["requests"] += 1
+            if fixtures is None:
+                self.stats["failed"] += 1
+                self._failed_at = now
+                return False
+            days = _dates(date.fromisoformat(first), date.fromisoformat(last))
+            index: Dict[str, Dict[str, List[Dict]]] = {d: {} for d in days}
+            for fixture in fixtures:
+                day = (fixture.get("utcDate") or "")[:10]
+                if day in index:
+                    index[day].setdefault(fixture.get("competition"), []).append(fixture)
+            for day in days:
+                self._by_date[day] = index[day]
+                self._fetched[day] = now
+            cutoff = (self._today() - timedelta(days=KEEP_DAYS)).isoformat()
+            for day in [d for d in self._by_date if d < cutoff]:
+                del self._by_date[day]
+                self._fetched.pop(day, None)
+        self._publish(index, now)
+        return True
+
+    # --- shared store -------------------------------------------------
+
+    def _follower(self) -> bool:
+        return self.leader is not None and not self.leader.is_leader
+
+    def _publish(self, index: Dict[str, Dict[str, List[Dict]]], now: float) -> None:
+        """Fetched dates for the other workers"""
+        if self.shared is None:
+            return
+        for day, by_comp in index.items():
+            try:
+                self.shared.set(SHARED_PREFIX + day, {"fetched": now, "by_comp": by_comp}, KEEP_DAYS * 86400)
+            except Exception as e:
+                logger.warning(f"Fixtures publish failed for {day}: {e}")
+
+    def _adopt(self, days: List[str]) -> None:
+        """Take the dates another worker fetched more recently than we did"""
+        if self.shared is None:
+            return
+        for day in days:
+            try:
+                entry = self.shared.get(SHARED_PREFIX + day)
+            except Exception as e:
+                logger.warning(f"Fixtures shared read failed for {day}: {e}")
+                return
+            if entry is None:
+                continue
+            with self._lock:
+                if entry["fetched"] > self._fetched.get(day, 0.0):
+                    self._by_date[day] = entry["by_comp"]
+                    self._fetched[day] = entry["fetched"]
+
+    def _to_fetch(self, days: List[str], ahead: float) -> List[str]:
+        stale = self._stale(days, time.time(), ahead)
+        if stale and self.shared is not None:
+            self._adopt(stale)
+            stale = self._stale(stale, time.time(), ahead)
+        if stale and self._follower():
+            window = set(self.window())
+            stale = [d for d in stale if d not in window]
+        return stale
+
+    def ensure(self, days: Iterable[str], ahead: float = 0.0) -> None:
+        """Fetch whichever of these dates are stale (or within their lead of `ahead` s), one request per run"""
+        days = list(days)
+        now = time.time()
+        if not self._to_fetch(days, ahead) or now - self._failed_at < RETRY_AFTER:
+            if not ahead:
+                self.stats["hits"] += 1
+            return
+        # One refresh at a time; a caller that waited finds the dates fresh
+        with self._fetch_lock:
+            for first, last in self._runs(self._to_fetch(days, ahead)):
+                self._load(first, last)
+
+    # --- reads --------------------------------------------------------
+
+    def matches_for_dates(self, days: Iterable[str], comp_codes: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+        """{date: fixtures} for several dates (settlement sweeps, multi-day views)"""
+        days = sorted(set(days))
+        window = self.window()
+        self.ensure(days + window if days and window[0] <= days[0] and days[-1] <= window[-1] else days)
+        codes = comp_codes or self.comp_codes
+        with self._lock:
+            return {d: [f for code in codes for f in sorted(self._by_date.get(d, {}).get(code, []),
+                                                                key=lambda f: f.get("utcDate") or "")]
+                    for d in days}
+
+    def matches_for_date(self, date_iso: str, comp_codes: Optional[List[str]] = None) -> List[Dict]:
+        """Fixtures of one date, in competition order then kickoff (same shape as get_matches_for_date)"""
+        return self.matches_for_dates([date_iso], comp_codes)[date_iso]
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {"dates": len(self._by_date),
+                    "fixtures": sum(len(f) for by_comp in self._by_date.values() for f in by_comp.values()),
+                    **self.stats}
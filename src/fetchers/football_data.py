@@ -69,6 +69,106 @@ def get_matches_for_date(token: str | None, comp_codes: List[str], date_iso: str
     
     return res
 
+def _normalize_match(m: dict, code: str | None = None) -> dict:
+    """Format comun pentru un meci Football-Data (la fel ca în get_matches_for_date)"""
+    venue = m.get("venue")
+    return {
+        "competition": code or m.get("competition", {}).get("code"),
+        "match_id": m.get("id"),
+        "utcDate": m.get("utcDate"),
+        "status": m.get("status"),
+        "minute": m.get("minute"),
+        "home_id": m.get("homeTeam", {}).get("id"),
+        "home_name": m.get("homeTeam", {}).get("name"),
+        "away_id": m.get("awayTeam", {}).get("id"),
+        "away_name": m.get("awayTeam", {}).get("name"),
+        "score": m.get("score"),
+        "venue": venue.get("name", "Unknown") if isinstance(venue, dict) else venue or "Unknown"
+    }
+
+def get_live_matches(token: str | None, comp_codes: List[str]) -> list[dict] | None:
+    """
+    Meciurile IN_PLAY/PAUSED din competițiile date, într-un singur request (/v4/matches).
+    Fără cache: cadența este controlată de live engine.
+
+    Returns:
+        list[dict] cu meciurile live, sau None dacă request-ul a eșuat
+    """
+    if not comp_codes:
+        return []
+    try:
+        response = requests.get(
+            f"{BASE}/matches",
+            headers=_headers(token),
+            params={"competitions": ",".join(comp_codes), "status": "IN_PLAY,PAUSED"},
+            timeout=15
+        )
+        if response.status_code != 200:
+            logger.error(f"Football-Data live error {response.status_code}: {response.text[:200]}")
+            return None
+        return [_normalize_match(m) for m in response.json().get("matches", [])]
+    except requests.RequestException as e:
+        logger.error(f"Football-Data live request failed: {str(e)}")
+        return None
+
+def get_matches_window(token: str | None, comp_codes: List[str], date_from: str, date_to: str) -> list[dict] | None:
+    """
+    Toate meciurile din competițiile date între date_from și date_to (inclusiv, yyyy-mm-dd),
+    într-un singur request (/v4/matches). Football-Data acceptă cel mult 10 zile per fereastră.
+    Fără cache: folosit de repository-ul de meciuri, care își ține singur indexul.
+
+    Returns:
+        list[dict] în formatul get_matches_for_date, sau None dacă request-ul a eșuat
+    """
+    if not comp_codes:
+        return []
+    try:
+        response = requests.get(
+            f"{BASE}/matches",
+            headers=_headers(token),
+            params={"competitions": ",".join(comp_codes), "dateFrom": date_from, "dateTo": date_to,
+                    "status": "SCHEDULED,TIMED,IN_PLAY,PAUSED,FINISHED"},
+            timeout=30
+        )
+        if response.status_code != 200:
+            logger.error(f"Football-Data window error {response.status_code}: {response.text[:200]}")
+            return None
+        return [_normalize_match(m) for m in response.json().get("matches", [])]
+    except requests.RequestException as e:
+        logger.error(f"Football-Data window request failed: {str(e)}")
+        return None
+
+def get_competition_results(token: str | None, code: str) -> list[dict] | None:
+    """
+    Toate meciurile terminate din sezonul curent al unei competiții (/v4/competitions/{code}/matches).
+
+    Returns:
+        list[dict] în formatul get_matches_for_date, sau None dacă request-ul a eșuat
+    """
+    try:
+        response = requests.get(f"{BASE}/competitions/{code}/matches", headers=_headers(token),
+                                params={"status": "FINISHED"}, timeout=30)
+        if response.status_code != 200:
+            logger.error(f"Football-Data results error {response.status_code} for {code}: {response.text[:200]}")
+            return None
+        return [_normalize_match(m, code) for m in response.json().get("matches", [])]
+    except requests.RequestException as e:
+        logger.error(f"Football-Data results request failed for {code}: {str(e)}")
+        return None
+
+def get_match(token: str | None, match_id: int) -> dict | None:
+    """Un singur meci (/v4/matches/{id}), ex. scorul final după fluierul de final"""
+    try:
+        response = requests.get(f"{BASE}/matches/{match_id}", headers=_headers(token), timeout=15)
+        if response.status_code != 200:
+            logger.error(f"Football-Data match {match_id} error {response.status_code}")
+            return None
+        data = response.json()
+        return _normalize_match(data.get("match", data))
+    except requests.RequestException as e:
+        logger.error(f"Football-Data match {match_id} request failed: {str(e)}")
+        return None
+
 def get_team_recent_results(token:str|None, team_id:int, end_date:str, days:int=120) -> list[dict]:
     """
     IA ultimele meciuri ale echipei până la end_date (fără a include ziua curentă).
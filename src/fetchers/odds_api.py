@@ -13,10 +13,28 @@ logger = logging.getLogger(__name__)
 
 BASE = "https://api.the-odds-api.com/v4"
 
+# Callbacks notified with (sport_key, events, markets, complete) after every fresh (non-cached) fetch
+_odds_listeners = []
+
+def add_odds_listener(callback) -> None:
+    """
+    Register callback(sport_key, events, markets, complete), e.g. the columnar odds store.
+    complete is False for filtered fetches (commence window / event ids): the payload is a
+    delta to merge per event id, not the full list of the sport's events.
+    """
+    _odds_listeners.append(callback)
+
+def _notify_listeners(sport_key: str, events: list[dict], markets: str, complete: bool = True) -> None:
+    for callback in _odds_listeners:
+        try:
+            callback(sport_key, events, markets, complete)
+        except Exception as e:
+            logger.error(f"Odds listener failed for {sport_key}: {str(e)}")
+
 def get_odds_for_sport(api_key: str, sport_key: str, regions: str = "uk,eu", markets: str = "h2h") -> Tuple[list[dict], dict]:
     """
     Returnează lista de evenimente cu cote pentru un sport key (ex: soccer_epl).
-    markets poate fi "h2h", "totals", "both_teams_to_score" sau combinații separate prin virgulă.
+    markets poate fi "h2h", "totals", "btts" sau combinații separate prin virgulă.
     
     Returns:
         Tuple[list[dict], dict]: (events_list, headers) unde headers conține remaining-requests info
@@ -48,6 +66,7 @@ def get_odds_for_sport(api_key: str, sport_key: str, regions: str = "uk,eu", mar
         
         # Cache for 90 seconds (odds change frequently)
         cache(cache_key, result, 90)
+        _notify_listeners(sport_key, result[0], markets)
         
         return result
         
@@ -58,6 +77,86 @@ def get_odds_for_sport(api_key: str, sport_key: str, regions: str = "uk,eu", mar
         logger.error(f"Unexpected error getting odds for {sport_key}: {str(e)}")
         return [], {}
 
+def get_odds_window(api_key: str, sport_key: str, regions: str = "uk,eu", markets: str = "h2h",
+                    commence_from: Optional[str] = None, commence_to: Optional[str] = None,
+                    event_ids: Optional[List[str]] = None, complete: bool = False) -> Optional[Tuple[list[dict], dict]]:
+    """
+    Cote doar pentru evenimentele care încep în fereastra [commence_from, commence_to]
+    (ISO, ex: 2024-05-01T18:00:00Z) și/sau din lista event_ids. Fără cache: apelantul
+    (planificatorul de refresh) decide când e nevoie de date noi.
+    complete=True marchează un payload care listează toate evenimentele sportului relevante
+    (listenerii pot elimina ce lipsește); implicit rezultatul e un delta pe event id.
+
+    Returns:
+        (events_list, headers) sau None la eroare
+    """
+    url = f"{BASE}/sports/{sport_key}/odds"
+    params = {
+        "apiKey": api_key,
+        "regions": regions,
+        "markets": markets,
+        "oddsFormat": "decimal",
+        "dateFormat": "iso"
+    }
+    if commence_from:
+        params["commenceTimeFrom"] = commence_from
+    if commence_to:
+        params["commenceTimeTo"] = commence_to
+    if event_ids:
+        params["eventIds"] = ",".join(event_ids)
+
+    try:
+        r = requests.get(url, params=params, timeout=30)
+        if r.status_code != 200:
+            logger.error(f"Odds API error {r.status_code} for {sport_key} window: {r.text[:200]}")
+            return None
+        result = (r.json(), dict(r.headers))
+        _notify_listeners(sport_key, result[0], markets, complete)
+        return result
+    except requests.RequestException as e:
+        logger.error(f"Request failed for odds window {sport_key}: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error getting odds window for {sport_key}: {str(e)}")
+        return None
+
+def get_event_odds(api_key: str, sport_key: str, event_id: str, regions: str = "uk,eu",
+                   markets: str = "btts") -> Optional[Tuple[dict, dict]]:
+    """
+    Cotele unui singur eveniment (/sports/{sport}/events/{id}/odds), pentru piețele care
+    nu sunt disponibile pe endpoint-ul de sport (ex: btts). Costă markets × regions cereri.
+    Fără cache: îl ține fetcher-ul de evenimente.
+
+    Returns:
+        (event, headers); ({}, headers) la 404 (evenimentul nu mai e listat);
+        None la erori temporare (timeout, 429, 5xx)
+    """
+    url = f"{BASE}/sports/{sport_key}/events/{event_id}/odds"
+    params = {
+        "apiKey": api_key,
+        "regions": regions,
+        "markets": markets,
+        "oddsFormat": "decimal",
+        "dateFormat": "iso"
+    }
+    try:
+        r = requests.get(url, params=params, timeout=30)
+        if r.status_code == 404:
+            logger.info(f"Event {event_id} not listed for {sport_key}")
+            return {}, dict(r.headers)
+        if r.status_code != 200:
+            logger.error(f"Odds API error {r.status_code} for event {event_id}: {r.text[:200]}")
+            return None
+        result = (r.json(), dict(r.headers))
+        _notify_listeners(sport_key, [result[0]], markets, False)
+        return result
+    except requests.RequestException as e:
+        logger.error(f"Request failed for event odds {event_id}: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error getting event odds {event_id}: {str(e)}")
+        return None
+
 def implied_probs_from_bookmakers(event:dict) -> dict|None:
     """
     Din structura The Odds API (markets h2h), întoarce dict {home, draw, away} probabilități implicite consens (media).
@@ -150,7 +249,8 @@ def parse_totals_prob(event: dict, target_line: float = 2.5) -> dict | None:
 
 def parse_btts_prob(event: dict) -> dict | None:
     """
-    Extrage probabilități Both Teams To Score din structura The Odds API pentru piața 'both_teams_to_score'.
+    Extrage probabilități Both Teams To Score din structura The Odds API pentru piața 'btts'
+    (acceptă și cheia veche 'both_teams_to_score').
     
     Returns:
         dict: {"Yes": p_yes, "No": p_no, "odds": {"Yes": odds_yes, "No": odds_no}}
@@ -158,7 +258,7 @@ def parse_btts_prob(event: dict) -> dict | None:
     """
     for bookmaker in event.get("bookmakers", []):
         for market in bookmaker.get("markets", []):
-            if market.get("key") != "both_teams_to_score":
+            if market.get("key") not in ("btts", "both_teams_to_score"):
                 continue
                 
             # Extrageți cotele pentru Yes și No
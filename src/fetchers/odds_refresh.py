@@ -0,0 +1,260 @@
+"""
+📡 Odds Refresh Planner
+Keeps per-event Odds API quotes for a commence-time window: one full listing of the window
+now and then, in between only the events that are due (near kickoff more often than far out)
+"""
+
+from __future__ import annotations
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from src.fetchers.odds_api import get_odds_window
+from src.fetchers.refresh_scheduler import kickoff_ttl, refresh_lead, NEAR_KICKOFF
+
+logger = logging.getLogger(__name__)
+
+HORIZON = 6 * 86400         # events starting further out than this are never requested
+LIVE_GRACE = 2 * 3600       # started events stay in the window this long (in-play prices)
+STARTED_TTL = 15 * 60       # in-play prices are not what the picks use: refresh them sparingly
+DISCOVERY_INTERVAL = 3 * 3600   # full listing of the window (new fixtures, dropped ones)
+QUOTA_RESERVE = 50          # below this many remaining requests only near-kickoff events are refreshed
+RETRY_AFTER = 60            # seconds before retrying a sport after a failed request
+SHARED_PREFIX = "odds_planner:"     # shared_state: <sport> -> index, <sport>:<event id> -> event
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _kickoff(event: Dict) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(event["commence_time"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, ValueError):
+        return None
+
+
+class OddsRefreshPlanner:
+    """
+    {sport_key: {event_id: event}} of the events starting in [now - LIVE_GRACE, now + HORIZON].
+
+    The first read of a sport (and every DISCOVERY_INTERVAL) lists the whole window
+    with commenceTimeFrom/To. Later reads request only the due events: each event
+    expires with kickoff_ttl() and the due ones go out as a single request
+    filtered by eventIds and their commence range. Payloads are merged per event
+    id, so far-off fixtures are not downloaded again every time a user asks for
+    today's picks; events that leave the window or stop being listed are dropped.
+    The odds store and movement tracker receive the same payloads through the
+    odds_api listeners (complete for a discovery, a delta otherwise). The
+    background scheduler runs the discoveries as they come due too (not on low
+    quota), so user reads find the window listed.
+
+    With a shared store (several workers) the events are published per sport
+    and event, with an index of fetch times; every refresh first takes the
+    events another worker fetched more recently. Only the jobs leader sends
+    Odds API requests: followers serve what the leader published.
+    """
+
+    def __init__(self, api_key: Optional[str], regions: str = "uk,eu", markets: str = "h2h,totals",
+                 horizon: float = HORIZON,
+                 fetch: Callable[..., Optional[tuple]] = get_odds_window,
+                 shared=None, leader=None):
+        self.api_key = api_key
+        self.regions = regions
+        self.markets = markets
+        self.horizon = horizon
+        self.fetch = fetch
+        self.shared = shared
+        self.leader = leader
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._events: Dict[str, Dict[str, Dict]] = {}
+        self._fetched: Dict[str, float] = {}
+        self._discovered: Dict[str, float] = {}
+        self._failed_at: Dict[str, float] = {}
+        self.remaining: Optional[int] = None
+        self.stats = {"discoveries": 0, "deltas": 0, "events_fetched": 0, "hits": 0, "failed": 0}
+
+    # --- planning -----------------------------------------------------
+
+    def _due_times(self, sport_key: str, now: float, within: Optional[float] = None,
+                   ahead: float = 0.0) -> Dict[str, float]:
+        """{event_id: refresh time} of the events this planner would refresh (near kickoff only on low quota)"""
+        if self._low_quota():
+            within = min(within or NEAR_KICKOFF, NEAR_KICKOFF)
+        due_times = {}
+        with self._lock:
+            for event_id, event in self._events.get(sport_key, {}).items():
+                kickoff = _kickoff(event)
+                if kickoff is None or (within is not None and kickoff - now > within):
+                    continue
+                ttl = kickoff_ttl(kickoff - now) if kickoff > now else STARTED_TTL
+                due_times[event_id] = self._fetched.get(event_id, 0.0) + ttl - refresh_lead(ttl, ahead)
+        return due_times
+
+    def _low_quota(self) -> bool:
+        return self.remaining is not None and self.remaining < QUOTA_RESERVE
+
+    def _discovery_at(self, sport_key: str, ahead: float = 0.0) -> float:
+        return self._discovered.get(sport_key, 0.0) + DISCOVERY_INTERVAL - refresh_lead(DISCOVERY_INTERVAL, ahead)
+
+    def _due(self, sport_key: str, now: float, ahead: float = 0.0, within: Optional[float] = None) -> List[str]:
+        return [i for i, due in self._due_times(sport_key, now, within, ahead).items() if due <= now]
+
+    def next_refresh(self, sport_keys, within: Optional[float] = None, ahead: float = 0.0) -> Optional[float]:
+        """When the next discovery, or the first event kicking off within `within` s, is due (None: nothing to refresh)"""
+        if not self.api_key:
+            return None
+        now = time.time()
+        due = [d for sport_key in sport_keys for d in self._due_times(sport_key, now, within, ahead).values()]
+        if not self._low_quota():
+            due.extend(self._discovery_at(sport_key, ahead) for sport_key in sport_keys)
+        if not due:
+            return None
+        return max(min(due), max(self._failed_at.values(), default=0.0) + RETRY_AFTER)
+
+    def _request(self, sport_key: str, commence_from: float, commence_to: float,
+                 event_ids: Optional[List[str]] = None) -> Optional[List[Dict]]:
+        result = self.fetch(self.api_key, sport_key, regions=self.regions, markets=self.markets,
+                            commence_from=_iso(commence_from), commence_to=_iso(commence_to),
+                            event_ids=event_ids, complete=event_ids is None)
+        if result is None:
+            self.stats["failed"] += 1
+            self._failed_at[sport_key] = time.time()
+            return None
+        events, headers = result
+        remaining = {k.lower(): v for k, v in (headers or {}).items()}.get("x-requests-remaining")
+        if remaining is not None:
+            try:
+                self.remaining = int(float(remaining))
+            except ValueError:
+                pass
+        self.stats["events_fetched"] += len(events)
+        return events
+
+    def _merge(self, sport_key: str, events: List[Dict], requested: Optional[List[str]], now: float) -> None:
+        with self._lock:
+            known = self._events.setdefault(sport_key, {})
+            if requested is None:
+                known.clear()
+            for event_id in requested or []:
+                # Requested but not returned: finished, postponed or pulled by the bookmakers
+                known.pop(event_id, None)
+            for event in events:
+                if event.get("id"):
+                    known[event["id"]] = event
+                    self._fetched[event["id"]] = now
+            for event_id in [i for i, e in known.items() if (_kickoff(e) or 0.0) < now - LIVE_GRACE]:
+                del known[event_id]
+            live = {i for sport in self._events.values() for i in sport}
+            for event_id in [i for i in self._fetched if i not in live]:
+                del self._fetched[event_id]
+
+    def refresh(self, sport_key: str, ahead: float = 0.0, within: Optional[float] = None) -> None:
+        """
+        Bring one sport up to date: a window listing when due, otherwise only the due events.
+        The background scheduler passes ahead (refresh what expires that soon) and within
+        (per-event deltas only for events kicking off that soon; the window listing runs
+        whenever it is due, except on low quota).
+        """
+        if not self.api_key:
+            return
+        background = within is not None
+        with self._fetch_lock:
+            self._adopt(sport_key)
+            if self._follower():
+                return
+            now = time.time()
+            if now - self._failed_at.get(sport_key, 0.0) < RETRY_AFTER:
+                return
+            if self._discovery_at(sport_key, ahead) <= now and not (background and self._low_quota()):
+                events = self._request(sport_key, now - LIVE_GRACE, now + self.horizon)
+                if events is not None:
+                    self.stats["discoveries"] += 1
+                    self._discovered[sport_key] = now
+                    self._merge(sport_key, events, None, now)
+                    self._publish(sport_key, events)
+                return
+            due = self._due(sport_key, now, ahead, within)
+            if not due:
+                if not background:
+                    self.stats["hits"] += 1
+                return
+            with self._lock:
+                kickoffs = [_kickoff(self._events[sport_key][i]) for i in due]
+            events = self._request(sport_key, min(kickoffs) - 60, max(kickoffs) + 60, due)
+            if events is not None:
+                self.stats["deltas"] += 1
+                self._merge(sport_key, events, due, now)
+                self._publish(sport_key, events)
+
+    # --- shared store -------------------------------------------------
+
+    def _follower(self) -> bool:
+        return self.leader is not None and not self.leader.is_leader
+
+    def _publish(self, sport_key: str, events: List[Dict]) -> None:
+        """Fetched events and the sport's index for the other workers"""
+        if self.shared is None:
+            return
+        ttl = self.horizon + LIVE_GRACE
+        with self._lock:
+            index = {"fetched": {i: self._fetched.get(i, 0.0) for i in self._events.get(sport_key, {})},
+                     "discovered": self._discovered.get(sport_key, 0.0), "remaining": self.remaining}
+        try:
+            for event in events:
+                if event.get("id") in index["fetched"]:
+                    self.shared.set(f"{SHARED_PREFIX}{sport_key}:{event['id']}", event, ttl)
+            self.shared.set(SHARED_PREFIX + sport_key, index, ttl)
+        except Exception as e:
+            logger.warning(f"Odds publish failed for {sport_key}: {e}")
+
+    def _adopt(self, sport_key: str) -> None:
+        """Take the events another worker fetched more recently; drop the ones it no longer lists"""
+        if self.shared is None:
+            return
+        try:
+            index = self.shared.get(SHARED_PREFIX + sport_key)
+            if index is None:
+                return
+            with self._lock:
+                newer = [i for i, ts in index["fetched"].items() if ts > self._fetched.get(i, 0.0)]
+            events = {i: self.shared.get(f"{SHARED_PREFIX}{sport_key}:{i}") for i in newer}
+        except Exception as e:
+            logger.warning(f"Odds shared read failed for {sport_key}: {e}")
+            return
+        with self._lock:
+            known = self._events.setdefault(sport_key, {})
+            for event_id in [i for i in known if i not in index["fetched"]]:
+                del known[event_id]
+                self._fetched.pop(event_id, None)
+            for event_id, event in events.items():
+                if event is not None:
+                    known[event_id] = event
+                    self._fetched[event_id] = index["fetched"][event_id]
+            self._discovered[sport_key] = max(self._discovered.get(sport_key, 0.0), index["discovered"])
+            if index.get("remaining") is not None:
+                self.remaining = index["remaining"]
+
+    def refresh_all(self, sport_keys, ahead: float = 0.0, within: Optional[float] = None) -> None:
+        for sport_key in sport_keys:
+            try:
+                self.refresh(sport_key, ahead, within)
+            except Exception as e:
+                logger.error(f"Odds refresh failed for {sport_key}: {e}")
+
+    # --- reads --------------------------------------------------------
+
+    def events(self, sport_key: str) -> List[Dict]:
+        """Current events of a sport (refreshing the due ones first), kickoff order"""
+        self.refresh(sport_key)
+        with self._lock:
+            events = list(self._events.get(sport_key, {}).values())
+        return sorted(events, key=lambda e: e.get("commence_time") or "")
+
+    def summary(self) -> Dict:
+        with self._lock:
+            return {"sports": len(self._events), "events": sum(len(e) for e in self._events.values()),
+                    "remaining": self.remaining, **self.stats}
@@ -0,0 +1,232 @@
+"""
+🗄️ Columnar Odds Store
+In-memory store of every bookmaker quote (event x market x line x outcome x bookmaker)
+kept as numpy columns so scanners can work on all competitions in one vectorized pass.
+"""
+
+from __future__ import annotations
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+from src.utils.matching import teams_match
+
+logger = logging.getLogger(__name__)
+
+# Market codes (The Odds API uses "btts"; older code asked for "both_teams_to_score")
+MARKETS = ("h2h", "totals", "btts")
+MARKET_CODES = {"h2h": 0, "totals": 1, "btts": 2, "both_teams_to_score": 2}
+# Outcomes per market: h2h home/draw/away, totals over/under, btts yes/no
+OUTCOMES = {0: ("Home", "Draw", "Away"), 1: ("Over", "Under"), 2: ("Yes", "No")}
+OUTCOME_COUNTS = np.array([3, 2, 2], dtype=np.int8)
+
+COLUMNS = ("event", "market", "line", "outcome", "bookmaker", "price", "updated")
+_DTYPES = {
+    "event": np.int32, "market": np.int8, "line": np.float32, "outcome": np.int8,
+    "bookmaker": np.int16, "price": np.float64, "updated": np.int64,
+}
+
+
+def _epoch(ts: Optional[str]) -> int:
+    if not ts:
+        return 0
+    try:
+        return int(datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp())
+    except ValueError:
+        return 0
+
+
+def _outcome_code(market: int, name: str, home: str, away: str) -> int:
+    if market == 0:
+        if name == home:
+            return 0
+        if name == away:
+            return 2
+        return 1 if name == "Draw" else -1
+    labels = OUTCOMES[market]
+    return labels.index(name) if name in labels else -1
+
+
+class OddsStore:
+    """
+    Quotes are kept per event (so an event's markets can be replaced when it is
+    refreshed) and concatenated lazily into one set of columns on read. Events and
+    bookmakers are interned to small integer ids.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows: Dict[str, Dict[str, np.ndarray]] = {}
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+        self.events: Dict[str, Dict] = {}
+        self.event_ids: List[str] = []
+        self._event_index: Dict[str, int] = {}
+        self.bookmakers: List[str] = []
+        self._bookmaker_index: Dict[str, int] = {}
+        self._listeners: List[Callable[[str, List[str]], None]] = []
+        self.version = 0
+
+    def add_listener(self, callback: Callable[[str, List[str]], None]) -> None:
+        """Register callback(sport_key, event_ids) called after each update"""
+        self._listeners.append(callback)
+
+    def _intern_event(self, event_id: str) -> int:
+        idx = self._event_index.get(event_id)
+        if idx is None:
+            idx = len(self.event_ids)
+            self._event_index[event_id] = idx
+            self.event_ids.append(event_id)
+        return idx
+
+    def _intern_bookmaker(self, key: str) -> int:
+        idx = self._bookmaker_index.get(key)
+        if idx is None:
+            idx = len(self.bookmakers)
+            self._bookmaker_index[key] = idx
+            self.bookmakers.append(key)
+        return idx
+
+    def _event_rows(self, event: Dict) -> Dict[str, np.ndarray]:
+        home, away = event.get("home_team"), event.get("away_team")
+        event_idx = self._intern_event(event["id"])
+        rows = {name: [] for name in COLUMNS}
+        for bookmaker in event.get("bookmakers", []):
+            bm_idx = self._intern_bookmaker(bookmaker.get("key") or bookmaker.get("title", "?"))
+            bm_updated = bookmaker.get("last_update")
+            for market in bookmaker.get("markets", []):
+                code = MARKET_CODES.get(market.get("key"))
+                if code is None:
+                    continue
+                updated = _epoch(market.get("last_update") or bm_updated)
+                for outcome in market.get("outcomes", []):
+                    out = _outcome_code(code, outcome.get("name", ""), home, away)
+                    price = outcome.get("price")
+                    if out < 0 or not price:
+                        continue
+                    rows["event"].append(event_idx)
+                    rows["market"].append(code)
+                    rows["line"].append(float(outcome.get("point", market.get("point", 0.0)) or 0.0) if code == 1 else 0.0)
+                    rows["outcome"].append(out)
+                    rows["bookmaker"].append(bm_idx)
+                    rows["price"].append(float(price))
+                    rows["updated"].append(updated)
+        return {name: np.array(values, dtype=_DTYPES[name]) for name, values in rows.items()}
+
+    def update_events(self, sport_key: str, events: List[Dict], markets: Optional[str] = None,
+                      replace_sport: bool = False) -> None:
+        """
+        Merge events (The Odds API format) into the store.
+
+        Quotes of the fetched markets replace that event's previous quotes for the
+        same markets; quotes of other markets (e.g. BTTS fetched per event) are kept.
+
+        Args:
+            sport_key: Odds API sport key the events belong to
+            events: Events with bookmakers/markets/outcomes
+            markets: Comma separated market keys that were requested (default: all)
+            replace_sport: Drop events of this sport that are no longer listed
+        """
+        codes = sorted({MARKET_CODES[m] for m in (markets or ",".join(MARKETS)).split(",") if m in MARKET_CODES})
+        with self._lock:
+            seen = []
+            for event in events:
+                if not event.get("id"):
+                    continue
+                fresh = self._event_rows(event)
+                old = self._rows.get(event["id"])
+                if old is not None and old["market"].size:
+                    keep = ~np.isin(old["market"], codes)
+                    if keep.any():
+                        fresh = {name: np.concatenate([old[name][keep], fresh[name]]) for name in COLUMNS}
+                self._rows[event["id"]] = fresh
+                self.events[event["id"]] = {
+                    "sport_key": sport_key,
+                    "home_team": event.get("home_team"),
+                    "away_team": event.get("away_team"),
+                    "commence_time": event.get("commence_time"),
+                }
+                seen.append(event["id"])
+            if replace_sport:
+                listed = set(seen)
+                for event_id, meta in list(self.events.items()):
+                    if meta["sport_key"] == sport_key and event_id not in listed:
+                        self._rows.pop(event_id, None)
+                        del self.events[event_id]
+            self._columns = None
+            self.version += 1
+
+        for callback in self._listeners:
+            try:
+                callback(sport_key, seen)
+            except Exception as e:
+                logger.error(f"Odds store listener failed: {e}")
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """All quotes as numpy columns (rebuilt only after an update)"""
+        with self._lock:
+            if self._columns is None:
+                parts = list(self._rows.values())
+                if parts:
+                    self._columns = {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+                else:
+                    self._columns = {name: np.empty(0, dtype=_DTYPES[name]) for name in COLUMNS}
+            return self._columns
+
+    def event_info(self, event_idx: int) -> Dict:
+        event_id = self.event_ids[event_idx]
+        return {"id": event_id, **self.events.get(event_id, {})}
+
+    def find_event(self, home: str, away: str) -> Optional[str]:
+        """Event id whose teams fuzzy-match a Football-Data fixture"""
+        for event_id, meta in self.events.items():
+            if teams_match(home, meta.get("home_team") or "") and teams_match(away, meta.get("away_team") or ""):
+                return event_id
+        return None
+
+    def best_prices(self, event_id: str, market: str = "h2h", line: float = 0.0) -> Dict[str, Dict]:
+        """Best price (and bookmaker) per outcome of one event market"""
+        with self._lock:
+            rows = self._rows.get(event_id)
+        if rows is None:
+            return {}
+        code = MARKET_CODES[market]
+        sel = np.flatnonzero((rows["market"] == code) & np.isclose(rows["line"], line))
+        best = {}
+        for r in sel:
+            name = OUTCOMES[code][int(rows["outcome"][r])]
+            price = float(rows["price"][r])
+            if name not in best or price > best[name]["price"]:
+                best[name] = {"price": price, "bookmaker": self.bookmakers[int(rows["bookmaker"][r])]}
+        return best
+
+    def consensus_probability(self, event_id: str, market: str, outcome: str,
+                              line: float = 0.0) -> Optional[float]:
+        """Average margin-free probability of an outcome across bookmakers quoting the full market"""
+        with self._lock:
+            rows = self._rows.get(event_id)
+        if rows is None or market not in MARKET_CODES:
+            return None
+        code = MARKET_CODES[market]
+        labels = OUTCOMES[code]
+        if outcome not in labels:
+            return None
+        sel = (rows["market"] == code) & np.isclose(rows["line"], line)
+        books, outcomes, prices = rows["bookmaker"][sel], rows["outcome"][sel], rows["price"][sel]
+        probs = []
+        for book in np.unique(books):
+            mine = books == book
+            if np.unique(outcomes[mine]).size != len(labels):
+                continue
+            inv = 1.0 / prices[mine]
+            target = outcomes[mine] == labels.index(outcome)
+            probs.append(float(inv[target][0] / inv.sum()))
+        return sum(probs) / len(probs) if probs else None
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+
+# Process-wide store fed by fetchers.odds_api listeners
+odds_store = OddsStore()
@@ -0,0 +1,129 @@
+"""
+⏱️ Refresh Scheduler
+Kickoff-aware TTLs for fixtures and odds, and a background task that refreshes both just
+before they expire so user requests almost always find them warm
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+LIVE_STATUSES = ("IN_PLAY", "PAUSED")
+FINAL_STATUSES = ("FINISHED", "AWARDED", "CANCELLED", "POSTPONED", "SUSPENDED")
+LIVE_TTL = 60               # in play: scores, statuses and in-play prices move
+FINISHED_TTL = 24 * 3600    # final: nothing left to refetch
+NEAR_KICKOFF = 3 * 3600
+# (seconds to kickoff up to, ttl): the closer the kickoff, the shorter the ttl
+KICKOFF_TIERS = [
+    (NEAR_KICKOFF, 2 * 60),
+    (24 * 3600, 15 * 60),
+    (72 * 3600, 60 * 60),
+]
+FAR_TTL = 3 * 3600          # further out than the last tier
+OVERDUE = 4 * 3600          # past kickoff this long without a final status: stale data, not live
+LEAD = 30                   # refresh up to this long before an entry expires ...
+LEAD_FRACTION = 0.25        # ... but never earlier than this share of its ttl
+MIN_SLEEP = 10
+WANTED_POLL = 30            # several workers: how often the followers' per-event odds requests are picked up
+MAX_SLEEP = 15 * 60
+
+
+def kickoff_ttl(seconds_to_kickoff: float, status: Optional[str] = None) -> float:
+    """
+    How long data about a match stays fresh. Finished matches keep FINISHED_TTL,
+    live ones (or just past kickoff without a final status) LIVE_TTL; otherwise
+    the tier of the time to kickoff, never beyond the kickoff itself.
+    """
+    if status in FINAL_STATUSES:
+        return FINISHED_TTL
+    if status in LIVE_STATUSES or -OVERDUE < seconds_to_kickoff <= 0:
+        return LIVE_TTL
+    if seconds_to_kickoff <= 0:
+        return FAR_TTL
+    ttl = FAR_TTL
+    for until, tier_ttl in KICKOFF_TIERS:
+        if seconds_to_kickoff <= until:
+            ttl = tier_ttl
+            break
+    return max(LIVE_TTL, min(ttl, seconds_to_kickoff))
+
+
+def refresh_lead(ttl: float, ahead: float) -> float:
+    """How early an entry with this ttl may be refreshed when asked to look `ahead` seconds"""
+    return min(ahead, ttl * LEAD_FRACTION)
+
+
+class RefreshScheduler:
+    """
+    Background refresher for the fixtures repository and the odds planner.
+
+    Both sources expire their entries with kickoff_ttl() and report when the next
+    one is due for a refresh (next_refresh): LEAD seconds before it expires, or
+    a quarter of its ttl for short ones (refresh_lead), so a live day is polled
+    about every 45 s rather than every LEAD and a quiet one every few hours. The
+    odds window listing (discovery) is run here as it comes due; per-event odds
+    are warmed only for events kicking off within odds_within seconds (quota),
+    the rest are fetched on demand. Runs on the jobs leader, whose fetches the
+    followers read from the shared store; it also fetches the per-event odds
+    the followers asked for (event_odds.fetch_wanted), at least every
+    WANTED_POLL seconds.
+    """
+
+    def __init__(self, fixtures, odds, sport_keys: Iterable[str], odds_within: float = 24 * 3600,
+                 event_odds=None):
+        self.fixtures = fixtures
+        self.odds = odds
+        self.event_odds = event_odds
+        self.sport_keys = list(sport_keys)
+        self.odds_within = odds_within
+        self.runs = 0
+        self.last_run: Optional[float] = None
+        self.next_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def run_once(self) -> float:
+        """Refresh everything within its lead of expiring (blocking I/O); returns seconds until the next run"""
+        self.fixtures.ensure(self.fixtures.window(), ahead=LEAD)
+        if self.odds_within > 0:
+            self.odds.refresh_all(self.sport_keys, ahead=LEAD, within=self.odds_within)
+        polling = self.event_odds is not None and self.event_odds.shared is not None
+        if polling:
+            self.event_odds.fetch_wanted()
+        now = time.time()
+        self.runs += 1
+        self.last_run = now
+        due = [d for d in (self.fixtures.next_refresh(ahead=LEAD),
+                           self.odds.next_refresh(self.sport_keys, within=self.odds_within, ahead=LEAD)
+                           if self.odds_within > 0 else None) if d is not None]
+        longest = WANTED_POLL if polling else MAX_SLEEP
+        if not due:
+            return longest
+        return max(MIN_SLEEP, min(longest, min(due) - now))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                delay = await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.error(f"Refresh scheduler run failed: {e}")
+                delay = LIVE_TTL
+            self.next_run = time.time() + delay
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        """Start refreshing on the running event loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
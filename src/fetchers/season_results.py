@@ -0,0 +1,253 @@
+"""
+🗂️ Season Results
+Finished matches of every tracked competition in one compact SQLite table, synced
+incrementally from a watermark; team form and splits are computed locally from it
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from src.fetchers.football_data import get_competition_results, get_matches_window
+from src.utils.db import connect
+
+logger = logging.getLogger(__name__)
+
+RESULTS_DB = Path(__file__).resolve().parents[2] / "storage" / "results.db"
+SYNC_INTERVAL = 30 * 60     # seconds between incremental syncs
+CHECK_INTERVAL = 3 * 60     # how often the background task looks for due competitions
+OVERLAP_DAYS = 2            # re-read this far behind the watermark (late score corrections)
+MAX_SPAN = 10               # days per /v4/matches request
+FORM_MATCHES = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    match_id    INTEGER PRIMARY KEY,
+    competition TEXT NOT NULL,
+    utc_date    TEXT NOT NULL,
+    home_id     INTEGER NOT NULL,
+    away_id     INTEGER NOT NULL,
+    home_goals  INTEGER NOT NULL,
+    away_goals  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_home ON results (home_id, utc_date);
+CREATE INDEX IF NOT EXISTS results_away ON results (away_id, utc_date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    competition TEXT PRIMARY KEY,
+    watermark   TEXT,
+    synced_at   REAL NOT NULL
+);
+"""
+
+
+def _row(fixture: Dict) -> Optional[tuple]:
+    full = (fixture.get("score") or {}).get("fullTime") or {}
+    if fixture.get("status") != "FINISHED" or full.get("home") is None or full.get("away") is None:
+        return None
+    if fixture.get("match_id") is None or fixture.get("home_id") is None or fixture.get("away_id") is None:
+        return None
+    return (fixture["match_id"], fixture.get("competition") or "", fixture.get("utcDate") or "",
+            fixture["home_id"], fixture["away_id"], int(full["home"]), int(full["away"]))
+
+
+class SeasonResultsStore:
+    """
+    results(match_id, competition, utc_date, home_id, away_id, goals) plus a
+    per-competition watermark (the date the table is complete up to).
+
+    A competition without a watermark is pulled once for the whole season (one
+    request each). After that a sync is a single multi-competition /v4/matches
+    window from the oldest watermark (minus OVERLAP_DAYS) to today, and rows are
+    upserted, so repeated or overlapping syncs are harmless. Syncing runs in a
+    background task on the jobs leader (start/stop), every SYNC_INTERVAL per
+    competition; reads only query the table (callers fall back to the per-team
+    request for teams it does not know yet). Table and watermarks live in the
+    database, so the other workers read what the leader synced.
+    """
+
+    def __init__(self, token: Optional[str], comp_codes: List[str], path: Path = RESULTS_DB,
+                 fetch_season: Callable[[Optional[str], str], Optional[List[Dict]]] = get_competition_results,
+                 fetch_window: Callable[[Optional[str], List[str], str, str], Optional[List[Dict]]] = get_matches_window):
+        self.token = token
+        self.comp_codes = list(comp_codes)
+        self.path = path
+        self.fetch_season = fetch_season
+        self.fetch_window = fetch_window
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._conn = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"season_pulls": 0, "window_pulls": 0, "rows": 0, "failed": 0}
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    # --- sync ---------------------------------------------------------
+
+    def _store(self, fixtures: List[Dict]) -> int:
+        rows = [r for r in map(_row, fixtures) if r is not None]
+        if not rows:
+            return 0
+        watermarks: Dict[str, str] = {}
+        for row in rows:
+            watermarks[row[1]] = max(watermarks.get(row[1], ""), row[2])
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            conn.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(match_id) DO UPDATE SET "
+                             "utc_date = excluded.utc_date, home_goals = excluded.home_goals, "
+                             "away_goals = excluded.away_goals", rows)
+            for code, watermark in watermarks.items():
+                conn.execute("INSERT INTO sync_state (competition, watermark, synced_at) VALUES (?, ?, 0) "
+                             "ON CONFLICT(competition) DO UPDATE SET watermark = MAX(COALESCE(watermark, ''), "
+                             "excluded.watermark)", (code, watermark))
+            conn.execute("COMMIT")
+        self.stats["rows"] += len(rows)
+        return len(rows)
+
+    def _mark_synced(self, codes: List[str], now: float, through: str) -> None:
+        """Complete up to `through`: the next sync starts there even if nothing was played"""
+        with self._lock:
+            self._db().executemany(
+                "INSERT INTO sync_state (competition, watermark, synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(competition) DO UPDATE SET synced_at = excluded.synced_at, "
+                "watermark = MAX(COALESCE(watermark, ''), excluded.watermark)",
+                [(code, through, now) for code in codes])
+
+    def _state(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._db().execute("SELECT competition, watermark, synced_at FROM sync_state").fetchall()
+        return {row["competition"]: dict(row) for row in rows}
+
+    def sync(self, force: bool = False) -> int:
+        """Bring the table up to date (blocking I/O); returns rows written"""
+        with self._sync_lock:
+            now = time.time()
+            state = self._state()
+            due = [c for c in self.comp_codes if force or now - state.get(c, {}).get("synced_at", 0.0) >= SYNC_INTERVAL]
+            if not due:
+                return 0
+            written = 0
+            today = datetime.now(timezone.utc).date()
+            # First run of a competition: the whole season in one request
+            fresh = [c for c in due if not state.get(c, {}).get("watermark")]
+            for code in fresh:
+                fixtures = self.fetch_season(self.token, code)
+                self.stats["season_pulls"] += 1
+                if fixtures is None:
+                    self.stats["failed"] += 1
+                    continue
+                written += self._store(fixtures)
+                self._mark_synced([code], now, today.isoformat())
+
+            # Everything else: finished matches since the oldest watermark, all competitions at once
+            known = [c for c in due if state.get(c, {}).get("watermark")]
+            if known:
+                oldest = min(state[c]["watermark"] for c in known)[:10]
+                start = date.fromisoformat(oldest) - timedelta(days=OVERLAP_DAYS)
+                ok = True
+                while start <= today:
+                    end = min(today, start + timedelta(days=MAX_SPAN - 1))
+                    fixtures = self.fetch_window(self.token, known, start.isoformat(), end.isoformat())
+                    self.stats["window_pulls"] += 1
+                    if fixtures is None:
+                        self.stats["failed"] += 1
+                        ok = False
+                        break
+                    written += self._store(fixtures)
+                    start = end + timedelta(days=1)
+                if ok:
+                    self._mark_synced(known, now, today.isoformat())
+            if written:
+                logger.info(f"Season results: {written} rows synced ({len(fresh)} full seasons)")
+            return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+            except Exception as e:
+                logger.error(f"Season results sync failed: {e}")
+            await asyncio.sleep(CHECK_INTERVAL)
+
+    def start(self) -> None:
+        """Start syncing on the running event loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # --- reads --------------------------------------------------------
+
+    def team_matches(self, team_id: int, before: str, limit: int = 10) -> List[Dict]:
+        """Last finished matches of a team up to `before` (inclusive, yyyy-mm-dd), oldest first"""
+        until = (date.fromisoformat(before[:10]) + timedelta(days=1)).isoformat()
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT * FROM (SELECT * FROM results WHERE home_id = ? AND utc_date < ? "
+                "UNION ALL SELECT * FROM results WHERE away_id = ? AND utc_date < ?) "
+                "ORDER BY utc_date DESC LIMIT ?", (team_id, until, team_id, until, limit)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def team_results(self, team_id: int, before: str, limit: int = 10) -> List[Dict]:
+        """Same shape as Football-Data /teams/{id}/matches (drop-in for get_team_recent_results)"""
+        return [{
+            "id": row["match_id"], "utcDate": row["utc_date"], "status": "FINISHED",
+            "competition": {"code": row["competition"]},
+            "homeTeam": {"id": row["home_id"]}, "awayTeam": {"id": row["away_id"]},
+            "score": {"fullTime": {"home": row["home_goals"], "away": row["away_goals"]}},
+        } for row in self.team_matches(team_id, before, limit)]
+
+    def team_form(self, team_id: int, before: str, n: int = FORM_MATCHES) -> Optional[Dict]:
+        """
+        Form over the team's last n matches: points per game, W/D/L string, goals
+        for/against per game, and the same points split by home and away games.
+        None when the team has no stored results.
+        """
+        rows = self.team_matches(team_id, before, limit=n * 3)
+        if not rows:
+            return None
+
+        def summarize(matches: List[Dict]) -> Dict:
+            points, goals_for, goals_against, letters = 0, 0, 0, ""
+            for m in matches:
+                home = m["home_id"] == team_id
+                scored, conceded = (m["home_goals"], m["away_goals"]) if home else (m["away_goals"], m["home_goals"])
+                goals_for += scored
+                goals_against += conceded
+                if scored > conceded:
+                    points, letters = points + 3, letters + "W"
+                elif scored == conceded:
+                    points, letters = points + 1, letters + "D"
+                else:
+                    letters += "L"
+            played = max(1, len(matches))
+            return {"played": len(matches), "ppg": points / played, "form": letters,
+                    "goals_for": goals_for / played, "goals_against": goals_against / played}
+
+        form = summarize(rows[-n:])
+        form["home"] = summarize([m for m in rows if m["home_id"] == team_id][-n:])
+        form["away"] = summarize([m for m in rows if m["away_id"] == team_id][-n:])
+        return form
+
+    def summary(self) -> Dict:
+        with self._lock:
+            count = self._db().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        state = self._state()
+        return {"matches": count, "competitions": len(state),
+                "last_sync": max((s["synced_at"] for s in state.values()), default=0.0), **self.stats}
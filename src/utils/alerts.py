@@ -0,0 +1,357 @@
+"""
+🔔 Push Alerts
+Subscription registry indexed by (event, alert type) and a rate-limited fan-out dispatcher
+that coalesces bursts per chat (Telegram: ~30 msg/s global, 1 msg/s per chat).
+"""
+
+from __future__ import annotations
+import asyncio
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from src.utils.db import connect
+
+logger = logging.getLogger(__name__)
+
+STORAGE_DIR = Path(__file__).resolve().parents[2] / "storage"
+ALERTS_DB = STORAGE_DIR / "users.db"
+LEGACY_ALERTS = STORAGE_DIR / "alerts.json"     # migrated once into users.db
+
+ALERT_TYPES = ("goals", "odds", "value")
+ALL_EVENTS = "*"
+DEFAULT_THRESHOLDS = {"goals": 0.0, "odds": 10.0, "value": 5.0}
+
+GLOBAL_RATE = 25.0          # messages per second, kept under Telegram's ~30/s
+GLOBAL_BURST = 25
+PER_CHAT_INTERVAL = 1.0     # seconds between two messages to the same chat
+MAX_IN_FLIGHT = 25
+MAX_MESSAGE_CHARS = 3900    # Telegram limit is 4096
+MAX_PENDING_LINES = 30      # per chat; older lines are dropped in very long bursts
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alert_subs (
+    chat_id    INTEGER NOT NULL,
+    event_key  TEXT NOT NULL,
+    alert_type TEXT NOT NULL,
+    threshold  REAL NOT NULL,
+    PRIMARY KEY (chat_id, event_key, alert_type)
+)
+"""
+
+
+class AlertRegistry:
+    """
+    (event_key, alert_type) -> {chat_id: threshold}
+
+    event_key is a Football-Data match id / Odds API event id, or "*" for every
+    event. Lookups for one event touch only its own bucket plus the "*" bucket.
+
+    Subscriptions live in SQLite (alert_subs in users.db) and every change is a
+    single-row statement, so workers never overwrite each other. With
+    shared=True (several workers) the in-memory index is rebuilt when another
+    connection has committed (PRAGMA data_version, one cheap query per lookup).
+    """
+
+    def __init__(self, path: Path = ALERTS_DB, legacy_path: Optional[Path] = LEGACY_ALERTS,
+                 shared: bool = False):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._index: Dict[Tuple[str, str], Dict[int, float]] = defaultdict(dict)
+        self._conn = connect(self.path)
+        self._conn.execute(_SCHEMA)
+        self._version = None
+        self._load()
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _reload_if_changed(self) -> None:
+        if self.shared and self._data_version() != self._version:
+            self._load()
+
+    def _load(self) -> None:
+        rows = self._conn.execute("SELECT chat_id, event_key, alert_type, threshold FROM alert_subs").fetchall()
+        if not rows and self._migrate():
+            rows = self._conn.execute("SELECT chat_id, event_key, alert_type, threshold FROM alert_subs").fetchall()
+        self._index = defaultdict(dict)
+        for row in rows:
+            self._index[(row["event_key"], row["alert_type"])][row["chat_id"]] = row["threshold"]
+        self._version = self._data_version()
+
+    def _migrate(self) -> bool:
+        """Import the old alerts.json ({chat_id: {event_key: {type: threshold}}}) into an empty table"""
+        if not self.legacy_path or not self.legacy_path.exists():
+            return False
+        try:
+            data = json.loads(self.legacy_path.read_text() or "{}")
+        except Exception as e:
+            logger.error(f"Could not read {self.legacy_path} for migration: {e}")
+            return False
+        rows = [(int(chat_id), event_key, alert_type, float(threshold))
+                for chat_id, subs in data.items() for event_key, types in subs.items()
+                for alert_type, threshold in types.items()]
+        self._conn.execute("BEGIN IMMEDIATE")
+        self._conn.executemany("INSERT OR IGNORE INTO alert_subs VALUES (?, ?, ?, ?)", rows)
+        self._conn.execute("COMMIT")
+        # Renamed so that an emptied table is not filled again from the old file
+        try:
+            self.legacy_path.replace(self.legacy_path.with_suffix(".json.migrated"))
+        except OSError as e:
+            logger.warning(f"Could not rename {self.legacy_path}: {e}")
+        logger.info(f"Migrated {len(rows)} alert subscriptions from {self.legacy_path.name}")
+        return True
+
+    def subscribe(self, chat_id: int, alert_type: str, threshold: Optional[float] = None,
+                  event_key: str = ALL_EVENTS) -> None:
+        if alert_type not in ALERT_TYPES:
+            raise ValueError(f"Unknown alert type: {alert_type}")
+        threshold = float(DEFAULT_THRESHOLDS[alert_type] if threshold is None else threshold)
+        with self._lock:
+            self._reload_if_changed()
+            self._conn.execute(
+                "INSERT INTO alert_subs VALUES (?, ?, ?, ?) ON CONFLICT(chat_id, event_key, alert_type) "
+                "DO UPDATE SET threshold = excluded.threshold", (int(chat_id), str(event_key), alert_type, threshold))
+            self._index[(str(event_key), alert_type)][int(chat_id)] = threshold
+
+    def unsubscribe(self, chat_id: int, alert_type: Optional[str] = None,
+                    event_key: Optional[str] = None) -> None:
+        """Remove one subscription, all of a type, or (no args) everything for a chat"""
+        with self._lock:
+            self._reload_if_changed()
+            self._conn.execute(
+                "DELETE FROM alert_subs WHERE chat_id = ? AND (? IS NULL OR alert_type = ?) "
+                "AND (? IS NULL OR event_key = ?)",
+                (int(chat_id), alert_type, alert_type,
+                 None if event_key is None else str(event_key), None if event_key is None else str(event_key)))
+            for (key, kind), chats in list(self._index.items()):
+                if (alert_type is None or kind == alert_type) and (event_key is None or key == str(event_key)):
+                    chats.pop(int(chat_id), None)
+                    if not chats:
+                        del self._index[(key, kind)]
+
+    def subscribers(self, alert_type: str, event_key: Optional[str] = None,
+                    value: Optional[float] = None) -> Set[int]:
+        """Chats subscribed to alert_type for this event (or all events) whose threshold <= value"""
+        with self._lock:
+            self._reload_if_changed()
+            buckets = [self._index.get((ALL_EVENTS, alert_type), {})]
+            if event_key is not None:
+                buckets.append(self._index.get((str(event_key), alert_type), {}))
+            return {chat for bucket in buckets for chat, threshold in bucket.items()
+                    if value is None or abs(value) >= threshold}
+
+    def settings_for(self, chat_id: int) -> Dict[str, Dict[str, float]]:
+        """{alert_type: {event_key: threshold}} for one chat"""
+        result: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            self._reload_if_changed()
+            for (event_key, alert_type), chats in self._index.items():
+                if int(chat_id) in chats:
+                    result.setdefault(alert_type, {})[event_key] = chats[int(chat_id)]
+        return result
+
+
+class AlertDispatcher:
+    """
+    Fan-out queue in front of the Telegram API.
+
+    publish() may be called from any thread (live engine / odds listeners run in
+    worker threads). Lines for the same chat are coalesced into one message; a chat
+    gets at most one message per PER_CHAT_INTERVAL, and a global token bucket keeps
+    the total under GLOBAL_RATE. On a flood wait (RetryAfter) the failed lines go
+    back in front of the chat's queue, the chat is pushed back by retry_after and
+    the bucket is drained for that long.
+    """
+
+    def __init__(self, send: Callable[[int, str], Awaitable[None]],
+                 on_blocked: Optional[Callable[[int], None]] = None,
+                 blocked_errors: Tuple[type, ...] = ()):
+        self._send = send
+        self._on_blocked = on_blocked
+        self._blocked_errors = blocked_errors
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, List[str]] = {}
+        self._ready: List[Tuple[float, int, int]] = []   # heap of (ready_at, seq, chat_id)
+        self._queued: Dict[int, int] = {}                 # chat_id -> seq of its live heap entry
+        self._next_allowed: Dict[int, float] = {}
+        self._seq = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tokens = float(GLOBAL_BURST)
+        self._tokens_at = time.monotonic()
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self.stats = {"published": 0, "sent": 0, "coalesced": 0, "dropped": 0, "failed": 0}
+
+    # --- producer side ------------------------------------------------
+
+    def publish(self, chat_ids, line: str) -> None:
+        """Queue one alert line for many chats (thread-safe)"""
+        chat_ids = list(chat_ids)
+        if not chat_ids or self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, chat_ids, line)
+        except RuntimeError:
+            pass   # loop closed during shutdown
+
+    def _enqueue(self, chat_ids: List[int], line: str) -> None:
+        now = time.monotonic()
+        for chat_id in chat_ids:
+            self.stats["published"] += 1
+            lines = self._pending.get(chat_id)
+            if lines is not None:
+                # Already waiting for its slot: coalesce into the same message
+                lines.append(line)
+                self.stats["coalesced"] += 1
+                if len(lines) > MAX_PENDING_LINES:
+                    del lines[0]
+                    self.stats["dropped"] += 1
+                continue
+            self._pending[chat_id] = [line]
+            self._schedule(chat_id, max(now, self._next_allowed.get(chat_id, 0.0)))
+        self._wakeup.set()
+
+    def _schedule(self, chat_id: int, ready_at: float) -> None:
+        """(Re)schedule a chat's pending lines; an older heap entry of the chat goes stale"""
+        self._seq += 1
+        self._queued[chat_id] = self._seq
+        heapq.heappush(self._ready, (ready_at, self._seq, chat_id))
+
+    def _requeue(self, chat_id: int, lines: List[str], retry: float) -> None:
+        """Flood wait: failed lines back in front of the chat's queue, sent no sooner than `retry` s"""
+        now = time.monotonic()
+        self._next_allowed[chat_id] = now + retry
+        queued = lines + self._pending.get(chat_id, [])
+        if len(queued) > MAX_PENDING_LINES:
+            self.stats["dropped"] += len(queued) - MAX_PENDING_LINES
+            queued = queued[-MAX_PENDING_LINES:]
+        self._pending[chat_id] = queued
+        self._schedule(chat_id, now + retry)
+        # The bot as a whole is being throttled: spend no tokens until the wait is over
+        self._tokens = min(self._tokens + (now - self._tokens_at) * GLOBAL_RATE, GLOBAL_BURST, -retry * GLOBAL_RATE)
+        self._tokens_at = now
+        self._wakeup.set()
+
+    # --- consumer side ------------------------------------------------
+
+    async def _take_token(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(GLOBAL_BURST, self._tokens + (now - self._tokens_at) * GLOBAL_RATE)
+            self._tokens_at = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return
+            await asyncio.sleep((1.0 - self._tokens) / GLOBAL_RATE)
+
+    async def _run(self) -> None:
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            ready_at, _, chat_id = self._ready[0]
+            delay = ready_at - time.monotonic()
+            if delay > 0:
+                # Sleep until the earliest chat is allowed, or until something new arrives
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, seq, _ = heapq.heappop(self._ready)
+            if self._queued.get(chat_id) != seq:
+                continue    # superseded by a later entry (flood wait)
+            allowed = self._next_allowed.get(chat_id, 0.0)
+            if ready_at < allowed:
+                # Queued while its previous message was going out: wait for the chat's slot
+                self._schedule(chat_id, allowed)
+                continue
+            del self._queued[chat_id]
+            lines = self._pending.pop(chat_id, [])
+            if not lines:
+                continue
+            await self._take_token()
+            self._next_allowed[chat_id] = time.monotonic() + PER_CHAT_INTERVAL
+            await self._in_flight.acquire()
+            asyncio.get_running_loop().create_task(self._deliver(chat_id, lines))
+
+    async def _deliver(self, chat_id: int, lines: List[str]) -> None:
+        try:
+            text = "\n".join(lines)
+            if len(text) > MAX_MESSAGE_CHARS:
+                text = text[:MAX_MESSAGE_CHARS].rsplit("\n", 1)[0] + "\n…"
+            await self._send(chat_id, text)
+            self.stats["sent"] += 1
+        except Exception as e:
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after is not None:
+                # Flood control: push the chat back and requeue its lines in front
+                retry = float(getattr(retry_after, "total_seconds", lambda: retry_after)())
+                self._requeue(chat_id, lines, retry)
+            elif self._blocked_errors and isinstance(e, self._blocked_errors):
+                # User blocked the bot: stop alerting this chat
+                if self._on_blocked:
+                    self._on_blocked(chat_id)
+            else:
+                self.stats["failed"] += 1
+                logger.error(f"Alert delivery to {chat_id} failed: {e}")
+        finally:
+            self._in_flight.release()
+
+    def start(self) -> None:
+        """Start the send loop on the running event loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+
+# --- formatting -----------------------------------------------------------
+
+LIVE_ALERT_LABELS = {
+    "GOAL": "⚽ GOL", "GOAL_CANCELLED": "🚫 Gol anulat", "HALF_TIME": "⏸️ Pauză",
+    "SECOND_HALF": "▶️ Repriza 2", "FULL_TIME": "🏁 Final", "KICKOFF": "🟢 Start",
+}
+
+
+def format_live_alert(event: Dict) -> str:
+    label = LIVE_ALERT_LABELS.get(event["type"], event["type"])
+    team = f" {event['team']}!" if event.get("team") else ""
+    return f"{label}{team} {event['match']} {event['score'][0]}-{event['score'][1]} ({event['minute']})"
+
+
+def format_odds_alert(signal: Dict) -> str:
+    outcome = signal["outcome"] + (f" {signal['line']:g}" if signal.get("line") is not None else "")
+    arrow = "📈" if signal["direction"] == "drifting" else "📉"
+    if signal["type"] == "steam":
+        return (f"🔥 STEAM {arrow} {signal['match']} - {outcome}: {len(signal['bookmakers'])} case, "
+                f"{signal['change_pct']:+.1f}% → {signal['to']:.2f}")
+    return (f"📊 Cote {arrow} {signal['match']} - {outcome}: {signal['from']:.2f} → {signal['to']:.2f} "
+            f"({signal['change_pct']:+.1f}%, {signal['bookmaker']})")
+
+
+def format_value_alert(signal: Dict, ev_pct: float, probability: float) -> str:
+    outcome = signal["outcome"] + (f" {signal['line']:g}" if signal.get("line") is not None else "")
+    return (f"💎 VALUE {signal['match']} - {outcome} @ {signal['to']:.2f} "
+            f"(EV {ev_pct:+.1f}%, prob. consens {probability * 100:.0f}%)")
@@ -1,9 +1,27 @@
-"""Simple in-memory cache for API requests"""
+"""Simple in-memory cache for API requests (shared between workers when WORKERS > 1)"""
+import logging
 import time
 from typing import Any, Optional
 
+logger = logging.getLogger(__name__)
+
 # Simple in-memory cache
 _cache = {}
+_shared = None
+
+
+def _shared_state():
+    """Shared SQLite tier, only when several worker processes run"""
+    global _shared
+    if _shared is None:
+        from src.utils.config import settings
+        if settings.multi_worker:
+            from src.utils.shared_state import shared_state
+            _shared = shared_state
+        else:
+            _shared = False
+    return _shared or None
+
 
 def cache(key: str, data: Any, ttl_seconds: int = 300) -> None:
     """Store data in cache with TTL"""
@@ -11,6 +29,12 @@ def cache(key: str, data: Any, ttl_seconds: int = 300) -> None:
         'data': data,
         'expires': time.time() + ttl_seconds
     }
+    shared = _shared_state()
+    if shared is not None:
+        try:
+            shared.set(key, data, ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Shared cache write failed for {key}: {e}")
 
 def get_cache(key: str) -> Optional[Any]:
     """Get data from cache if not expired"""
@@ -21,8 +45,21 @@ def get_cache(key: str) -> Optional[Any]:
         else:
             # Expired, remove
             del _cache[key]
+    shared = _shared_state()
+    if shared is not None:
+        # Fetched by another worker: keep a local copy until the shared entry expires
+        try:
+            entry = shared.entry(key)
+            if entry is not None:
+                _cache[key] = {'data': entry[0], 'expires': entry[1]}
+                return entry[0]
+        except Exception as e:
+            logger.warning(f"Shared cache read failed for {key}: {e}")
     return None
 
 def clear_cache():
     """Clear all cache entries"""
-    _cache.clear()
\ No newline at end of file
+    _cache.clear()
+    shared = _shared_state()
+    if shared is not None:
+        shared.delete()
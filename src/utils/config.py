@@ -1,4 +1,5 @@
 
+import hashlib
 import os
 from typing import Dict, Tuple
 from pydantic import BaseModel
@@ -35,6 +36,35 @@ class Settings(BaseModel):
     # defaults
     odds_regions: str = os.getenv("ODDS_REGIONS", "uk,eu")
     odds_markets: str = os.getenv("ODDS_MARKETS", "h2h,totals,both_teams_to_score")
+    # Background odds refresh only for events kicking off within this many hours (0 = on demand only)
+    odds_prefetch_hours: float = float(os.getenv("ODDS_PREFETCH_HOURS", "24"))
+
+    # Deployment: "polling" (default) or "webhook"
+    bot_mode: str = os.getenv("BOT_MODE", "polling").lower()
+    webhook_url: str | None = os.getenv("WEBHOOK_URL") or (
+        f"https://{os.environ['RAILWAY_PUBLIC_DOMAIN']}" if os.getenv("RAILWAY_PUBLIC_DOMAIN") else None)
+    webhook_path: str = os.getenv("WEBHOOK_PATH", "telegram")
+    webhook_secret: str | None = os.getenv("WEBHOOK_SECRET")
+    port: int = int(os.getenv("PORT", "8443"))
+    concurrent_updates: int = int(os.getenv("CONCURRENT_UPDATES", "32"))   # across users; per user in order
+    # Worker processes sharing storage/ (behind one load balancer); >1 turns on shared
+    # state (storage/shared.db) and runs background jobs only on the elected leader
+    workers: int = int(os.getenv("WORKERS", "1"))
+    # Bot API endpoint override (local webhook harness / self-hosted Bot API server)
+    telegram_api_base_url: str | None = os.getenv("TELEGRAM_API_BASE_URL")
+
+    def webhook_secret_token(self) -> str:
+        """
+        Secret Telegram sends in X-Telegram-Bot-Api-Secret-Token; updates without it are rejected.
+        Derived from the bot token when WEBHOOK_SECRET is not set, so every instance agrees.
+        """
+        if self.webhook_secret:
+            return self.webhook_secret
+        return hashlib.sha256(f"webhook:{self.telegram_token}".encode()).hexdigest()[:48]
+
+    @property
+    def multi_worker(self) -> bool:
+        return self.workers > 1
 
     def get_health_status(self) -> Dict[str, str]:
         """
@@ -0,0 +1,30 @@
+"""
+🗃️ SQLite helpers
+Shared connection setup for the bot's local SQLite stores (WAL, busy timeout, row access by name)
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Union
+
+BUSY_TIMEOUT_MS = 5000
+
+
+def connect(path: Union[str, Path], check_same_thread: bool = False) -> sqlite3.Connection:
+    """
+    Open a SQLite database in WAL mode.
+
+    WAL lets readers run while a writer commits, and busy_timeout makes concurrent
+    writers (handler threads, background flushers, other workers) wait for the lock
+    instead of failing with "database is locked".
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=check_same_thread, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
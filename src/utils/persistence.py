@@ -0,0 +1,144 @@
+"""
+💾 Shared user_data
+PTB persistence for context.user_data (wizard settings, slates) in SQLite, so a user's
+next button press finds the same state on whichever worker receives it
+"""
+
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from src.utils.db import connect
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = Path(__file__).resolve().parents[2] / "storage" / "users.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (
+    user_id INTEGER PRIMARY KEY,
+    data    TEXT NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class SQLiteUserDataPersistence(BasePersistence):
+    """
+    Only user_data is stored: one JSON row per user in users.db.
+
+    PTB calls refresh_user_data before every handler, which reloads the row when
+    another worker changed it, and update_user_data from its periodic
+    update_persistence. write() stores a user's data right after an update (the
+    bot registers it as the last handler group), so the next update sees it
+    even on another worker. Rows are written only when the JSON changed; values
+    that do not serialize are not shared.
+    """
+
+    def __init__(self, path: Path = DB_PATH, update_interval: float = 60):
+        super().__init__(store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True,
+                                                     callback_data=False),
+                         update_interval=update_interval)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._known: Dict[int, str] = {}     # user_id -> JSON last read or written by this process
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.execute(_SCHEMA)
+        return self._conn
+
+    def _read(self, user_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._db().execute("SELECT data FROM user_data WHERE user_id = ?", (user_id,)).fetchone()
+        return row["data"] if row else None
+
+    def write(self, user_id: int, data: Dict) -> None:
+        """Store a user's data now if it changed"""
+        try:
+            text = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError) as e:
+            logger.warning(f"user_data of {user_id} is not JSON serializable, not shared: {e}")
+            return
+        if self._known.get(user_id) == text:
+            return
+        with self._lock:
+            self._db().execute(
+                "INSERT INTO user_data (user_id, data, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated = excluded.updated",
+                (user_id, text, time.time()))
+        self._known[user_id] = text
+
+    # --- user_data ----------------------------------------------------
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        return {}       # loaded per user by refresh_user_data
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        try:
+            text = self._read(user_id)
+        except Exception as e:
+            logger.error(f"user_data refresh failed for {user_id}: {e}")
+            return
+        if text is None or text == self._known.get(user_id):
+            return
+        user_data.clear()
+        user_data.update(json.loads(text))
+        self._known[user_id] = text
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        try:
+            self.write(user_id, data)
+        except Exception as e:
+            logger.error(f"user_data write failed for {user_id}: {e}")
+
+    async def drop_user_data(self, user_id: int) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+        self._known.pop(user_id, None)
+
+    # --- not stored ---------------------------------------------------
+
+    async def get_chat_data(self) -> Dict:
+        return {}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        pass
@@ -0,0 +1,114 @@
+"""
+🚦 Request Limits
+Per-user/per-command token buckets and a global cap on concurrent heavy pipelines.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# command -> (burst, seconds per token)
+COMMAND_LIMITS = {
+    "today": (3, 20.0),
+    "markets": (3, 20.0),
+    "all": (2, 30.0),
+    "express": (3, 20.0),
+}
+DEFAULT_LIMIT = (5, 10.0)
+MAX_HEAVY = 3               # prediction pipelines running at once (process-wide)
+IDLE_BUCKET_TTL = 3600      # full buckets unused this long are forgotten
+
+
+class RateLimited(Exception):
+    """Raised when a user's bucket for a command is empty"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`burst` tokens, refilled one every `interval` seconds"""
+
+    __slots__ = ("burst", "interval", "tokens", "updated")
+
+    def __init__(self, burst: int, interval: float, now: Optional[float] = None):
+        self.burst = burst
+        self.interval = interval
+        self.tokens = float(burst)
+        self.updated = now if now is not None else time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+        self.updated = now
+
+    def take(self, now: Optional[float] = None) -> float:
+        """Consume a token; returns 0 on success, otherwise seconds until one is available"""
+        now = now if now is not None else time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) * self.interval
+
+
+class RequestGate:
+    """
+    Front door for heavy handlers (event loop only, no locking needed).
+
+    run() takes a token from the (user, command) bucket and runs the work once
+    a global slot is free. Repeated presses never reach it while the first one
+    is pending: a user's updates run one at a time and identical pending ones
+    are dropped by utils.update_processor.PerUserUpdateProcessor.
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[int, float]] = COMMAND_LIMITS,
+                 max_heavy: int = MAX_HEAVY):
+        self.limits = limits
+        self.max_heavy = max_heavy
+        self._buckets: Dict[Tuple[Hashable, str], TokenBucket] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._last_prune = time.monotonic()
+        self.stats = {"started": 0, "limited": 0, "queued": 0}
+
+    def _bucket(self, user_id: Hashable, command: str, now: float) -> TokenBucket:
+        key = (user_id, command)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*self.limits.get(command, DEFAULT_LIMIT), now=now)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        if now - self._last_prune < IDLE_BUCKET_TTL:
+            return
+        self._last_prune = now
+        for key in [k for k, b in self._buckets.items() if now - b.updated > IDLE_BUCKET_TTL]:
+            del self._buckets[key]
+
+    async def _limited(self, work: Callable[[], Awaitable[Any]]) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_heavy)
+        if self._slots.locked():
+            self.stats["queued"] += 1
+        async with self._slots:
+            return await work()
+
+    async def run(self, user_id: Hashable, command: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        """Run work() under the limits; raises RateLimited when the bucket is empty"""
+        now = time.monotonic()
+        self._prune(now)
+        retry_after = self._bucket(user_id, command, now).take(now)
+        if retry_after:
+            self.stats["limited"] += 1
+            raise RateLimited(retry_after)
+
+        self.stats["started"] += 1
+        return await self._limited(work)
+
+
+# Process-wide gate for the bot's heavy commands
+request_gate = RequestGate()
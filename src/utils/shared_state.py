@@ -0,0 +1,227 @@
+"""
+🤝 Shared State
+SQLite (WAL) backend shared by the bot's worker processes: a TTL key/value cache and
+leases for electing the one worker that runs the background jobs
+"""
+
+from __future__ import annotations
+import asyncio
+import inspect
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+from src.utils.db import connect
+
+logger = logging.getLogger(__name__)
+
+SHARED_DB = Path(__file__).resolve().parents[2] / "storage" / "shared.db"
+LEASE_TTL = 30.0            # seconds a leader keeps the lease without renewing it
+PURGE_INTERVAL = 300.0      # expired cache rows are deleted at most this often
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv_cache (
+    key     TEXT PRIMARY KEY,
+    value   TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name    TEXT PRIMARY KEY,
+    holder  TEXT NOT NULL,
+    expires REAL NOT NULL,
+    renewed REAL NOT NULL
+);
+"""
+
+
+def worker_id() -> str:
+    """Identity of this process in leases (WORKER_ID, or host:pid)"""
+    return os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+class SharedState:
+    """
+    One WAL connection per process, serialized by a lock. Every operation is a
+    single short transaction, so workers never hold the database while doing
+    network I/O. Values are stored as JSON; anything that does not serialize is
+    simply not shared.
+    """
+
+    def __init__(self, path: Path = SHARED_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_purge = 0.0
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    # --- cache --------------------------------------------------------
+
+    def entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, expires_at) of a live entry, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._db().execute("SELECT value, expires FROM kv_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row["expires"] <= now:
+            return None
+        return json.loads(row["value"]), row["expires"]
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.entry(key)
+        return entry[0] if entry else None
+
+    def set(self, key: str, value: Any, ttl_seconds: float) -> bool:
+        """Store value for ttl_seconds; returns False if it is not JSON serializable"""
+        try:
+            text = json.dumps(value, separators=(",", ":"))
+        except (TypeError, ValueError):
+            return False
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute("INSERT INTO kv_cache (key, value, expires) VALUES (?, ?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires = excluded.expires",
+                         (key, text, now + ttl_seconds))
+            if now - self._last_purge > PURGE_INTERVAL:
+                self._last_purge = now
+                conn.execute("DELETE FROM kv_cache WHERE expires <= ?", (now,))
+        return True
+
+    def delete(self, key: Optional[str] = None) -> None:
+        """Remove one key, or (no key) the whole cache"""
+        with self._lock:
+            if key is None:
+                self._db().execute("DELETE FROM kv_cache")
+            else:
+                self._db().execute("DELETE FROM kv_cache WHERE key = ?", (key,))
+
+    # --- leases -------------------------------------------------------
+
+    def acquire(self, name: str, holder: str, ttl: float = LEASE_TTL) -> bool:
+        """Take or renew a lease; succeeds when it is free, expired or already ours"""
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO leases (name, holder, expires, renewed) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires, "
+                    "renewed = excluded.renewed WHERE leases.holder = excluded.holder OR leases.expires < ?",
+                    (name, holder, now + ttl, now, now))
+                row = conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row is not None and row["holder"] == holder
+
+    def release(self, name: str, holder: str) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def lease(self, name: str) -> Optional[dict]:
+        """{'holder', 'expires', 'renewed'} of a lease, or None"""
+        with self._lock:
+            row = self._db().execute("SELECT holder, expires, renewed FROM leases WHERE name = ?",
+                                     (name,)).fetchone()
+        return dict(row) if row else None
+
+
+class LeaderLease:
+    """
+    Leader election over a SharedState lease.
+
+    Every worker runs start(); the one holding the lease renews it every ttl/3
+    seconds and the others retry at the same pace, so a crashed leader is
+    replaced within about one ttl. Callbacks (sync or async) run on election and
+    on demotion; a leader that cannot renew before its lease runs out demotes
+    itself first, so two workers never run the jobs at once.
+    """
+
+    def __init__(self, state: SharedState, name: str = "jobs", holder: Optional[str] = None,
+                 ttl: float = LEASE_TTL):
+        self.state = state
+        self.name = name
+        self.holder = holder or worker_id()
+        self.ttl = ttl
+        self.is_leader = False
+        self.elected_at: Optional[float] = None
+        self._valid_until = 0.0
+        self._on_elected: List[Callable] = []
+        self._on_demoted: List[Callable] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def on_elected(self, callback: Callable) -> None:
+        self._on_elected.append(callback)
+
+    def on_demoted(self, callback: Callable) -> None:
+        self._on_demoted.append(callback)
+
+    async def _call(self, callbacks: List[Callable]) -> None:
+        for callback in callbacks:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Leader callback failed: {e}")
+
+    async def _set_leader(self, leader: bool) -> None:
+        if leader == self.is_leader:
+            return
+        self.is_leader = leader
+        self.elected_at = time.time() if leader else None
+        logger.info(f"Worker {self.holder} {'elected leader' if leader else 'stepped down'} ({self.name})")
+        await self._call(self._on_elected if leader else self._on_demoted)
+
+    async def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                held = await asyncio.to_thread(self.state.acquire, self.name, self.holder, self.ttl)
+                if held:
+                    # Measured from before the request: never trust the lease longer than the database does
+                    self._valid_until = started + self.ttl
+            except Exception as e:
+                logger.error(f"Lease renewal failed: {e}")
+                held = self.is_leader and time.monotonic() < self._valid_until
+            await self._set_leader(held)
+            delay = self.ttl / 3
+            if self.is_leader:
+                delay = max(0.0, min(delay, self._valid_until - time.monotonic()))
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        """Start campaigning on the running event loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop campaigning; a leader stops its jobs and frees the lease for the next worker"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await self._set_leader(False)
+            try:
+                await asyncio.to_thread(self.state.release, self.name, self.holder)
+            except Exception as e:
+                logger.error(f"Lease release failed: {e}")
+
+
+# Process-wide handle on the shared database (opened on first use)
+shared_state = SharedState()
@@ -1,22 +1,199 @@
+"""
+👤 User preferences
+Language (and other per-user preferences) held in memory and persisted write-behind to SQLite
+"""
 
-import json, os, threading
+import atexit
+import json
+import logging
+import threading
+import time
 from pathlib import Path
+from typing import Dict, Optional
 
-STORE = Path(__file__).resolve().parents[2] / "storage" / "users.json"
-STORE.parent.mkdir(parents=True, exist_ok=True)
-_lock = threading.Lock()
-
-def get_lang(user_id:int) -> str:
-    with _lock:
-        if not STORE.exists():
-            STORE.write_text(json.dumps({}, indent=2))
-        data = json.loads(STORE.read_text())
-        return data.get(str(user_id), "RO")
-
-def set_lang(user_id:int, lang:str):
-    with _lock:
-        if not STORE.exists():
-            STORE.write_text(json.dumps({}, indent=2))
-        data = json.loads(STORE.read_text())
-        data[str(user_id)] = lang
-        STORE.write_text(json.dumps(data, indent=2))
+from src.utils.config import settings
+from src.utils.db import connect
+
+logger = logging.getLogger(__name__)
+
+STORAGE_DIR = Path(__file__).resolve().parents[2] / "storage"
+DB_PATH = STORAGE_DIR / "users.db"
+LEGACY_STORE = STORAGE_DIR / "users.json"   # migrated once into users.db
+DEFAULT_LANG = "RO"
+FLUSH_INTERVAL = 2.0                        # seconds between write-behind flushes
+REFRESH_INTERVAL = 5.0                      # multi-worker: re-read rows other workers changed
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_prefs (
+    user_id INTEGER PRIMARY KEY,
+    lang    TEXT NOT NULL,
+    updated TEXT NOT NULL DEFAULT (datetime('now'))
+)
+"""
+
+
+def _user_key(user_id) -> Optional[int]:
+    """Numeric Telegram user id, or None for placeholders such as "unknown" (no effective_user)"""
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class PreferenceStore:
+    """
+    All preferences are loaded into a dict on first use, so lookups are O(1) with
+    no disk I/O. Writes update the dict immediately and are flushed to SQLite by a
+    background thread (and at exit); only the rows changed since the last flush
+    are written.
+
+    With a refresh_interval (several workers sharing users.db), rows updated
+    since the last look are re-read at most that often, so a language chosen
+    on one worker shows up on the others within seconds.
+    """
+
+    def __init__(self, path: Path = DB_PATH, legacy_path: Optional[Path] = LEGACY_STORE,
+                 refresh_interval: Optional[float] = None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.refresh_interval = refresh_interval
+        self._refreshed = 0.0
+        self._seen = ""
+        self._langs: Dict[int, str] = {}
+        self._dirty: Dict[int, str] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def _load(self) -> None:
+        conn = connect(self.path)
+        try:
+            conn.execute(_SCHEMA)
+            rows = conn.execute("SELECT user_id, lang, updated FROM user_prefs").fetchall()
+            if not rows:
+                self._migrate(conn)
+                rows = conn.execute("SELECT user_id, lang, updated FROM user_prefs").fetchall()
+        finally:
+            conn.close()
+        self._langs = {row["user_id"]: row["lang"] for row in rows}
+        self._seen = max((row["updated"] for row in rows), default="")
+        self._refreshed = time.monotonic()
+        self._loaded = True
+
+    def _refresh(self) -> None:
+        """Pick up preferences other workers wrote since the newest row we have seen"""
+        self._refreshed = time.monotonic()
+        try:
+            conn = connect(self.path)
+            try:
+                rows = conn.execute("SELECT user_id, lang, updated FROM user_prefs WHERE updated >= ?",
+                                    (self._seen,)).fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.error(f"Preference refresh failed: {e}")
+            return
+        with self._lock:
+            for row in rows:
+                if row["user_id"] not in self._dirty:   # our unflushed choice is newer
+                    self._langs[row["user_id"]] = row["lang"]
+                self._seen = max(self._seen, row["updated"])
+
+    def _migrate(self, conn) -> None:
+        """Import the old users.json ({user_id: lang}) into an empty database"""
+        if not self.legacy_path or not self.legacy_path.exists():
+            return
+        try:
+            data = json.loads(self.legacy_path.read_text() or "{}")
+        except Exception as e:
+            logger.error(f"Could not read {self.legacy_path} for migration: {e}")
+            return
+        rows = [(_user_key(uid), str(lang)) for uid, lang in data.items() if _user_key(uid) is not None]
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR IGNORE INTO user_prefs (user_id, lang) VALUES (?, ?)", rows)
+        conn.execute("COMMIT")
+        logger.info(f"Migrated {len(rows)} language preferences from {self.legacy_path.name}")
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+
+    def get_lang(self, user_id: int) -> str:
+        key = _user_key(user_id)
+        if key is None:
+            return DEFAULT_LANG
+        self._ensure_loaded()
+        if self.refresh_interval and time.monotonic() - self._refreshed > self.refresh_interval:
+            self._refresh()
+        return self._langs.get(key, DEFAULT_LANG)
+
+    def set_lang(self, user_id: int, lang: str) -> None:
+        key = _user_key(user_id)
+        if key is None:
+            logger.warning(f"Ignoring language change for non-numeric user id {user_id!r}")
+            return
+        self._ensure_loaded()
+        with self._lock:
+            self._langs[key] = lang
+            self._dirty[key] = lang
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="prefs-flush", daemon=True)
+                self._flusher.start()
+        self._wake.set()
+
+    def flush(self) -> int:
+        """Write pending changes to SQLite; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._dirty = self._dirty, {}
+            if not pending:
+                return 0
+            try:
+                conn = connect(self.path)
+                try:
+                    conn.execute(_SCHEMA)
+                    conn.execute("BEGIN")
+                    conn.executemany(
+                        "INSERT INTO user_prefs (user_id, lang, updated) VALUES (?, ?, datetime('now')) "
+                        "ON CONFLICT(user_id) DO UPDATE SET lang = excluded.lang, updated = excluded.updated",
+                        list(pending.items()))
+                    conn.execute("COMMIT")
+                finally:
+                    conn.close()
+            except Exception as e:
+                # Put the rows back (unless overwritten meanwhile) and retry on the next flush
+                logger.error(f"Preference flush failed: {e}")
+                with self._lock:
+                    for user_id, lang in pending.items():
+                        self._dirty.setdefault(user_id, lang)
+                return 0
+            return len(pending)
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            # Batch changes arriving close together into one transaction
+            time.sleep(FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+
+_store = PreferenceStore(refresh_interval=REFRESH_INTERVAL if settings.multi_worker else None)
+atexit.register(_store.flush)
+
+
+def get_lang(user_id: int) -> str:
+    return _store.get_lang(user_id)
+
+
+def set_lang(user_id: int, lang: str):
+    _store.set_lang(user_id, lang)
+
+
+def flush_preferences() -> int:
+    """Persist pending preference changes now (shutdown hooks)"""
+    return _store.flush()
@@ -1,21 +1,161 @@
-import os
+"""
+💳 Subscriptions
+Plans, trials and promo codes in a transactional SQLite store (one row per user)
+"""
+
 import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
-SUBS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data', 'subscriptions.json')
+from src.utils.db import connect
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'data')
+DB_PATH = os.path.join(DATA_DIR, 'subscriptions.db')
+SUBS_PATH = os.path.join(DATA_DIR, 'subscriptions.json')   # legacy store, imported once
+ACTIVITY_LOG_SIZE = 1000
+ACTIVITY_TRIM_EVERY = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id    INTEGER PRIMARY KEY,
+    plan       TEXT NOT NULL DEFAULT 'free',
+    expires    TEXT,
+    trial_used INTEGER NOT NULL DEFAULT 0,
+    joined     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_plan ON users(plan);
+CREATE INDEX IF NOT EXISTS idx_users_expires ON users(expires);
+CREATE TABLE IF NOT EXISTS daily_usage (
+    user_id INTEGER NOT NULL,
+    day     TEXT NOT NULL,
+    used    INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+CREATE TABLE IF NOT EXISTS admins (user_id INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS codes (
+    code TEXT PRIMARY KEY,
+    plan TEXT NOT NULL,
+    days INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS activity_log (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid       INTEGER,
+    action    TEXT,
+    timestamp TEXT,
+    ip        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_activity_uid ON activity_log(uid);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
 
 # Internal helpers
 
-def _load():
-    if not os.path.exists(SUBS_PATH):
-        with open(SUBS_PATH, 'w', encoding='utf-8') as f:
-            json.dump({"admins": [], "users": {}, "codes": {}}, f)
-    with open(SUBS_PATH, 'r', encoding='utf-8') as f:
-        return json.load(f)
+def _conn():
+    """Per-thread connection (handlers run both on the event loop and in worker threads)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        _ensure_schema()
+        conn = _local.conn = connect(DB_PATH)
+    return conn
 
-def _save(data):
-    with open(SUBS_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def _ensure_schema():
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        conn = connect(DB_PATH)
+        try:
+            conn.executescript(_SCHEMA)
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone() is None:
+                _migrate_json(conn)
+        finally:
+            conn.close()
+        _initialized = True
+
+def _migrate_json(conn):
+    """One-shot import of data/subscriptions.json (admins, users, daily usage, codes, activity)"""
+    data = {}
+    if os.path.exists(SUBS_PATH):
+        try:
+            with open(SUBS_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.error(f"Could not read {SUBS_PATH} for migration: {e}")
+            return   # retried on the next start
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("INSERT OR IGNORE INTO admins (user_id) VALUES (?)",
+                         [(int(a),) for a in data.get('admins', [])])
+        for uid, user in data.get('users', {}).items():
+            conn.execute(
+                "INSERT OR IGNORE INTO users (user_id, plan, expires, trial_used, joined) VALUES (?, ?, ?, ?, ?)",
+                (int(uid), user.get('plan', 'free'), user.get('expires'), user.get('trial_used', 0), user.get('joined')))
+            conn.executemany("INSERT OR IGNORE INTO daily_usage (user_id, day, used) VALUES (?, ?, ?)",
+                             [(int(uid), day, used) for day, used in (user.get('daily_usage') or {}).items()])
+        conn.executemany("INSERT OR IGNORE INTO codes (code, plan, days) VALUES (?, ?, ?)",
+                         [(code, info.get('plan', 'starter'), info.get('days', 30))
+                          for code, info in data.get('codes', {}).items()])
+        conn.executemany("INSERT INTO activity_log (uid, action, timestamp, ip) VALUES (?, ?, ?, ?)",
+                         [(e.get('uid'), e.get('action'), e.get('timestamp'), e.get('ip'))
+                          for e in data.get('activity_log', [])[-ACTIVITY_LOG_SIZE:]])
+        conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (datetime.now().isoformat(),))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if data:
+        logger.info(f"Migrated {len(data.get('users', {}))} users from {SUBS_PATH}")
+
+@contextmanager
+def _transaction():
+    """BEGIN IMMEDIATE: take the write lock up front so read-modify-write cannot interleave"""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+def _user(uid: int):
+    return _conn().execute("SELECT * FROM users WHERE user_id = ?", (int(uid),)).fetchone()
+
+def _create_user(conn, uid: int):
+    conn.execute("INSERT OR IGNORE INTO users (user_id, plan, trial_used, joined) VALUES (?, 'free', 0, ?)",
+                 (int(uid), datetime.now().isoformat()))
+
+def _used_today(uid: int, today: str) -> int:
+    row = _conn().execute("SELECT used FROM daily_usage WHERE user_id = ? AND day = ?", (int(uid), today)).fetchone()
+    return row['used'] if row else 0
+
+def _grant(conn, uid: int, plan: str, days: int) -> str:
+    row = conn.execute("SELECT expires FROM users WHERE user_id = ?", (int(uid),)).fetchone()
+
+    # Calculate expiration date
+    if row and row['expires']:
+        old_exp = datetime.strptime(row['expires'], '%Y-%m-%d')
+        new_exp = max(datetime.now(), old_exp) + timedelta(days=days)
+    else:
+        new_exp = datetime.now() + timedelta(days=days)
+    expires = new_exp.strftime('%Y-%m-%d')
+
+    # Update plan but preserve usage counters; reset daily usage when upgrading
+    _create_user(conn, uid)
+    conn.execute("UPDATE users SET plan = ?, expires = ? WHERE user_id = ?", (plan, expires, int(uid)))
+    conn.execute("DELETE FROM daily_usage WHERE user_id = ?", (int(uid),))
+    return expires
 
 # API
 
@@ -24,15 +164,13 @@ def is_admin(uid: int) -> bool:
     if uid == 1622719347:
         return True
     
-    data = _load()
-    return str(uid) in [str(a) for a in data.get('admins', [])]
+    return _conn().execute("SELECT 1 FROM admins WHERE user_id = ?", (int(uid),)).fetchone() is not None
 
 def get_plan(uid: int) -> tuple[str, str|None]:
-    data = _load()
-    user = data['users'].get(str(uid))
+    user = _user(uid)
     if not user:
         return 'free', None
-    return user.get('plan', 'free'), user.get('expires')
+    return user['plan'] or 'free', user['expires']
 
 def get_plan_limits(plan: str) -> dict:
     """Get generation limits and features for each plan"""
@@ -66,48 +204,24 @@ def get_plan_limits(plan: str) -> dict:
     return limits.get(plan, limits['free'])
 
 def grant_days(uid: int, plan: str, days: int) -> str:
-    data = _load()
-    uid = str(uid)
-    expires = None
-    
-    # Calculate expiration date
-    if uid in data['users'] and data['users'][uid].get('expires'):
-        old_exp = datetime.strptime(data['users'][uid]['expires'], '%Y-%m-%d')
-        new_exp = max(datetime.now(), old_exp) + timedelta(days=days)
-    else:
-        new_exp = datetime.now() + timedelta(days=days)
-    expires = new_exp.strftime('%Y-%m-%d')
-    
-    # Preserve existing user data or create new
-    if uid not in data['users']:
-        data['users'][uid] = {
-            'plan': plan,
-            'expires': expires,
-            'trial_used': 0,
-            'daily_usage': {},
-            'joined': datetime.now().isoformat()
-        }
-    else:
-        # Update plan but preserve usage counters
-        data['users'][uid]['plan'] = plan
-        data['users'][uid]['expires'] = expires
-        # Reset daily usage when upgrading
-        data['users'][uid]['daily_usage'] = {}
-    
-    _save(data)
-    return expires
+    with _transaction() as conn:
+        return _grant(conn, uid, plan, days)
+
+def set_plan(uid: int, plan: str, expires: str|None) -> None:
+    """Set plan and expiry directly (admin grant), creating the user if needed"""
+    with _transaction() as conn:
+        _create_user(conn, uid)
+        conn.execute("UPDATE users SET plan = ?, expires = ? WHERE user_id = ?", (plan, expires, int(uid)))
 
 def redeem(code: str, uid: int) -> tuple[bool, str]:
-    data = _load()
     code = code.strip()
-    if code not in data['codes']:
-        return False, 'Cod invalid sau folosit.'
-    info = data['codes'][code]
-    plan = info.get('plan', 'starter')
-    days = info.get('days', 30)
-    expires = grant_days(uid, plan, days)
-    del data['codes'][code]
-    _save(data)
+    with _transaction() as conn:
+        info = conn.execute("SELECT plan, days FROM codes WHERE code = ?", (code,)).fetchone()
+        if info is None:
+            return False, 'Cod invalid sau folosit.'
+        # Code is consumed in the same transaction, so it can be redeemed only once
+        conn.execute("DELETE FROM codes WHERE code = ?", (code,))
+        expires = _grant(conn, uid, info['plan'] or 'starter', info['days'] or 30)
     return True, expires
 
 def plan_gate(uid: int, feature: str) -> tuple[bool, str]:
@@ -117,12 +231,9 @@ def plan_gate(uid: int, feature: str) -> tuple[bool, str]:
     if expires:
         exp_date = datetime.strptime(expires, '%Y-%m-%d')
         if datetime.now().date() > exp_date.date():
-            # Downgrade to free if expired
-            data = _load()
-            if str(uid) in data['users']:
-                data['users'][str(uid)]['plan'] = 'free'
-                data['users'][str(uid)]['expires'] = None
-                _save(data)
+            # Downgrade to free if expired (unless renewed meanwhile)
+            _conn().execute("UPDATE users SET plan = 'free', expires = NULL WHERE user_id = ? AND expires = ?",
+                            (int(uid), expires))
             plan = 'free'
     
     # Special handling for prediction features (use trial system)
@@ -181,9 +292,8 @@ def get_user_stats(uid: int) -> dict:
 
 def get_trial_usage(uid: int) -> tuple[int, int]:
     """Get trial usage for user (used, remaining)"""
-    data = _load()
-    user = data['users'].get(str(uid), {})
-    plan = user.get('plan', 'free')
+    user = _user(uid)
+    plan = (user['plan'] if user else None) or 'free'
     
     # Get plan limits
     limits = get_plan_limits(plan)
@@ -191,7 +301,7 @@ def get_trial_usage(uid: int) -> tuple[int, int]:
     
     # For free users, use trial_used counter
     if plan == 'free':
-        trial_used = user.get('trial_used', 0)
+        trial_used = user['trial_used'] if user else 0
         trial_remaining = max(0, max_daily - trial_used)
         return trial_used, trial_remaining
     
@@ -201,38 +311,24 @@ def get_trial_usage(uid: int) -> tuple[int, int]:
     
     # For paid users with daily limits
     today = datetime.now().strftime('%Y-%m-%d')
-    daily_usage = user.get('daily_usage', {})
-    used_today = daily_usage.get(today, 0)
+    used_today = _used_today(uid, today)
     remaining_today = max(0, max_daily - used_today)
     
     return used_today, remaining_today
 
 def use_trial(uid: int) -> bool:
     """Use one generation based on user plan. Returns True if successful, False if no generations left"""
-    data = _load()
-    uid_str = str(uid)
-    
-    if uid_str not in data['users']:
-        data['users'][uid_str] = {
-            'plan': 'free', 
-            'trial_used': 0,
-            'daily_usage': {},
-            'joined': datetime.now().isoformat()
-        }
-    
-    user = data['users'][uid_str]
-    plan = user.get('plan', 'free')
+    conn = _conn()
+    _create_user(conn, uid)
+    plan = _user(uid)['plan'] or 'free'
     limits = get_plan_limits(plan)
     max_daily = limits['daily_predictions']
     
-    # For free users - use trial_used counter
+    # For free users - decrement only while below the limit (single atomic statement)
     if plan == 'free':
-        trial_used = user.get('trial_used', 0)
-        if trial_used >= max_daily:
-            return False  # No trials left
-        user['trial_used'] = trial_used + 1
-        _save(data)
-        return True
+        cur = conn.execute("UPDATE users SET trial_used = trial_used + 1 WHERE user_id = ? AND trial_used < ?",
+                           (int(uid), max_daily))
+        return cur.rowcount == 1
     
     # For unlimited plans
     if max_daily == -1:
@@ -240,126 +336,83 @@ def use_trial(uid: int) -> bool:
     
     # For paid users with daily limits
     today = datetime.now().strftime('%Y-%m-%d')
-    if 'daily_usage' not in user:
-        user['daily_usage'] = {}
-    
-    used_today = user['daily_usage'].get(today, 0)
-    if used_today >= max_daily:
-        return False  # Daily limit reached
-    
-    user['daily_usage'][today] = used_today + 1
-    _save(data)
-    return True
+    cur = conn.execute(
+        "INSERT INTO daily_usage (user_id, day, used) SELECT ?, ?, 1 WHERE ? > 0 "
+        "ON CONFLICT(user_id, day) DO UPDATE SET used = used + 1 WHERE used < ?",
+        (int(uid), today, max_daily, max_daily))
+    return cur.rowcount == 1
 
 def reset_trial(uid: int) -> bool:
     """Reset trial for user (admin only)"""
-    data = _load()
-    uid_str = str(uid)
-    
-    if uid_str in data['users']:
-        data['users'][uid_str]['trial_used'] = 0
-        _save(data)
-        return True
-    return False
+    cur = _conn().execute("UPDATE users SET trial_used = 0 WHERE user_id = ?", (int(uid),))
+    return cur.rowcount == 1
 
 def list_active_codes() -> list:
     """List all available promo codes (admin only)"""
-    data = _load()
-    return list(data.get('codes', {}).keys())
+    return [row['code'] for row in _conn().execute("SELECT code FROM codes ORDER BY code")]
 
 def add_promo_code(code: str, plan: str, days: int) -> bool:
     """Add new promo code (admin only)"""
-    data = _load()
-    if code in data['codes']:
-        return False  # Code already exists
-    data['codes'][code] = {'plan': plan, 'days': days}
-    _save(data)
-    return True
+    cur = _conn().execute("INSERT OR IGNORE INTO codes (code, plan, days) VALUES (?, ?, ?)", (code, plan, days))
+    return cur.rowcount == 1  # False if the code already exists
+
+def list_users() -> dict:
+    """All users as {uid: {'plan', 'expires', 'trial_used', 'joined'}} (admin lists)"""
+    rows = _conn().execute("SELECT user_id, plan, expires, trial_used, joined FROM users")
+    return {str(row['user_id']): {'plan': row['plan'], 'expires': row['expires'],
+                                  'trial_used': row['trial_used'], 'joined': row['joined']} for row in rows}
 
 def log_user_activity(uid: int, action: str, ip: str = None):
     """Log user activity for admin tracking"""
-    data = _load()
-    
-    if 'activity_log' not in data:
-        data['activity_log'] = []
-    
-    log_entry = {
-        'uid': uid,
-        'action': action,
-        'timestamp': datetime.now().isoformat(),
-        'ip': ip
-    }
+    conn = _conn()
+    cur = conn.execute("INSERT INTO activity_log (uid, action, timestamp, ip) VALUES (?, ?, ?, ?)",
+                       (uid, action, datetime.now().isoformat(), ip))
     
-    data['activity_log'].append(log_entry)
-    
-    # Keep only last 1000 entries
-    if len(data['activity_log']) > 1000:
-        data['activity_log'] = data['activity_log'][-1000:]
-    
-    _save(data)
+    # Keep only the last ACTIVITY_LOG_SIZE entries (trimmed in batches, not on every insert)
+    if cur.lastrowid % ACTIVITY_TRIM_EVERY == 0:
+        conn.execute("DELETE FROM activity_log WHERE id <= ?", (cur.lastrowid - ACTIVITY_LOG_SIZE,))
 
 def get_user_activity(uid: int = None, limit: int = 50) -> list:
     """Get user activity log for admin"""
-    data = _load()
-    logs = data.get('activity_log', [])
-    
     if uid:
-        logs = [log for log in logs if log['uid'] == uid]
-    
-    return logs[-limit:]
+        rows = _conn().execute("SELECT uid, action, timestamp, ip FROM activity_log WHERE uid = ? "
+                               "ORDER BY id DESC LIMIT ?", (uid, limit)).fetchall()
+    else:
+        rows = _conn().execute("SELECT uid, action, timestamp, ip FROM activity_log "
+                               "ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [dict(row) for row in reversed(rows)]
 
 def get_user_statistics() -> dict:
     """Get comprehensive user statistics for admin"""
-    data = _load()
-    
-    total_users = len(data.get('users', {}))
-    active_subscribers = 0
-    trial_users = 0
-    expired_users = 0
-    
-    for uid, user_data in data.get('users', {}).items():
-        plan = user_data.get('plan', 'free')
-        expires = user_data.get('expires')
-        trial_used = user_data.get('trial_used', 0)
-        
-        if plan != 'free' and expires:
-            exp_date = datetime.strptime(expires, '%Y-%m-%d')
-            if datetime.now().date() <= exp_date.date():
-                active_subscribers += 1
-            else:
-                expired_users += 1
-        elif trial_used > 0:
-            trial_users += 1
+    conn = _conn()
+    today = datetime.now().strftime('%Y-%m-%d')
+    row = conn.execute("""
+        SELECT COUNT(*) AS total_users,
+               SUM(plan != 'free' AND expires IS NOT NULL AND expires >= :today) AS active_subscribers,
+               SUM(plan != 'free' AND expires IS NOT NULL AND expires < :today) AS expired_users,
+               SUM(NOT (plan != 'free' AND expires IS NOT NULL) AND trial_used > 0) AS trial_users
+        FROM users
+    """, {'today': today}).fetchone()
     
     return {
-        'total_users': total_users,
-        'active_subscribers': active_subscribers,
-        'trial_users': trial_users,
-        'expired_users': expired_users,
-        'total_codes': len(data.get('codes', {})),
-        'total_admins': len(data.get('admins', []))
+        'total_users': row['total_users'],
+        'active_subscribers': row['active_subscribers'] or 0,
+        'trial_users': row['trial_users'] or 0,
+        'expired_users': row['expired_users'] or 0,
+        'total_codes': conn.execute("SELECT COUNT(*) FROM codes").fetchone()[0],
+        'total_admins': conn.execute("SELECT COUNT(*) FROM admins").fetchone()[0]
     }
 
 def get_user_account_info(uid: int) -> dict:
     """Get user account information for account menu"""
-    data = _load()
-    uid_str = str(uid)
-    
-    if uid_str not in data['users']:
-        # Create new user with trial
-        data['users'][uid_str] = {
-            'plan': 'free',
-            'expires': None,
-            'trial_used': 0,
-            'joined': datetime.now().isoformat()
-        }
-        _save(data)
+    # Create new user with trial
+    _create_user(_conn(), uid)
     
-    user = data['users'][uid_str]
-    plan = user.get('plan', 'free')
-    expires = user.get('expires')
-    trial_used = user.get('trial_used', 0)
-    joined = user.get('joined', 'Unknown')
+    user = _user(uid)
+    plan = user['plan'] or 'free'
+    expires = user['expires']
+    trial_used = user['trial_used'] or 0
+    joined = user['joined'] or 'Unknown'
     
     # Calculate remaining trials
     remaining_trials = max(0, 2 - trial_used) if plan == 'free' else float('inf')
@@ -441,21 +494,19 @@ def get_pricing_catalog() -> dict:
 
 def get_remaining_generations(uid: int) -> int:
     """Get remaining generations for user based on their plan"""
-    data = _load()
-    uid_str = str(uid)
+    user = _user(uid)
     
-    if uid_str not in data['users']:
+    if not user:
         # New user gets 2 free generations
         return 2
     
-    user = data['users'][uid_str]
-    plan = user.get('plan', 'free')
+    plan = user['plan'] or 'free'
     limits = get_plan_limits(plan)
     max_daily = limits['daily_predictions']
     
     # Check if subscription is active for paid users
     if plan != 'free':
-        expires = user.get('expires')
+        expires = user['expires']
         if expires:
             try:
                 exp_date = datetime.strptime(expires, '%Y-%m-%d')
@@ -471,24 +522,21 @@ def get_remaining_generations(uid: int) -> int:
     
     # For free users: max_daily - trial_used
     if plan == 'free':
-        trial_used = user.get('trial_used', 0)
+        trial_used = user['trial_used'] or 0
         remaining = max(0, max_daily - trial_used)
         return remaining
     
     # For paid users with daily limits
     today = datetime.now().strftime('%Y-%m-%d')
-    daily_usage = user.get('daily_usage', {})
-    used_today = daily_usage.get(today, 0)
+    used_today = _used_today(uid, today)
     remaining_today = max(0, max_daily - used_today)
     
     return remaining_today
 
 def format_remaining_generations(uid: int) -> str:
     """Format remaining generations for display"""
-    data = _load()
-    uid_str = str(uid)
-    user = data['users'].get(uid_str, {})
-    plan = user.get('plan', 'free')
+    user = _user(uid)
+    plan = (user['plan'] if user else None) or 'free'
     limits = get_plan_limits(plan)
     max_daily = limits['daily_predictions']
     
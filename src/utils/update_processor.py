@@ -0,0 +1,154 @@
+"""
+🧵 Update Processor
+Concurrent update handling for python-telegram-bot: different users run in parallel,
+each user's updates run one at a time in arrival order.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT = 32             # updates being handled at once (all users)
+MAX_PENDING_PER_USER = 8        # queued + running updates per user; more are dropped
+
+
+def _user_key(update: object) -> Optional[Hashable]:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+def _payload(update: object) -> Optional[str]:
+    """What the user asked for (command text / button data), for duplicate detection"""
+    if not isinstance(update, Update):
+        return None
+    if update.callback_query is not None:
+        message = update.callback_query.message
+        # Same button on the same message; the same data on another message is a new request
+        return f"cb:{message.message_id if message else ''}:{update.callback_query.data}"
+    if update.message is not None and update.message.text:
+        return f"msg:{update.message.text.strip()}"
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    A per-user asyncio.Lock keeps each user's updates in order, so wizard
+    state in context.user_data is never touched by two handlers at once. Our
+    own running semaphore (max_running) is taken only after the user's lock,
+    so a user with a backlog cannot hold slots while waiting.
+
+    Everything happens in do_process_update, PTB's extension point. The base
+    class's semaphore (taken by the final process_update before calling us)
+    only bounds the updates admitted at once: max_running per pending slot
+    of a user.
+
+    A user may have at most MAX_PENDING_PER_USER updates queued or running.
+    An update identical to one still pending for the same user (a repeated
+    button press or command) is dropped, because the first one delivers the
+    result. This is the bot's only duplicate check: handlers behind it never
+    see a second copy of a pending request.
+    """
+
+    def __init__(self, max_concurrent_updates: int = MAX_CONCURRENT,
+                 max_pending_per_user: int = MAX_PENDING_PER_USER):
+        super().__init__(max_concurrent_updates * max_pending_per_user)
+        self.max_running = max_concurrent_updates
+        self.max_pending_per_user = max_pending_per_user
+        self._running: Optional[asyncio.Semaphore] = None
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._pending: Dict[Hashable, list] = {}
+        self.active = 0
+        self.stats = {"processed": 0, "failed": 0, "collapsed": 0, "dropped": 0,
+                      "max_queue_depth": 0, "wait_total": 0.0}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def _reject(self, update: object, coroutine: Awaitable, reason: str) -> None:
+        self.stats[reason] += 1
+        coroutine.close()
+        if isinstance(update, Update) and update.callback_query is not None:
+            try:
+                await update.callback_query.answer()   # stop the button spinner
+            except Exception:
+                pass
+
+    def _slots(self) -> asyncio.Semaphore:
+        # Created lazily, on the event loop that runs the handlers
+        if self._running is None:
+            self._running = asyncio.Semaphore(self.max_running)
+        return self._running
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        key = _user_key(update)
+        if key is None:
+            async with self._slots():
+                await self._run(coroutine, time.monotonic())
+            return
+
+        pending = self._pending.setdefault(key, [])
+        payload = _payload(update)
+        if payload is not None and payload in pending:
+            await self._reject(update, coroutine, "collapsed")
+            return
+        if len(pending) >= self.max_pending_per_user:
+            await self._reject(update, coroutine, "dropped")
+            return
+
+        pending.append(payload)
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(pending))
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        queued_at = time.monotonic()
+        try:
+            async with lock:
+                async with self._slots():
+                    await self._run(coroutine, queued_at)
+        finally:
+            pending.remove(payload)
+            if not pending:
+                # Last update of this user: forget its lock and queue
+                del self._pending[key]
+                del self._locks[key]
+
+    async def _run(self, coroutine: Awaitable, queued_at: float) -> None:
+        self.stats["wait_total"] += time.monotonic() - queued_at
+        self.active += 1
+        try:
+            await coroutine
+            self.stats["processed"] += 1
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.active -= 1
+
+    def metrics(self) -> Dict:
+        """Snapshot for monitoring: running/queued updates, per-user depth and counters"""
+        depths = [len(p) for p in self._pending.values()]
+        queued = sum(depths) - self.active
+        done = self.stats["processed"] + self.stats["failed"]
+        return {
+            "active": self.active,
+            "queued": max(0, queued),
+            "users_pending": len(depths),
+            "max_user_depth": max(depths, default=0),
+            "avg_wait_ms": round(self.stats["wait_total"] / done * 1000, 1) if done else 0.0,
+            **{k: v for k, v in self.stats.items() if k != "wait_total"},
+        }
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+from src.utils import alerts
+from src.utils.alerts import AlertDispatcher
+
+
+def test_retry_after_requeues_lines_in_front_and_waits(monkeypatch):
+    monkeypatch.setattr(alerts, "PER_CHAT_INTERVAL", 0.5)
+    sent = []
+
+    async def scenario():
+        first_attempt = asyncio.Event()
+        release = asyncio.Event()
+
+        async def send(chat_id, text):
+            if not first_attempt.is_set():
+                first_attempt.set()
+                await release.wait()
+                raise RetryAfter(1)
+            sent.append((time.monotonic(), chat_id, text))
+
+        dispatcher = AlertDispatcher(send)
+        dispatcher.start()
+        dispatcher.publish([1], "a")
+        await first_attempt.wait()
+        # New lines arrive while the first message is in flight
+        dispatcher.publish([1], "b")
+        dispatcher.publish([2], "other chat")
+        await asyncio.sleep(0.1)
+        failed_at = time.monotonic()
+        release.set()
+        while len(sent) < 2:
+            await asyncio.sleep(0.05)
+        await dispatcher.stop()
+        return failed_at
+
+    failed_at = asyncio.run(scenario())
+
+    texts = {chat_id: (at, text) for at, chat_id, text in sent}
+    # Failed line first, then the one queued meanwhile, in one message after the flood wait
+    assert texts[1][1] == "a\nb"
+    assert texts[1][0] - failed_at >= 0.95
+    # The other chat went out before the 429 but nothing is sent during the wait
+    assert texts[2][0] < failed_at
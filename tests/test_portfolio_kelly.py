@@ -0,0 +1,16 @@
+from src.analytics.portfolio_kelly import portfolio_kelly
+from src.utils.cache import clear_cache
+
+
+def test_permuted_slate_gets_same_stakes_per_leg():
+    clear_cache()
+    a = {'name': 'A', 'probability': 0.55, 'odds': 2.4}
+    b = {'name': 'B', 'probability': 0.62, 'odds': 1.9}
+    c = {'name': 'C', 'probability': 0.40, 'odds': 3.1}
+    first = portfolio_kelly([a, b, c], 1000.0)
+    second = portfolio_kelly([c, a, b], 1000.0)
+
+    assert not first['cached'] and second['cached']
+    stakes = {bet['name']: bet['joint_stake'] for bet in first['bets']}
+    assert {bet['name']: bet['joint_stake'] for bet in second['bets']} == stakes
+    assert [bet['name'] for bet in second['bets']] == ['C', 'A', 'B']
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+🧪 Webhook harness
+Runs the bot in webhook mode against a local fake Bot API and POSTs recorded Update
+JSON to it, measuring webhook throughput and handler completions without Telegram.
+
+    python tools/webhook_harness.py                       # synthetic /help, /lang, menu taps
+    python tools/webhook_harness.py --updates updates.jsonl --concurrency 32
+    python tools/webhook_harness.py --url https://host/telegram --secret S   # existing server
+
+Recorded files hold one Update per line (as received from Telegram / getUpdates).
+The spawned bot uses the normal storage/ and data/ files: run it on a scratch checkout.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+TOKEN = "123456:HARNESS"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "PariuSmart", "username": "pariusmart_harness_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+
+
+class FakeBotAPI(ThreadingHTTPServer):
+    """Answers every Bot API method with a plausible result and counts the calls"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0):
+        super().__init__(("127.0.0.1", port), _FakeBotAPIHandler)
+        self.calls: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.message_ids = iter(range(1, 10 ** 9))
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/bot"
+
+    def replies(self) -> int:
+        with self.lock:
+            return sum(n for m, n in self.calls.items() if m in ("sendMessage", "editMessageText"))
+
+
+class _FakeBotAPIHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        method = self.path.rsplit("/", 1)[-1]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8", "replace")
+        try:
+            params = json.loads(body) if body.startswith("{") else {}
+        except ValueError:
+            params = {}
+        server: FakeBotAPI = self.server
+        with server.lock:
+            server.calls[method] = server.calls.get(method, 0) + 1
+            message_id = next(server.message_ids)
+        if method == "getMe":
+            result = BOT_USER
+        elif method in ("sendMessage", "editMessageText"):
+            chat_id = params.get("chat_id", 1)
+            result = {"message_id": message_id, "date": int(time.time()), "text": params.get("text", ""),
+                      "chat": {"id": chat_id, "type": "private"}, "from": BOT_USER}
+        else:
+            result = True
+        payload = json.dumps({"ok": True, "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST
+
+
+def synthetic_updates(count: int, users: int) -> List[Dict]:
+    """Light updates only (no football/odds API calls): commands and menu taps"""
+    texts = ["/help", "/lang", "/status"]
+    now = int(time.time())
+    updates = []
+    for i in range(count):
+        uid = 1000 + i % users
+        user = {"id": uid, "is_bot": False, "first_name": f"User{uid}"}
+        chat = {"id": uid, "type": "private"}
+        if i % 4 == 3:
+            updates.append({"update_id": i + 1, "callback_query": {
+                "id": str(i), "from": user, "chat_instance": str(uid), "data": "MENU_HELP",
+                "message": {"message_id": i + 1, "date": now, "chat": chat, "from": BOT_USER, "text": "menu"}}})
+        else:
+            command = texts[i % len(texts)]
+            # Distinct text per update: repeats of a pending identical command are collapsed by the bot
+            updates.append({"update_id": i + 1, "message": {
+                "message_id": i + 1, "date": now, "chat": chat, "from": user, "text": f"{command} {i}",
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}]}})
+    return updates
+
+
+def load_updates(path: Path) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def post(url: str, secret: Optional[str], update: Dict) -> tuple:
+    data = json.dumps(update).encode()
+    request = urllib.request.Request(url, data=data, method="POST", headers={"Content-Type": "application/json"})
+    if secret is not None:
+        request.add_header("X-Telegram-Bot-Api-Secret-Token", secret)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def _reachable(url: str) -> bool:
+    try:
+        post(url, "wrong-secret", {"update_id": 0})
+        return True
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+
+def spawn_bot(api: FakeBotAPI, port: int, secret: str) -> subprocess.Popen:
+    env = dict(os.environ, BOT_MODE="webhook", PORT=str(port), WEBHOOK_URL=f"http://127.0.0.1:{port}",
+               WEBHOOK_SECRET=secret, TELEGRAM_BOT_TOKEN=TOKEN, TELEGRAM_API_BASE_URL=api.base_url)
+    return subprocess.Popen([sys.executable, str(ROOT / "bot" / "bot.py")], env=env, cwd=str(ROOT),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def run(url: str, secret: str, updates: List[Dict], concurrency: int,
+        api: Optional[FakeBotAPI], settle_timeout: float) -> None:
+    # The server must refuse updates without the right secret
+    status, _ = post(url, "wrong-secret", updates[0])
+    print(f"wrong secret      -> HTTP {status} ({'ok' if status == 403 else 'UNEXPECTED'})")
+
+    replies_before = api.replies() if api else 0
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for status, latency in pool.map(lambda u: post(url, secret, u), updates):
+            statuses[status] = statuses.get(status, 0) + 1
+            latencies.append(latency)
+    posted = time.perf_counter() - started
+
+    print(f"updates           {len(updates)} (concurrency {concurrency})")
+    print(f"HTTP statuses     {statuses}")
+    print(f"accepted          {len(updates) / posted:.0f} updates/s")
+    latencies.sort()
+    print(f"POST latency      p50 {statistics.median(latencies) * 1000:.1f} ms | "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms | max {latencies[-1] * 1000:.1f} ms")
+
+    if api is None:
+        return
+    # Handler completion: every update answers with one message or edit (duplicates a user
+    # sends while the first is still pending are collapsed, so stop once replies go quiet)
+    deadline = time.perf_counter() + settle_timeout
+    last, quiet_since = -1, time.perf_counter()
+    while api.replies() - replies_before < len(updates) and time.perf_counter() < deadline:
+        replies = api.replies()
+        if replies != last:
+            last, quiet_since = replies, time.perf_counter()
+        elif time.perf_counter() - quiet_since > 3.0:
+            break
+        time.sleep(0.05)
+    handled = api.replies() - replies_before
+    elapsed = min(time.perf_counter(), quiet_since) - started
+    print(f"handled           {handled}/{len(updates)} in {elapsed:.2f}s ({handled / elapsed:.0f} updates/s)"
+          + ("" if handled >= len(updates) else " - rest collapsed as duplicates or over the per-user limit"))
+    print(f"Bot API calls     {dict(sorted(api.calls.items()))}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=Path, help="JSONL file with recorded Update objects")
+    parser.add_argument("--count", type=int, default=500, help="synthetic updates when --updates is not given")
+    parser.add_argument("--users", type=int, default=50, help="distinct users in synthetic updates")
+    parser.add_argument("--concurrency", type=int, default=16, help="parallel POSTs")
+    parser.add_argument("--url", help="webhook URL of an already running bot (skips spawning one)")
+    parser.add_argument("--secret", default="harness-secret", help="X-Telegram-Bot-Api-Secret-Token value")
+    parser.add_argument("--port", type=int, default=8765, help="port for the spawned bot")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for handlers to finish")
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates) if args.updates else synthetic_updates(args.count, args.users)
+    if args.url:
+        run(args.url, args.secret, updates, args.concurrency, None, args.timeout)
+        return
+
+    api = FakeBotAPI()
+    threading.Thread(target=api.serve_forever, daemon=True).start()
+    bot = spawn_bot(api, args.port, args.secret)
+    url = f"http://127.0.0.1:{args.port}/telegram"
+    try:
+        deadline = time.time() + 30
+        while not _reachable(url):
+            if bot.poll() is not None or time.time() > deadline:
+                sys.exit(f"Bot did not start:\n{bot.stderr.read().decode(errors='replace')[-2000:]}")
+            time.sleep(0.2)
+        run(url, args.secret, updates, args.concurrency, api, args.timeout)
+    finally:
+        bot.terminate()
+        try:
+            bot.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        api.shutdown()
+
+
+if __name__ == "__main__":
+    main()